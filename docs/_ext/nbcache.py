@@ -0,0 +1,310 @@
+"""
+Content-hash execution cache for notebooks.
+
+A notebook is keyed on the source of its code cells, the kernel it runs on,
+the data files that sit next to it in the repository and any shared inputs
+the notebooks import or read from elsewhere (e.g. the ``casetools`` package
+of the case studies and its ``manifest.json``). When the key is
+already in the cache, the stored outputs are replayed onto the notebook
+instead of executing it again. Entries are evicted least-recently-used once
+the cache grows beyond its size cap.
+
+The cache is shared by the notebook tests (``tests/run_notebooks.py``) and,
+as a Sphinx extension, by the nbsphinx build. It lives in ``NBCACHE_DIR``
+(default ``~/.cache/geosci-computation/nbcache``) and is capped at
+``NBCACHE_MAXSIZE`` megabytes (default 2048). Set ``NBCACHE=0`` to disable it.
+"""
+from __future__ import print_function
+
+import hashlib
+import json
+import os
+import subprocess
+import tempfile
+
+import nbformat
+from nbconvert.preprocessors import ExecutePreprocessor
+
+CACHE_DIR = os.path.join("~", ".cache", "geosci-computation", "nbcache")
+MAXSIZE = 2048  # MB
+
+# files next to a notebook that are not inputs to it
+SKIP_DIRS = [".ipynb_checkpoints", "__pycache__", "_build"]
+SKIP_EXT = [".ipynb", ".pyc", ".html"]
+
+
+def enabled():
+    return os.environ.get("NBCACHE", "1").lower() not in ["0", "false", "no"]
+
+
+def input_files(nbdir):
+    """
+    Data files a notebook may read: the files tracked by git in its folder,
+    or every file below it when the folder is not in a git checkout.
+    """
+    try:
+        with open(os.devnull, "w") as devnull:
+            out = subprocess.check_output(
+                ["git", "ls-files", "-z", "."], cwd=nbdir, stderr=devnull
+            )
+        files = [f for f in out.decode("utf-8").split("\0") if f]
+    except (OSError, subprocess.CalledProcessError):
+        files = []
+        for dirname, dirnames, filenames in os.walk(nbdir):
+            dirnames[:] = [
+                d for d in dirnames
+                if d not in SKIP_DIRS and not d.startswith(".")
+            ]
+            files += [
+                os.path.relpath(os.path.join(dirname, f), nbdir)
+                for f in filenames
+            ]
+
+    return sorted(
+        f for f in files
+        if os.path.splitext(f)[1] not in SKIP_EXT and
+        not any(d in f.split("/") for d in SKIP_DIRS) and
+        os.path.isfile(os.path.join(nbdir, f))
+    )
+
+
+def extra_files(paths):
+    """
+    (name, path) of the shared inputs: files are taken as they are,
+    directories are expanded with :func:`input_files`
+    """
+    files = []
+    for path in paths:
+        path = os.path.abspath(path)
+        name = os.path.basename(path)
+        if os.path.isdir(path):
+            files += [
+                (name + "/" + f, os.path.join(path, f))
+                for f in input_files(path)
+            ]
+        else:
+            files.append((name, path))
+    return files
+
+
+class NotebookCache(object):
+    """
+    On-disk store of executed notebooks, keyed by :meth:`key`. Files and
+    directories in ``extra_inputs`` are part of the key of every notebook.
+
+    .. code:: python
+
+        cache = NotebookCache()
+        key = cache.key(nb, 'python2', nbdir)
+        cached = cache.get(key)
+        if cached is not None:
+            replay(nb, cached)
+        else:
+            ...  # execute nb
+            cache.put(key, nb)
+
+    """
+
+    def __init__(self, cache_dir=None, maxsize=None, extra_inputs=None):
+        if cache_dir is None:
+            cache_dir = os.environ.get("NBCACHE_DIR", CACHE_DIR)
+        if maxsize is None:
+            maxsize = os.environ.get("NBCACHE_MAXSIZE", MAXSIZE)
+        self.cache_dir = os.path.abspath(os.path.expanduser(cache_dir))
+        self.maxsize = int(float(maxsize) * 1024**2)  # bytes
+        self.extra_inputs = list(extra_inputs or [])
+        self._digests = None
+
+    @property
+    def digest_file(self):
+        return os.path.join(self.cache_dir, "digests.json")
+
+    def _file_digest(self, path):
+        """
+        sha256 of a file, remembered by (size, mtime) so large data files
+        are only read again when they change
+        """
+        if self._digests is None:
+            try:
+                with open(self.digest_file) as f:
+                    self._digests = json.load(f)
+            except (IOError, ValueError):
+                self._digests = {}
+
+        path = os.path.abspath(path)
+        stat = os.stat(path)
+        stamp = [stat.st_size, stat.st_mtime]
+        known = self._digests.get(path)
+        if known is not None and known[0] == stamp:
+            return known[1]
+
+        sha = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1024**2), b""):
+                sha.update(chunk)
+        self._digests[path] = [stamp, sha.hexdigest()]
+        return sha.hexdigest()
+
+    def key(self, nb, kernel_name, nbdir, inputs=None):
+        """
+        Hash of the code cells, the kernel name, the input data files and
+        the shared inputs
+        """
+        if not kernel_name:
+            kernel_name = nb.metadata.get("kernelspec", {}).get("name", "")
+        if inputs is None:
+            inputs = input_files(nbdir)
+
+        sha = hashlib.sha256()
+        sha.update(u"kernel:{}\n".format(kernel_name).encode("utf-8"))
+        for cell in nb.cells:
+            if cell.cell_type == "code":
+                sha.update(u"cell:{}\n".format(len(cell.source)).encode(
+                    "utf-8"
+                ))
+                sha.update(cell.source.encode("utf-8"))
+        for f in inputs:
+            sha.update(u"file:{}:{}\n".format(
+                f, self._file_digest(os.path.join(nbdir, f))
+            ).encode("utf-8"))
+        for name, path in extra_files(self.extra_inputs):
+            sha.update(u"extra:{}:{}\n".format(
+                name, self._file_digest(path)
+            ).encode("utf-8"))
+
+        if self._digests is not None:
+            self._write_digests()
+        return sha.hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key + ".ipynb")
+
+    def _write_digests(self):
+        self._atomic_write(
+            self.digest_file, json.dumps(self._digests).encode("utf-8")
+        )
+
+    def _atomic_write(self, path, data):
+        if not os.path.isdir(self.cache_dir):
+            os.makedirs(self.cache_dir)
+        fd, tmp = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.rename(tmp, path)
+
+    def get(self, key):
+        """
+        Return the executed notebook stored under key, or None
+        """
+        path = self._path(key)
+        if not os.path.isfile(path):
+            return None
+        try:
+            with open(path) as f:
+                nb = nbformat.read(f, as_version=4)
+        except Exception:
+            return None
+        os.utime(path, None)  # mark as recently used
+        return nb
+
+    def put(self, key, nb):
+        """
+        Store an executed notebook and evict old entries beyond the size cap
+        """
+        self._atomic_write(
+            self._path(key), nbformat.writes(nb).encode("utf-8")
+        )
+        self.evict(keep=key)
+
+    def entries(self):
+        """
+        (path, size, last used) of every entry, oldest first
+        """
+        if not os.path.isdir(self.cache_dir):
+            return []
+        entries = []
+        for f in os.listdir(self.cache_dir):
+            if f.endswith(".ipynb"):
+                stat = os.stat(os.path.join(self.cache_dir, f))
+                entries.append((
+                    os.path.join(self.cache_dir, f), stat.st_size,
+                    stat.st_mtime
+                ))
+        return sorted(entries, key=lambda e: e[2])
+
+    def evict(self, keep=None):
+        """
+        Remove least recently used entries until the cache fits maxsize
+        """
+        entries = self.entries()
+        total = sum(e[1] for e in entries)
+        for path, size, _ in entries:
+            if total <= self.maxsize:
+                break
+            if keep is not None and path == self._path(keep):
+                continue
+            os.remove(path)
+            total -= size
+
+
+def replay(nb, cached):
+    """
+    Copy outputs and execution counts of a cached execution onto nb
+    """
+    code = [c for c in nb.cells if c.cell_type == "code"]
+    cached_code = [c for c in cached.cells if c.cell_type == "code"]
+    if len(code) != len(cached_code):
+        raise ValueError("cached notebook does not match the notebook")
+    for cell, cached_cell in zip(code, cached_code):
+        cell.outputs = cached_cell.outputs
+        cell.execution_count = cached_cell.execution_count
+    if "widgets" in cached.metadata:
+        nb.metadata["widgets"] = cached.metadata["widgets"]
+    return nb
+
+
+class CachedExecutePreprocessor(ExecutePreprocessor):
+    """
+    ExecutePreprocessor that replays outputs from a :class:`NotebookCache`
+    when the notebook has been executed before
+    """
+
+    cache = None
+
+    def preprocess(self, nb, resources=None, **kw):
+        if self.cache is None or not enabled():
+            return super(CachedExecutePreprocessor, self).preprocess(
+                nb, resources, **kw
+            )
+
+        nbdir = (resources or {}).get("metadata", {}).get("path") or "."
+        key = self.cache.key(nb, self.kernel_name, nbdir)
+        cached = self.cache.get(key)
+        if cached is not None:
+            return replay(nb, cached), resources
+
+        nb, resources = super(CachedExecutePreprocessor, self).preprocess(
+            nb, resources, **kw
+        )
+        self.cache.put(key, nb)
+        return nb, resources
+
+
+def builder_inited(app):
+    import nbconvert.preprocessors
+    CachedExecutePreprocessor.cache = NotebookCache(
+        app.config.nbcache_dir, app.config.nbcache_maxsize,
+        extra_inputs=[
+            os.path.join(app.confdir, path)
+            for path in app.config.nbcache_extra_inputs
+        ]
+    )
+    # nbsphinx looks the preprocessor up on nbconvert.preprocessors
+    nbconvert.preprocessors.ExecutePreprocessor = CachedExecutePreprocessor
+
+
+def setup(app):
+    app.add_config_value('nbcache_dir', None, 'env')
+    app.add_config_value('nbcache_maxsize', None, 'env')
+    app.add_config_value('nbcache_extra_inputs', [], 'env')
+    app.connect('builder-inited', builder_inited)
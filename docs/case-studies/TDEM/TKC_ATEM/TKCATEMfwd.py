@@ -1,54 +1,69 @@
+import os
+import sys
 import numpy as np
-import cPickle as pickle
+try:
+    import cPickle as pickle
+except ImportError:
+    import pickle
 from scipy.constants import mu_0
 from pymatsolver import PardisoSolver as Solver
 from SimPEG import EM, Mesh, Maps, Utils
 
+sys.path.append(
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..')
+)
+from casetools import datacache, tdemparallel
+from casetools.soundings import SoundingStore
+
 download_dir = '.'  # name of the local directory to create and put the files in.
+store_file = download_dir + "/TKCATEMfwd.h5"  # forward results, per sounding
+jobs = os.environ.get("NJOBS")  # worker processes, None: one per core
+batch_size = None  # soundings per batch, None: an even share per worker
+perc, floor = 0.05, 0.  # uncertainties, recorded for the inversion
+ds_every = 1  # the inversion uses every ds_every-th sounding
 
-root_url = 'https://storage.googleapis.com/simpeg/tkc_synthetic/atem/'
-files = ['TKCATEMexample.p']
-urls = [root_url + f for f in files]
+times = np.logspace(-4, np.log10(2e-3), 10)
+timeSteps = [(1e-5, 5), (1e-4, 10), (5e-4, 10)]
 
-downloads = Utils.download(url=urls, folder=download_dir, overwrite=True)
-downloads = dict(zip(['fwd_params'], downloads))  # create a dict
 
-TKCATEMexample = pickle.load(open(downloads['fwd_params'], "rb"))
+def load_example():
+    # listed in case-studies/casetools/manifest.json, only downloaded once
+    downloads = datacache.fetch(
+        'TKC_ATEM', folder=download_dir, keys=['fwd_params']
+    )
+    with open(downloads['fwd_params'], "rb") as f:
+        if sys.version_info[0] < 3:
+            return pickle.load(f)
+        return pickle.load(f, encoding="latin1")
 
-mesh = TKCATEMexample["mesh"]
-sigma = TKCATEMexample["sigma"]
-xyz = TKCATEMexample["xyz"]
-ntx = xyz.shape[0]
 
-# TDEM Survey
-srcLists = []
-times = np.logspace(-4, np.log10(2e-3), 10)
-for itx in range(ntx):
-    rx = EM.TDEM.Rx.Point_b(
-        xyz[itx, :].reshape([1, -1]), times, orientation='z'
-    )
-    src = EM.TDEM.Src.CircularLoop(
-        [rx], waveform=EM.TDEM.Src.StepOffWaveform(),
-        loc=xyz[itx, :].reshape([1, -1]), radius=13.
-    )
-    srcLists.append(src)
+if __name__ == "__main__":
+    TKCATEMexample = load_example()
+    mesh = TKCATEMexample["mesh"]
+    sigma = TKCATEMexample["sigma"]
+    xyz = TKCATEMexample["xyz"]
+    ntx = xyz.shape[0]
 
-# TDEM Problem
-survey = EM.TDEM.Survey(srcLists)
-problem = EM.TDEM.Problem3D_b(
-    mesh, verbose=False, sigmaMap=Maps.IdentityMap(mesh)
-)
-timeSteps = [(1e-5, 5), (1e-4, 10), (5e-4, 10)]
-problem.timeSteps = timeSteps
-problem.pair(survey)
-problem.Solver = Solver
-
-# Simulate
-dpred = survey.dpred(sigma)
-TKCATEMexample = {
-    "mesh": mesh, "sigma": sigma, "xyz": xyz, "ntx": tx,
-    "times": times, "timeSteps": problem.timeSteps, "dpred": dpred
-}
-pickle.dump(
-    TKCATEMexample, open(download_dir + "/TKCATEMfwd.p", "wb" )
-)
+    with SoundingStore(store_file, "a") as store:
+        # soundings of an interrupted run are kept only if the mesh, model
+        # and time channels have not changed since, otherwise they are
+        # removed and all soundings are simulated again
+        if store.write_model(mesh, sigma, times, timeSteps):
+            print("resuming with {} soundings".format(len(store.indices())))
+
+        def append(itxs, dpred):
+            for itx, d in zip(itxs, dpred):
+                store.append(itx, xyz[itx, :], d)
+            store.flush()
+            print("{} / {} soundings".format(len(store.indices()), ntx))
+
+        # Batches of CircularLoop sources are simulated in parallel, each
+        # worker re-uses its time-step factorizations for all its batches
+        todo = [itx for itx in range(ntx) if itx not in store]
+        tdemparallel.simulate(
+            mesh, sigma, xyz, times, timeSteps, Solver=Solver, jobs=jobs,
+            batch_size=batch_size, indices=todo, callback=append,
+            radius=13.
+        )
+
+        store.set_downsample(np.arange(0, ntx, ds_every), perc, floor)
@@ -1,21 +1,40 @@
+import argparse
+import os
+import sys
 import numpy as np
 from pymatsolver import Pardiso as Solver
 
 from SimPEG import EM, Mesh, Utils, Maps
 from SimPEG import DataMisfit, Regularization, Optimization, Directives, InvProblem, Inversion
 from scipy.constants import mu_0
-import cPickle as pickle
 
-TKCATEMexample = pickle.load( open( "./TKCATEMfwd.p", "rb" ) )
+sys.path.append(
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..')
+)
+from casetools import checkpoint
+from casetools.soundings import SoundingStore
 
-mesh = TKCATEMexample["mesh"]
-sigma = TKCATEMexample["sigma"]
-xyz = TKCATEMexample["xyz"]
-times = TKCATEMexample["times"]
-# timeSteps = TKCATEMexample["timeSteps_inv"]
-ntx = TKCATEMexample["ntx_ds"]
-dobs = TKCATEMexample["dobs_ds"]
-perc, floor = TKCATEMexample["perc"], TKCATEMexample["floor"]
+parser = argparse.ArgumentParser(description="Invert the TKC ATEM data")
+parser.add_argument(
+    "--resume", action="store_true",
+    help="continue from the latest checkpoint instead of starting over"
+)
+parser.add_argument(
+    "--checkpoint", default="TKCATEMinv_checkpoint.npz",
+    help="file the inversion state is saved to after every iteration"
+)
+args = parser.parse_args()
+
+# only the down-sampled soundings are read from the forward results
+with SoundingStore("./TKCATEMfwd.h5") as store:
+    mesh = store.read_mesh()
+    sigma = store.sigma
+    times = store.times
+    # the forward run stores noise-free predicted data, they are inverted
+    # as the observations
+    xyz, dobs = store.read(store.downsample, field="dpred")
+    perc, floor = store.uncertainty
+ntx = xyz.shape[0]
 
 # TDEM Survey
 srcLists = []
@@ -54,7 +73,8 @@ betaest = Directives.BetaEstimate_ByEig(beta0_ratio=1e0)
 save = Directives.SaveOutputEveryIteration()
 save_model = Directives.SaveModelEveryIteration()
 target = Directives.TargetMisfit()
-inv = Inversion.BaseInversion(invProb, directiveList=[beta, betaest, save, save_model,  target])
+save_state = checkpoint.SaveCheckpoint(fileName=args.checkpoint)
+inv = Inversion.BaseInversion(invProb, directiveList=[beta, betaest, save, save_model,  target, save_state])
 reg.alpha_s = 1e-2
 reg.alpha_x = 1.
 reg.alpha_y = 1.
@@ -62,7 +82,7 @@ reg.alpha_z = 1.
 problem.counter = opt.counter = Utils.Counter()
 opt.LSshorten = 0.5
 
-mopt = inv.run(m0)
+mopt = checkpoint.run(inv, m0, resume=args.resume)
 sigopt = mapping*mopt
 
 np.save("sigest", sigopt)
@@ -0,0 +1,13 @@
+"""
+Tools shared by the case studies.
+
+The notebooks add the ``case-studies`` folder to their path and import the
+modules from here, e.g.
+
+.. code:: python
+
+    import sys
+    sys.path.append('..')
+    from casetools import datacache
+
+"""
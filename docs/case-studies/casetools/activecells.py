@@ -0,0 +1,159 @@
+"""
+Active cells of a tensor mesh below a topography, computed once per column.
+
+``Utils.surface2ind_topo`` tests every cell against the topography in Python
+loops, and the notebooks then turn the mask into indices with another loop
+over every cell. On a tensor mesh the active cells of a column are the ones
+below the topography at that column, so only the number of active cells of
+each column is needed: the topography is looked up with a k-d tree at the
+nodes (or cell centres) of the horizontal grid, the count of each column is
+found by a binary search in the vertical grid, and the mask and indices
+follow. The counts are kept on disk, keyed by the mesh and the topography.
+
+.. code:: python
+
+    actv, inds = activecells.active(mesh, topo)  # as surface2ind_topo(mesh, topo, 'N')
+    mesh2D, topoCC = activecells.topography(mesh, actv)
+
+"""
+import hashlib
+import os
+import tempfile
+
+import numpy as np
+from scipy.interpolate import interp1d
+from scipy.spatial import cKDTree
+from SimPEG import Mesh, Utils
+
+CACHE_DIR = '.topocache'
+
+
+def _check(mesh, gridLoc):
+    if mesh._meshType not in ['TENSOR', 'BASETENSOR']:
+        raise NotImplementedError(
+            "Active cells from topography are only implemented for tensor "
+            "meshes, not {}".format(mesh._meshType)
+        )
+    if mesh.dim not in [2, 3]:
+        raise NotImplementedError(
+            "Active cells from topography are not implemented for 1D meshes"
+        )
+    if gridLoc not in ['N', 'CC']:
+        raise ValueError("gridLoc must be 'N' or 'CC', not {!r}".format(gridLoc))
+
+
+def surface(mesh, topo, gridLoc='N'):
+    """
+    Topography at the nodes (gridLoc='N') or the cell centres ('CC') of the
+    horizontal grid of mesh: the nearest point of topo in 3D, linearly
+    interpolated in 2D. Shape (nNx, nNy) (or (nCx, nCy)), (nNx,) in 2D.
+    """
+    _check(mesh, gridLoc)
+    topo = np.asarray(topo, dtype=float)
+    vectors = [
+        getattr(mesh, 'vector' + gridLoc + 'xyz'[i]) for i in range(mesh.dim-1)
+    ]
+    if mesh.dim == 2:
+        Ftopo = interp1d(topo[:, 0], topo[:, 1], fill_value='extrapolate')
+        return Ftopo(vectors[0])
+    _, ind = cKDTree(topo[:, :2]).query(Utils.ndgrid(*vectors))
+    return topo[ind, 2].reshape([len(v) for v in vectors], order='F')
+
+
+def column_counts(mesh, topo, gridLoc='N'):
+    """
+    Number of active cells of each column of mesh (x fastest), the cells
+    counted from the bottom. With gridLoc='N' a cell is active when the
+    topography at all the corners of its column is above its top (as
+    ``Utils.surface2ind_topo(mesh, topo, 'N')``), with 'CC' when its centre
+    is below the topography at the centre of its column.
+    """
+    top = surface(mesh, topo, gridLoc)
+    axis = 'xyz'[mesh.dim-1]
+    if gridLoc == 'CC':
+        z = getattr(mesh, 'vectorCC' + axis)
+        return np.searchsorted(z, Utils.mkvc(top), side='right')
+    # tops of the cells
+    z = getattr(mesh, 'vectorN' + axis)[1:]
+    if mesh.dim == 2:
+        # strictly below, as surface2ind_topo
+        return np.searchsorted(z, np.minimum(top[:-1], top[1:]), side='left')
+    corners = np.minimum(
+        np.minimum(top[:-1, :-1], top[1:, :-1]),
+        np.minimum(top[:-1, 1:], top[1:, 1:])
+    )
+    return np.searchsorted(z, Utils.mkvc(corners), side='right')
+
+
+def mask(mesh, counts):
+    """
+    Active cells (boolean, nC) of mesh from the counts of its columns
+    """
+    counts = np.asarray(counts)
+    nz = mesh.vnC[-1]
+    return Utils.mkvc(np.arange(nz)[None, :] < counts[:, None])
+
+
+def key(mesh, topo, gridLoc='N'):
+    """
+    Hash of the mesh, the topography and the grid it is looked up at
+    """
+    sha = hashlib.sha256()
+    for h in mesh.h:
+        sha.update(np.ascontiguousarray(h, dtype=float).tobytes())
+    sha.update(np.ascontiguousarray(mesh.x0, dtype=float).tobytes())
+    sha.update(np.ascontiguousarray(topo, dtype=float).tobytes())
+    sha.update(u"{}\n".format(gridLoc).encode('utf-8'))
+    return sha.hexdigest()
+
+
+def active(mesh, topo, gridLoc='N', cache_dir=None):
+    """
+    (actv, inds), the active cells of mesh below the topography topo
+    ((n, 3) or (n, 2) points) as a boolean mask and as indices. The counts of
+    the columns are cached in cache_dir (default: .topocache).
+    """
+    topo = np.asarray(topo, dtype=float)
+    if cache_dir is None:
+        cache_dir = CACHE_DIR
+    cache_dir = os.path.abspath(os.path.expanduser(cache_dir))
+    path = os.path.join(cache_dir, key(mesh, topo, gridLoc) + '.npy')
+
+    if os.path.isfile(path):
+        counts = np.load(path)
+    else:
+        counts = column_counts(mesh, topo, gridLoc)
+        if not os.path.isdir(cache_dir):
+            os.makedirs(cache_dir)
+        fd, tmp = tempfile.mkstemp(dir=cache_dir, suffix='.npy')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                np.save(f, counts)
+            os.rename(tmp, path)
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+
+    actv = mask(mesh, counts)
+    return actv, np.flatnonzero(actv)
+
+
+def topography(mesh, actv):
+    """
+    (mesh2D, topoCC), the horizontal mesh of a 3D tensor mesh and the
+    elevation of the centre of the top active cell of each of its columns
+    (nan where a column has no active cell)
+    """
+    actv = np.asarray(actv)
+    if actv.dtype != bool:
+        inds, actv = actv, np.zeros(mesh.nC, dtype=bool)
+        actv[inds] = True
+    mesh2D = Mesh.TensorMesh([mesh.h[0], mesh.h[1]], mesh.x0[:2])
+    shape = (mesh.vnC[0]*mesh.vnC[1], mesh.vnC[2])
+    ZC = np.where(
+        actv.reshape(shape, order='F'),
+        mesh.gridCC[:, 2].reshape(shape, order='F'), -np.inf
+    )
+    topoCC = ZC.max(axis=1)
+    topoCC[np.isinf(topoCC)] = np.nan
+    return mesh2D, topoCC
@@ -0,0 +1,264 @@
+"""
+Checkpoint and resume long inversions.
+
+:class:`SaveCheckpoint` is an inversion directive that writes the state of
+the inversion to a ``.npz`` file at the end of every ``every``-th iteration:
+the model, beta, the optimizer iteration, stopping-criteria values and
+counters, the state of the other directives (e.g. the IRLS stage of
+``Update_IRLS``) and of the regularization. The file is replaced atomically,
+so a job that is killed while writing leaves the previous checkpoint intact.
+
+:func:`run` starts the inversion, or continues it from the checkpoint so the
+iterations that were already done are not computed again:
+
+.. code:: python
+
+    checkpoint = SaveCheckpoint(fileName='inversion.npz')
+    inv = Inversion.BaseInversion(
+        invProb, directiveList=[beta, betaest, target, checkpoint]
+    )
+    mopt = run(inv, m0, resume=True)  # picks up inversion.npz if it exists
+
+"""
+from __future__ import print_function
+
+import json
+import os
+import tempfile
+
+import numpy as np
+import scipy.sparse as sp
+from SimPEG import Directives, Utils
+
+# optimizer attributes that carry over between iterations, including the
+# BFGS memory of the quasi-Newton optimizers
+OPT_ATTRS = [
+    'iter', 'f0', 'g0', 'f_last', 'x_last', 'stopNextIteration',
+    'g_last', '_bfgscnt', '_bfgsY', '_bfgsS'
+]
+
+# state of the (sparse) regularization and its objective functions
+REG_ATTRS = ['norms', 'eps_p', 'eps_q', 'gamma', 'norm', 'epsilon', 'model']
+
+
+def _is_state(value):
+    if isinstance(value, (bool, int, float, str, np.number, np.ndarray)):
+        return True
+    if isinstance(value, (list, tuple)):
+        return all(isinstance(v, (bool, int, float, np.number)) for v in value)
+    return False
+
+
+class _State(object):
+    """
+    Flat store of named values: arrays go in the npz, the rest in json
+    """
+
+    def __init__(self, arrays=None, meta=None):
+        self.arrays = arrays if arrays is not None else {}
+        self.meta = meta if meta is not None else {}
+
+    def set(self, name, value):
+        if isinstance(value, np.ndarray) and value.ndim > 0:
+            self.arrays[name] = value
+        elif isinstance(value, (list, tuple)):
+            self.meta[name] = [np.asarray(v).item() for v in value]
+        else:
+            self.meta[name] = np.asarray(value).item()
+
+    def items(self, prefix):
+        for name, value in list(self.meta.items()) + list(self.arrays.items()):
+            if name.startswith(prefix):
+                yield name[len(prefix):], value
+
+    def save(self, fileName):
+        dirname = os.path.dirname(os.path.abspath(fileName))
+        fd, tmp = tempfile.mkstemp(dir=dirname, suffix='.npz')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                np.savez(
+                    f, _meta=np.array(json.dumps(self.meta, sort_keys=True)),
+                    **self.arrays
+                )
+            os.rename(tmp, fileName)
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+
+    @classmethod
+    def load(cls, fileName):
+        with np.load(fileName) as f:
+            arrays = dict((k, f[k]) for k in f.files if k != '_meta')
+            meta = json.loads(str(f['_meta']))
+        return cls(arrays, meta)
+
+
+def _reg_objects(reg, name='reg'):
+    """
+    The regularization and, recursively, the objective functions it combines
+    """
+    yield name, reg
+    for i, objfct in enumerate(getattr(reg, 'objfcts', None) or []):
+        for item in _reg_objects(objfct, '{}.{}'.format(name, i)):
+            yield item
+
+
+def save_state(inv, fileName, m0):
+    """
+    Write the state of a running inversion, started from m0, to fileName
+    """
+    invProb, opt = inv.invProb, inv.invProb.opt
+    state = _State()
+    state.set('m0', m0)
+    state.set('model', opt.xc)
+    state.set('beta', invProb.beta)
+    if getattr(invProb, 'phi_m_last', None) is not None:
+        state.set('invProb.phi_m_last', invProb.phi_m_last)
+
+    for attr in OPT_ATTRS:
+        if getattr(opt, attr, None) is not None:
+            state.set('opt.' + attr, getattr(opt, attr))
+    counter = getattr(opt, 'counter', None)
+    if counter is not None:
+        state.meta['counter'] = counter._countList
+
+    # Jacobi preconditioner, e.g. from Update_lin_PreCond
+    approxHinv = getattr(opt, '_approxHinv', None)
+    if approxHinv is not None and sp.issparse(approxHinv):
+        diag = approxHinv.diagonal()
+        if approxHinv.nnz == np.count_nonzero(diag):
+            state.set('approxHinv', diag)
+
+    for i, directive in enumerate(inv.directiveList.dList):
+        if isinstance(directive, SaveCheckpoint):
+            continue
+        for attr, value in vars(directive).items():
+            if not attr.startswith('__') and _is_state(value):
+                state.set('directive.{}.{}'.format(i, attr), value)
+
+    for name, obj in _reg_objects(invProb.reg):
+        for attr in REG_ATTRS:
+            value = getattr(obj, attr, None)
+            if value is not None and _is_state(value):
+                state.set('{}.{}'.format(name, attr), value)
+
+    state.save(fileName)
+
+
+def _restore(obj, name, value):
+    if isinstance(value, np.ndarray) and value.ndim == 0:
+        value = value.item()
+    setattr(obj, name, value)
+
+
+def restore_state(inv, state):
+    """
+    Put a saved state back on an initialized inversion. Returns the model
+    """
+    invProb, opt = inv.invProb, inv.invProb.opt
+    invProb.beta = state.meta['beta']
+    if 'invProb.phi_m_last' in state.meta:
+        invProb.phi_m_last = state.meta['invProb.phi_m_last']
+
+    for i, directive in enumerate(inv.directiveList.dList):
+        for attr, value in state.items('directive.{}.'.format(i)):
+            _restore(directive, attr, value)
+
+    # outer objects first, their observers mirror values to the inner ones
+    for name, obj in _reg_objects(invProb.reg):
+        for attr in REG_ATTRS:
+            key = '{}.{}'.format(name, attr)
+            if key in state.arrays:
+                _restore(obj, attr, state.arrays[key])
+            elif key in state.meta:
+                _restore(obj, attr, state.meta[key])
+
+    counter = getattr(opt, 'counter', None)
+    if counter is not None:
+        counter._countList.update(state.meta.get('counter', {}))
+
+    if 'approxHinv' in state.arrays:
+        opt.approxHinv = Utils.sdiag(state.arrays['approxHinv'])
+
+    return state.arrays['model']
+
+
+class SaveCheckpoint(Directives.InversionDirective):
+    """
+    Save the inversion state every `every` iterations, and when it finishes
+    """
+
+    fileName = 'checkpoint.npz'
+    every = 1
+    m0 = None
+
+    def initialize(self):
+        # the starting model sets up the regularization (mref) and the
+        # optimizer (bfgsH0), a resumed run starts up from it again
+        if self.m0 is None:
+            self.m0 = self.invProb.model.copy()
+
+    def endIter(self):
+        if self.opt.iter % self.every == 0:
+            save_state(self.inversion, self.fileName, self.m0)
+
+    def finish(self):
+        save_state(self.inversion, self.fileName, self.m0)
+
+
+def resume_from(inv, fileName):
+    """
+    Continue an inversion from the checkpoint in fileName
+    """
+    state = _State.load(fileName)
+    invProb, opt = inv.invProb, inv.invProb.opt
+
+    invProb.startup(state.arrays['m0'])
+    for directive in inv.directiveList.dList:
+        if isinstance(directive, SaveCheckpoint):
+            directive.m0 = state.arrays['m0']
+        # beta comes from the checkpoint, do not estimate it again
+        if not isinstance(directive, Directives.BetaEstimate_ByEig):
+            directive.initialize()
+    m = restore_state(inv, state)
+
+    opt_state = dict(state.items('opt.'))
+    print(
+        'Resuming the inversion at iteration {} from {}'.format(
+            opt_state.get('iter', 0), fileName
+        )
+    )
+
+    # minimize starts from iteration 0, put the saved counters back after
+    # its startup so beta cooling, IRLS and maxIter carry on where they were
+    startup = opt.startup
+
+    def resumed_startup(x0):
+        startup(x0)
+        for attr, value in opt_state.items():
+            _restore(opt, attr, value)
+
+    opt.startup = resumed_startup
+    try:
+        inv.m = opt.minimize(invProb.evalFunction, m)
+    finally:
+        del opt.startup
+    inv.directiveList.call('finish')
+    return inv.m
+
+
+def run(inv, m0, fileName=None, resume=False):
+    """
+    Run the inversion from m0, or with resume=True continue it from the
+    checkpoint in fileName (default: the file of the SaveCheckpoint
+    directive) when there is one
+    """
+    if fileName is None:
+        savers = [
+            d for d in inv.directiveList.dList
+            if isinstance(d, SaveCheckpoint)
+        ]
+        fileName = savers[0].fileName if savers else SaveCheckpoint.fileName
+    if resume and os.path.isfile(fileName):
+        return resume_from(inv, fileName)
+    return inv.run(m0)
@@ -0,0 +1,432 @@
+"""
+Compressed forward operators for the potential field integral problems.
+
+Two representations of G, both with a tolerance knob ``tol``:
+
+* ``'wavelet'``: every row of G is taken to a 3D Haar wavelet basis over the
+  tensor mesh, where the smooth potential field kernels are sparse, and its
+  smallest coefficients are dropped so that the row keeps all but tol**2 of
+  its energy (a relative error of at most tol per row). The rows are computed
+  block by block, straight from the kernel, so the dense G is never formed.
+  G.dot(m) is a sparse product with the wavelet transform of m.
+* ``'aca'``: adaptive cross approximation, G ~ U V, built from a few rows and
+  columns evaluated straight from the kernel of
+  :mod:`casetools.sensitivity` until the next cross adds less than tol of
+  the approximation. G is never formed, nor stored.
+
+Products cost in proportion to the size of the compressed operator.
+
+.. code:: python
+
+    G = compression.attach(prob, tol=1e-2, method='wavelet', jobs=4)
+    compression.report(G, dense)  # compression ratio and relative error
+    wr = G.weights()
+
+"""
+from __future__ import print_function
+
+import multiprocessing
+
+import numpy as np
+import scipy.sparse as sp
+from SimPEG import PF
+
+from . import sensitivity
+
+METHODS = ['wavelet', 'aca']
+
+
+def haar(a, axis=-1):
+    """
+    Orthonormal multi-level Haar transform of a along axis. Odd lengths are
+    handled by carrying the last sample to the next level.
+    """
+    a = np.moveaxis(np.array(a, dtype=float), axis, -1)
+    n = a.shape[-1]
+    while n > 1:
+        h = n // 2
+        s = (a[..., 0:2*h:2] + a[..., 1:2*h:2]) / np.sqrt(2.)
+        d = (a[..., 0:2*h:2] - a[..., 1:2*h:2]) / np.sqrt(2.)
+        a[..., :n] = np.concatenate([s, a[..., 2*h:n], d], axis=-1)
+        n = n - h
+    return np.moveaxis(a, -1, axis)
+
+
+def ihaar(a, axis=-1):
+    """
+    Inverse (and transpose) of :func:`haar`
+    """
+    a = np.moveaxis(np.array(a, dtype=float), axis, -1)
+    lengths = []
+    n = a.shape[-1]
+    while n > 1:
+        lengths.append(n)
+        n = n - n // 2
+    for n in lengths[::-1]:
+        h = n // 2
+        s, rest, d = a[..., :h], a[..., h:n-h], a[..., n-h:n]
+        out = np.empty(a.shape[:-1] + (n,))
+        out[..., 0:2*h:2] = (s + d) / np.sqrt(2.)
+        out[..., 1:2*h:2] = (s - d) / np.sqrt(2.)
+        out[..., 2*h:n] = rest
+        a[..., :n] = out
+    return np.moveaxis(a, -1, axis)
+
+
+class WaveletTransform(object):
+    """
+    3D Haar transform of models on the active cells inds of a tensor mesh
+    with shape vnC, for ncomp stacked components. The inactive cells are
+    zero, so the transform W maps nC active values to ncomp*prod(vnC)
+    coefficients and W.T is its left inverse.
+    """
+
+    def __init__(self, vnC, inds, ncomp=1):
+        self.vnC = tuple(int(n) for n in vnC)
+        self.inds = np.asarray(inds, dtype=int)
+        self.ncomp = ncomp
+
+    @property
+    def nC(self):
+        return self.ncomp*len(self.inds)
+
+    @property
+    def nW(self):
+        return self.ncomp*int(np.prod(self.vnC))
+
+    def _grid(self, rows):
+        # cells are numbered x fastest, as in the mesh
+        return rows.reshape(
+            (rows.shape[0], self.ncomp) + self.vnC[::-1]
+        )
+
+    def forward(self, v):
+        """
+        Coefficients of models v, (nC,) or (nrows, nC)
+        """
+        v = np.asarray(v, dtype=float)
+        rows = np.atleast_2d(v)
+        full = np.zeros((rows.shape[0], self.ncomp, np.prod(self.vnC)))
+        full[:, :, self.inds] = rows.reshape(rows.shape[0], self.ncomp, -1)
+        full = self._grid(full)
+        for axis in [2, 3, 4]:
+            full = haar(full, axis)
+        full = full.reshape(rows.shape[0], -1)
+        return full[0] if v.ndim == 1 else full
+
+    def adjoint(self, w):
+        """
+        Models on the active cells of coefficients w, (nW,) or (nrows, nW)
+        """
+        w = np.asarray(w, dtype=float)
+        rows = self._grid(np.atleast_2d(w))
+        for axis in [2, 3, 4]:
+            rows = ihaar(rows, axis)
+        rows = rows.reshape(rows.shape[0], self.ncomp, -1)[:, :, self.inds]
+        rows = rows.reshape(rows.shape[0], -1)
+        return rows[0] if w.ndim == 1 else rows
+
+
+def transform(prob):
+    """
+    WaveletTransform of the model space of an integral problem
+    """
+    ncomp = 1
+    if isinstance(prob, PF.Magnetics.MagneticVector):
+        ncomp = 3
+    return WaveletTransform(
+        prob.mesh.vnC, sensitivity.active_index(prob), ncomp=ncomp
+    )
+
+
+def threshold(rows, tol):
+    """
+    Sparse copy of rows keeping, in each row, the largest entries that hold
+    at least 1 - tol**2 of its energy
+    """
+    energy = rows**2.
+    ordered = -np.sort(-energy, axis=1)
+    kept = np.cumsum(ordered, axis=1)
+    total = kept[:, -1:]
+    n = np.sum(kept < (1. - tol**2.)*total, axis=1)
+    n = np.minimum(n, rows.shape[1]-1)
+    cutoff = ordered[np.arange(rows.shape[0]), n]
+    return sp.csr_matrix(np.where(energy >= cutoff[:, None], rows, 0.))
+
+
+class WaveletOperator(sensitivity.Operator):
+    """
+    G = Gw W, with the rows of G thresholded in the wavelet domain
+    """
+
+    def __init__(self, Gw, W, sumsq=None):
+        self.Gw = Gw.tocsr()
+        self.W = W
+        self.sumsq = sumsq
+
+    @property
+    def shape(self):
+        return (self.Gw.shape[0], self.W.nC)
+
+    @property
+    def nbytes(self):
+        return (
+            self.Gw.data.nbytes + self.Gw.indices.nbytes +
+            self.Gw.indptr.nbytes
+        )
+
+    def dot(self, m):
+        return self.Gw.dot(self.W.forward(np.asarray(m).T).T)
+
+    def rdot(self, r):
+        return self.W.adjoint(self.Gw.T.dot(r).T).T
+
+
+class LowRankOperator(sensitivity.Operator):
+    """
+    G = U V
+    """
+
+    def __init__(self, U, V, sumsq=None):
+        self.U, self.V = U, V
+        self.sumsq = sumsq
+        if sumsq is None:
+            self.sumsq = np.sum(V*U.T.dot(U).dot(V), axis=0)
+
+    @property
+    def shape(self):
+        return (self.U.shape[0], self.V.shape[1])
+
+    @property
+    def rank(self):
+        return self.U.shape[1]
+
+    @property
+    def nbytes(self):
+        return self.U.nbytes + self.V.nbytes
+
+    def dot(self, m):
+        return self.U.dot(self.V.dot(m))
+
+    def rdot(self, r):
+        return self.V.T.dot(self.U.T.dot(r))
+
+
+# state of a worker process, set up once by _init_worker
+_worker = {}
+
+
+def _init_worker(kernel, W, tol):
+    _worker.update(kernel=kernel, W=W, tol=tol)
+
+
+def _compress(rows):
+    i0, i1 = rows
+    block = _worker['kernel'](i0, i1)
+    return (
+        i0, threshold(_worker['W'].forward(block), _worker['tol']),
+        (block**2.).sum(axis=0)
+    )
+
+
+def wavelet(kernel, W, tol=1e-2, jobs=None, block_size=None):
+    """
+    WaveletOperator of the rows of kernel, computed block_size megabytes of
+    rows at a time on jobs processes (default: one per core)
+    """
+    n = sensitivity.rows_per_block(W.nW, block_size)
+    tasks = [
+        (i0, min(i0+n, kernel.shape[0]))
+        for i0 in range(0, kernel.shape[0], n)
+    ]
+    if jobs is None:
+        jobs = multiprocessing.cpu_count()
+    jobs = max(min(int(jobs), len(tasks)), 1)
+
+    blocks = {}
+    sumsq = np.zeros(kernel.shape[1])
+
+    def collect(result):
+        i0, Gw, s = result
+        blocks[i0] = Gw
+        sumsq[:] += s
+
+    if jobs == 1:
+        _init_worker(kernel, W, tol)
+        try:
+            for rows in tasks:
+                collect(_compress(rows))
+        finally:
+            _worker.clear()
+    else:
+        pool = multiprocessing.Pool(
+            jobs, initializer=_init_worker, initargs=(kernel, W, tol)
+        )
+        try:
+            for result in pool.imap_unordered(_compress, tasks):
+                collect(result)
+            pool.close()
+        except BaseException:
+            pool.terminate()
+            raise
+        finally:
+            pool.join()
+
+    Gw = sp.vstack([blocks[i0] for i0, _ in tasks], format='csr')
+    return WaveletOperator(Gw, W, sumsq=sumsq)
+
+
+def aca(G, tol=1e-2, max_rank=None, nsample=20, seed=0):
+    """
+    LowRankOperator of G (an array, a
+    :class:`~casetools.sensitivity.SensitivityStore` or a kernel of
+    :mod:`casetools.sensitivity`) by adaptive cross approximation with
+    partial pivoting. Only the rows and columns of the crosses, and the
+    sampled rows, are read or evaluated.
+
+    The rows of a potential field operator peak under their receiver, so a
+    small cross does not mean the rest of G is approximated: before stopping,
+    the residual of nsample random rows is checked, and the worst of them
+    seeds the next cross when they are not within tol.
+    """
+    sumsq = getattr(G, 'sumsq', None)
+    if isinstance(G, sensitivity.BaseKernel):
+        kernel = G
+
+        def rows(inds):
+            return np.vstack([kernel(i, i+1) for i in inds])
+
+        def column(j):
+            return kernel.columns(j, j+1)[:, 0]
+    else:
+        if isinstance(G, sensitivity.SensitivityStore):
+            G = G.G
+
+        def rows(inds):
+            return np.asarray(G[inds, :], dtype=float)
+
+        def column(j):
+            return np.asarray(G[:, j], dtype=float)
+
+    nD, nC = G.shape
+    if max_rank is None:
+        max_rank = min(nD, nC)
+    rng = np.random.RandomState(seed)
+
+    U = np.zeros((nD, 0))
+    V = np.zeros((0, nC))
+    norm2 = 0.
+    used = np.zeros(nD, dtype=bool)
+    i = 0
+    while U.shape[1] < max_rank and not used.all():
+        used[i] = True
+        row = rows([i])[0] - U[i, :].dot(V)
+        j = np.argmax(np.abs(row))
+        if row[j] == 0.:
+            i = np.where(~used)[0][0]
+            continue
+        v = row / row[j]
+        u = column(j) - U.dot(V[:, j])
+
+        # Frobenius norm of the approximation, updated with the new cross
+        norm2 += (
+            2.*np.sum(U.T.dot(u)*V.dot(v)) + u.dot(u)*v.dot(v)
+        )
+        U = np.c_[U, u]
+        V = np.r_[V, v[None, :]]
+
+        score = np.abs(u)
+        score[used] = -1.
+        i = np.argmax(score)
+
+        if np.sqrt(u.dot(u)*v.dot(v)) > tol*np.sqrt(norm2):
+            continue
+
+        # estimate the remaining error from a sample of the other rows
+        sample = np.where(~used)[0]
+        if len(sample) == 0:
+            break
+        sample = np.sort(
+            rng.choice(sample, min(nsample, len(sample)), replace=False)
+        )
+        residual = rows(sample) - U[sample, :].dot(V)
+        residual = np.sum(residual**2., axis=1)
+        if residual.mean()*(nD-used.sum()) <= tol**2.*norm2:
+            break
+        i = sample[np.argmax(residual)]
+
+    # without a store, the column sums of G**2 are those of U V
+    return LowRankOperator(U, V, sumsq=sumsq)
+
+
+#: keyword arguments of each method, see :func:`compress`
+KWARGS = {
+    'wavelet': ['jobs', 'block_size'],
+    'aca': ['jobs', 'block_size', 'max_rank', 'nsample', 'seed'],
+}
+
+
+def compress(prob, tol=1e-2, method='wavelet', **kwargs):
+    """
+    Compressed forward operator of a paired integral problem, computed from
+    its kernel. The keyword arguments of each method are listed in KWARGS:
+    jobs and block_size for 'wavelet' (see :func:`wavelet`); max_rank,
+    nsample and seed for 'aca' (see :func:`aca`). 'aca' evaluates one row
+    or column at a time in this process: it ignores jobs and block_size,
+    so the methods can be swapped in the same call.
+    """
+    if method not in METHODS:
+        raise ValueError(
+            "method must be one of {}, not {!r}".format(METHODS, method)
+        )
+    unknown = sorted(set(kwargs) - set(KWARGS[method]))
+    if unknown:
+        raise TypeError(
+            "method {!r} takes the keyword arguments {}, not {}".format(
+                method, KWARGS[method], unknown
+            )
+        )
+    if method == 'wavelet':
+        return wavelet(
+            sensitivity.kernel(prob), transform(prob), tol=tol, **kwargs
+        )
+    kwargs.pop('jobs', None)
+    kwargs.pop('block_size', None)
+    return aca(sensitivity.kernel(prob), tol=tol, **kwargs)
+
+
+def attach(prob, tol=1e-2, method='wavelet', **kwargs):
+    """
+    Compress the forward operator of a paired integral problem and use it as
+    prob.G
+    """
+    if not prob.ispaired:
+        raise Exception('Need to pair!')
+    G = compress(prob, tol=tol, method=method, **kwargs)
+    prob._G = G
+    return G
+
+
+def report(G, reference, m=None, verbose=True):
+    """
+    Compression ratio of G and the relative error of G.dot(m) and G.T.dot(r)
+    against a dense reference, for a model m (default: uniform) and random
+    residuals r
+    """
+    if m is None:
+        m = np.ones(G.shape[1])
+    r = np.random.RandomState(0).randn(G.shape[0])
+
+    d = reference.dot(m)
+    g = reference.T.dot(r)
+    out = {
+        'ratio': float(reference.shape[0]*reference.shape[1]*8) / G.nbytes,
+        'forward': np.linalg.norm(G.dot(m) - d) / np.linalg.norm(d),
+        'adjoint': np.linalg.norm(G.T.dot(r) - g) / np.linalg.norm(g),
+    }
+    if verbose:
+        print(
+            "Compression ratio: {ratio:.1f}, relative error: "
+            "{forward:.2e} (G m), {adjoint:.2e} (G.T r)".format(**out)
+        )
+    return out
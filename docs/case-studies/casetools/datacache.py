@@ -0,0 +1,335 @@
+"""
+Local, content-addressed cache of the case-study data files.
+
+The files each case study needs are listed in ``manifest.json`` next to this
+module. A file is stored once, under its SHA-256, in ``GEOSCI_DATA_CACHE``
+(default ``~/.cache/geosci-computation/data``) and linked (or copied) into
+the folder of the notebook that asked for it, so re-running a notebook does
+not fetch anything again.
+
+Files missing from the cache are taken from ``GEOSCI_DATA_MIRROR`` when it
+is set, a directory laid out like the bucket (``<mirror>/simpeg/...``), and
+downloaded otherwise. Files with a checksum in the manifest are verified;
+files without one are trusted the first time they are fetched and pinned by
+that checksum afterwards.
+
+To fill the cache ahead of time, e.g. on a build node without network access
+later on::
+
+    python -m casetools.datacache            # every case study
+    python -m casetools.datacache TKC_PF     # only some
+    python -m casetools.datacache --list
+
+"""
+from __future__ import print_function
+
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import stat
+import sys
+import tempfile
+from collections import OrderedDict
+
+try:
+    from urllib.request import urlopen
+    from urllib.parse import urlparse
+except ImportError:  # python 2
+    from urllib2 import urlopen
+    from urlparse import urlparse
+
+MANIFEST = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "manifest.json"
+)
+CACHE_DIR = os.path.join("~", ".cache", "geosci-computation", "data")
+
+
+class ChecksumError(IOError):
+    pass
+
+
+def load_manifest(path=MANIFEST):
+    with open(path) as f:
+        return json.load(f, object_pairs_hook=OrderedDict)
+
+
+def sha256(path):
+    sha = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024**2), b""):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+
+class DataCache(object):
+    """
+    Store of downloaded files, keyed by URL and SHA-256.
+
+    .. code:: python
+
+        cache = DataCache()
+        path = cache.get(url)            # trusted on first use
+        path = cache.get(url, sha256)    # verified
+    """
+
+    def __init__(self, cache_dir=None, mirror=None):
+        if cache_dir is None:
+            cache_dir = os.environ.get("GEOSCI_DATA_CACHE", CACHE_DIR)
+        if mirror is None:
+            mirror = os.environ.get("GEOSCI_DATA_MIRROR")
+        self.cache_dir = os.path.abspath(os.path.expanduser(cache_dir))
+        self.mirror = mirror and os.path.abspath(os.path.expanduser(mirror))
+
+    @property
+    def index_file(self):
+        return os.path.join(self.cache_dir, "urls.json")
+
+    def _index(self):
+        try:
+            with open(self.index_file) as f:
+                return json.load(f)
+        except (IOError, ValueError):
+            return {}
+
+    def _blob(self, digest):
+        return os.path.join(self.cache_dir, "sha256", digest[:2], digest)
+
+    def _tmpfile(self):
+        if not os.path.isdir(self.cache_dir):
+            os.makedirs(self.cache_dir)
+        return tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+
+    def _remember(self, url, digest):
+        # workers may share the cache, re-read the index right before
+        # writing it and replace it in one go
+        index = self._index()
+        index[url] = digest
+        fd, tmp = self._tmpfile()
+        with os.fdopen(fd, "w") as f:
+            json.dump(index, f, indent=1, sort_keys=True)
+        os.rename(tmp, self.index_file)
+
+    def lookup(self, url, digest=None):
+        """
+        Path of the cached file for url, or None if it is not cached
+        """
+        if digest is None:
+            digest = self._index().get(url)
+        if digest is None:
+            return None
+        path = self._blob(digest)
+        return path if os.path.isfile(path) else None
+
+    def mirror_path(self, url):
+        if not self.mirror:
+            return None
+        parts = urlparse(url).path.lstrip("/").split("/")
+        path = os.path.join(self.mirror, *parts)
+        return path if os.path.isfile(path) else None
+
+    def get(self, url, digest=None):
+        """
+        Path of the cached file for url, fetched from the mirror or the
+        network if it is not cached yet
+        """
+        path = self.lookup(url, digest)
+        if path is not None:
+            return path
+
+        fd, tmp = self._tmpfile()
+        sha = hashlib.sha256()
+        try:
+            with os.fdopen(fd, "wb") as f:
+                source = self.mirror_path(url)
+                if source is not None:
+                    src = open(source, "rb")
+                else:
+                    print("Downloading {}".format(url))
+                    try:
+                        src = urlopen(url)
+                    except IOError as err:
+                        raise IOError(
+                            "Could not download {} ({}). Set "
+                            "GEOSCI_DATA_MIRROR to a local copy of the bucket "
+                            "or prefetch the data with "
+                            "`python -m casetools.datacache`".format(url, err)
+                        )
+                try:
+                    for chunk in iter(lambda: src.read(1024**2), b""):
+                        sha.update(chunk)
+                        f.write(chunk)
+                finally:
+                    src.close()
+
+            if digest is not None and sha.hexdigest() != digest:
+                raise ChecksumError(
+                    "{} has sha256 {}, expected {}".format(
+                        url, sha.hexdigest(), digest
+                    )
+                )
+            digest = sha.hexdigest()
+            path = self._blob(digest)
+            if not os.path.isdir(os.path.dirname(path)):
+                os.makedirs(os.path.dirname(path))
+            # read-only, a notebook writing to its linked copy must not
+            # change the cached file
+            os.chmod(tmp, stat.S_IRUSR | stat.S_IRGRP | stat.S_IROTH)
+            os.rename(tmp, path)
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+
+        self._remember(url, digest)
+        return path
+
+    def verify(self, url, digest=None):
+        """
+        Check a cached file against its (manifest or pinned) checksum
+        """
+        path = self.lookup(url, digest)
+        if path is None:
+            return False
+        return sha256(path) == os.path.basename(path)
+
+
+def _place(source, dest):
+    """
+    Hard link source to dest, or copy it where links are not possible
+    """
+    if os.path.exists(dest):
+        if os.path.samefile(source, dest):
+            return dest
+        os.remove(dest)
+    elif not os.path.isdir(os.path.dirname(dest)):
+        os.makedirs(os.path.dirname(dest))
+    try:
+        os.link(source, dest)
+    except (OSError, AttributeError):
+        shutil.copyfile(source, dest)
+    return dest
+
+
+def case_files(case, manifest=None):
+    """
+    (key, url, sha256) of every file a case study uses
+    """
+    if manifest is None:
+        manifest = load_manifest()
+    if case not in manifest:
+        raise KeyError(
+            "{} is not in the data manifest, choose from {}".format(
+                case, ", ".join(manifest)
+            )
+        )
+    entry = manifest[case]
+    return [
+        (key, entry["url"] + f["name"], f.get("sha256"))
+        for key, f in entry["files"].items()
+    ]
+
+
+def fetch(case, folder=".", keys=None, cache=None, manifest=None):
+    """
+    Make the files of a case study available in folder and return a dict of
+    key -> path, like `Utils.download` with named files.
+
+    .. code:: python
+
+        downloads = fetch('Kevitsa_DC', folder='./KevitsaDC')
+        mesh = Mesh.TensorMesh.readUBC(downloads['mesh'])
+
+    """
+    if cache is None:
+        cache = DataCache()
+    downloads = OrderedDict()
+    for key, url, digest in case_files(case, manifest):
+        if keys is not None and key not in keys:
+            continue
+        dest = os.path.join(folder, url.rsplit("/", 1)[-1])
+        downloads[key] = os.path.abspath(_place(cache.get(url, digest), dest))
+    return downloads
+
+
+def prefetch(cases=None, cache=None, verify=False):
+    """
+    Fill the cache with the files of the given (default: all) case studies.
+    Returns the urls that could not be fetched.
+    """
+    if cache is None:
+        cache = DataCache()
+    manifest = load_manifest()
+    failed = []
+    for case in cases or list(manifest):
+        for key, url, digest in case_files(case, manifest):
+            try:
+                cache.get(url, digest)
+                if verify and not cache.verify(url, digest):
+                    raise ChecksumError("{} is corrupt".format(url))
+            except IOError as err:
+                print("{}: {}".format(case, err), file=sys.stderr)
+                failed.append(url)
+    return failed
+
+
+def pin(cases=None, cache=None, path=MANIFEST):
+    """
+    Record the checksums of the cached files in the manifest
+    """
+    if cache is None:
+        cache = DataCache()
+    manifest = load_manifest(path)
+    for case in cases or list(manifest):
+        entry = manifest[case]
+        for f in entry["files"].values():
+            cached = cache.lookup(entry["url"] + f["name"], f.get("sha256"))
+            if cached is not None:
+                f["sha256"] = os.path.basename(cached)
+    with open(path, "w") as f:
+        f.write(json.dumps(manifest, indent=2) + "\n")
+    return manifest
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Prefetch the case-study data into the local cache"
+    )
+    parser.add_argument(
+        "cases", nargs="*", help="case studies to fetch (default: all)"
+    )
+    parser.add_argument("--cache-dir", help="cache directory")
+    parser.add_argument("--mirror", help="local mirror of the bucket")
+    parser.add_argument(
+        "--verify", action="store_true",
+        help="re-hash the cached files"
+    )
+    parser.add_argument(
+        "--pin", action="store_true",
+        help="write the checksums of the cached files into the manifest"
+    )
+    parser.add_argument(
+        "--list", action="store_true",
+        help="list the case studies and their files"
+    )
+    args = parser.parse_args(argv)
+
+    cache = DataCache(args.cache_dir, args.mirror)
+    if args.list:
+        manifest = load_manifest()
+        for case in args.cases or list(manifest):
+            print(case)
+            for key, url, digest in case_files(case, manifest):
+                status = "cached" if cache.lookup(url, digest) else "missing"
+                print("    {:<14} {:<8} {}".format(key, status, url))
+        return 0
+
+    failed = prefetch(args.cases, cache, verify=args.verify)
+    print("cache: {}".format(cache.cache_dir))
+    if args.pin and not failed:
+        pin(args.cases, cache)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,208 @@
+"""
+2.5D DC resistivity of a survey line.
+
+Along a single line, the 3D mesh spends most of its cells on a direction the
+data barely see. In 2.5D the conductivity is taken constant across the line
+and the potential is Fourier transformed across it: each wavenumber k is a
+2D problem on the section below the line,
+
+.. math::
+
+    -\\nabla \\cdot \\sigma \\nabla \\tilde{\\phi} + k^2 \\sigma \\tilde{\\phi}
+    = I \\delta(x) \\delta(z)
+
+and the potential on the line is the inverse cosine transform
+:math:`\\phi = \\frac{1}{\\pi} \\int_0^\\infty \\tilde{\\phi} \\, dk`. The
+wavenumbers and quadrature weights are fitted to the electrode spacings of
+the line, the fewest that integrate the whole-space solution
+:math:`\\tilde{\\phi} \\propto K_0(kr)` within a tolerance. As in
+:mod:`casetools.dcelectrodes` each wavenumber is solved once, for all the
+electrodes, and the readings are sums of pole-pole potentials. Lines are
+independent and can be simulated on a pool of processes.
+
+.. code:: python
+
+    mesh2D, sigma2D = dc25d.section(mesh, sigma, axis='x', at=12150.)
+    electrodes, readings = dcelectrodes.from_survey(DCsurvey)
+    line = dc25d.LinePoles(mesh2D, dc25d.line_locations(electrodes, 'x'))
+    dpred = line.dpred(sigma2D, readings)  # ~ DCsurvey.dpred in 3D
+
+"""
+import multiprocessing
+
+import numpy as np
+from scipy.optimize import minimize
+from scipy.special import k0
+from SimPEG import Mesh, SolverLU, Utils
+
+from .dcelectrodes import superpose
+
+
+def section(mesh, model, axis='x', at=None, air=1e-8):
+    """
+    (mesh2D, model2D), the vertical section of a 3D tensor mesh and a model
+    on it along the axis 'x' or 'y', through the cells closest to at (the
+    other horizontal coordinate, default: the middle of the mesh). Inactive
+    (nan) cells get the conductivity air.
+    """
+    if axis not in ['x', 'y']:
+        raise ValueError("axis must be 'x' or 'y', not {!r}".format(axis))
+    i = 'xy'.index(axis)
+    across = mesh.vectorCCy if axis == 'x' else mesh.vectorCCx
+    if at is None:
+        ind = len(across) // 2
+    else:
+        ind = np.argmin(np.abs(across - at))
+    M = np.asarray(model, dtype=float).reshape(mesh.vnC, order='F')
+    M = M[:, ind, :] if axis == 'x' else M[ind, :, :]
+    model2D = Utils.mkvc(M).copy()
+    model2D[np.isnan(model2D)] = air
+    mesh2D = Mesh.TensorMesh([mesh.h[i], mesh.h[2]], x0=mesh.x0[[i, 2]])
+    return mesh2D, model2D
+
+
+def line_locations(locs, axis='x'):
+    """
+    Coordinates (along the line, z) of the locations locs ((n, 3)) in the
+    section along the axis 'x' or 'y'
+    """
+    locs = np.atleast_2d(locs)
+    return locs[:, ['xy'.index(axis), 2]]
+
+
+def wavenumbers(rmin, rmax, tol=1e-3, nmax=20, nr=100):
+    """
+    (k, c), the fewest wavenumbers (from 3 to nmax) and weights with
+    sum(c*K0(k*r)) = pi/(2r) to the relative tolerance tol for
+    rmin <= r <= rmax, so that the inverse cosine transform of the potential
+    is sum(c*phi(k))/pi. The last try is returned if none is within tol.
+    """
+    r = np.logspace(np.log10(rmin), np.log10(rmax), nr)
+
+    def fit(logk):
+        # the relative error r/(pi/2)*sum(c*K0(k*r)) - 1 is fitted
+        A = r[:, None]*k0(r[:, None]*10.**logk[None, :])
+        c = np.linalg.lstsq(A, np.full(nr, np.pi/2.), rcond=None)[0]
+        return A, c
+
+    def misfit(logk):
+        A, c = fit(logk)
+        return np.linalg.norm(A.dot(c)*2./np.pi - 1.)
+
+    for n in range(3, nmax+1):
+        logk = minimize(
+            misfit, np.linspace(-np.log10(rmax), -np.log10(rmin), n),
+            method='L-BFGS-B'
+        ).x
+        A, c = fit(logk)
+        if np.abs(A.dot(c)*2./np.pi - 1.).max() < tol:
+            break
+    order = np.argsort(logk)
+    return 10.**logk[order], c[order]
+
+
+def spacings(locs):
+    """
+    Smallest and largest distances between the locations locs ((n, 2))
+    """
+    locs = np.atleast_2d(locs)
+    r = np.sqrt(((locs[:, None, :] - locs[None, :, :])**2).sum(axis=2))
+    return r[r > 0].min(), r.max()
+
+
+class LinePoles(object):
+    """
+    2.5D potentials of a unit current at each of the electrodes ((nE, 2),
+    coordinates in the section) on the 2D mesh of the section of a line, a
+    nodal formulation solved once per wavenumber for all the electrodes.
+    The wavenumbers kys and their weights are fitted to the electrode
+    spacings unless given.
+    """
+
+    def __init__(
+        self, mesh, electrodes, kys=None, weights=None, tol=1e-3,
+        Solver=None, solverOpts=None
+    ):
+        self.mesh = mesh
+        self.electrodes = np.atleast_2d(electrodes)
+        if kys is None:
+            kys, weights = wavenumbers(*spacings(self.electrodes), tol=tol)
+        self.kys = np.asarray(kys, dtype=float)
+        self.weights = np.asarray(weights, dtype=float)
+        self.Solver = SolverLU if Solver is None else Solver
+        self.solverOpts = {} if solverOpts is None else solverOpts
+
+    @property
+    def nE(self):
+        return self.electrodes.shape[0]
+
+    @property
+    def Q(self):
+        """
+        (nE, nN) interpolation of the nodes at the electrodes
+        """
+        if getattr(self, '_Q', None) is None:
+            self._Q = self.mesh.getInterpolationMat(self.electrodes, 'N')
+        return self._Q
+
+    def getA(self, sigma, ky):
+        Grad = self.mesh.nodalGrad
+        MeSigma = self.mesh.getEdgeInnerProduct(sigma)
+        MnSigma = Utils.sdiag(self.mesh.aveN2CC.T*(self.mesh.vol*sigma))
+        return (Grad.T*MeSigma*Grad + ky**2*MnSigma).tocsr()
+
+    def potentials(self, sigma):
+        """
+        (nE + 1, nE + 1) pole-pole potentials for the conductivity sigma on
+        the section (see :func:`casetools.dcelectrodes.superpose`)
+        """
+        sigma = np.asarray(sigma, dtype=float)
+        rhs = self.Q.T.toarray()
+        V = np.zeros((self.nE, self.nE))
+        for ky, c in zip(self.kys, self.weights):
+            Ainv = self.Solver(self.getA(sigma, ky), **self.solverOpts)
+            try:
+                phi = Ainv * rhs
+            finally:
+                Ainv.clean()
+            V += c/np.pi * (self.Q * phi.reshape(rhs.shape, order='F'))
+        out = np.zeros((self.nE+1, self.nE+1))
+        out[:-1, :-1] = V
+        return out
+
+    def dpred(self, sigma, inds):
+        """
+        Potential differences of the readings inds ((nData, 4) electrode
+        indices of A, B, M, N, -1 at infinity) for a unit current
+        """
+        return superpose(self.potentials(sigma), inds)
+
+
+def _simulate(line):
+    mesh, sigma, electrodes, inds, kwargs = line
+    return LinePoles(mesh, electrodes, **kwargs).dpred(sigma, inds)
+
+
+def simulate(lines, jobs=None, **kwargs):
+    """
+    Predicted data of the lines, a list of (mesh2D, sigma2D, electrodes,
+    inds) (see :class:`LinePoles`), simulated on jobs processes (default:
+    one per core), in the order of the lines
+    """
+    lines = [tuple(line) + (kwargs,) for line in lines]
+    if jobs is None:
+        jobs = multiprocessing.cpu_count()
+    jobs = max(min(int(jobs), len(lines)), 1)
+    if jobs == 1:
+        return [_simulate(line) for line in lines]
+
+    pool = multiprocessing.Pool(jobs)
+    try:
+        out = pool.map(_simulate, lines)
+        pool.close()
+    except BaseException:
+        pool.terminate()
+        raise
+    finally:
+        pool.join()
+    return out
@@ -0,0 +1,198 @@
+"""
+DC resistivity data and sensitivities from one solve per electrode.
+
+A DC survey re-uses a few hundred electrodes in thousands of A, B, M, N
+combinations. The potential of any reading is a sum of pole-pole potentials,
+
+.. math::
+
+    V = \\phi_A(M) - \\phi_B(M) - \\phi_A(N) + \\phi_B(N)
+
+so the nodal problem is solved once per unique electrode (one factorization,
+one right-hand side per electrode) and every reading, pole-pole, pole-dipole
+or dipole-dipole, is assembled from the (nE, nE) table of pole-pole
+potentials. By reciprocity (the system is symmetric and the sources and
+receivers interpolate the same way) the field of a potential electrode is
+also the adjoint field of its readings, so the sensitivity rows come from the
+same fields without another solve. The number of solves scales with the
+electrodes, not with the sources.
+
+.. code:: python
+
+    electrodes, readings = dcelectrodes.from_survey(DCsurvey)
+    poles = dcelectrodes.PoleFields(problem, electrodes)
+    dpred = poles.dpred(m, readings)  # as DCsurvey.dpred(m)
+    J = poles.J(m, readings)
+
+"""
+import numpy as np
+
+from . import dcsurvey, sensitivity
+
+
+def readings(A, B=None, M=None, N=None):
+    """
+    (electrodes, inds): the unique electrodes of the readings A, B, M, N
+    ((nData, 3) arrays, None or rows of nan for the electrodes at infinity
+    of pole arrays) and the (nData, 4) indices of the A, B, M, N electrodes
+    of each reading in them (-1 at infinity)
+    """
+    A = np.atleast_2d(np.asarray(A, dtype=float))
+    nD = A.shape[0]
+    locs = [
+        np.full(A.shape, np.nan) if X is None else
+        np.atleast_2d(np.asarray(X, dtype=float))
+        for X in [A, B, M, N]
+    ]
+    locs = np.vstack(locs)
+    used = ~np.any(np.isnan(locs), axis=1)
+    electrodes, inverse = dcsurvey.unique_rows(locs[used])
+    inds = -np.ones(4*nD, dtype=int)
+    inds[used] = inverse
+    return electrodes, inds.reshape((4, nD)).T
+
+
+def from_survey(survey):
+    """
+    (electrodes, inds) of the data of a DC survey, in the order of the data
+    (see :func:`readings`)
+    """
+    A, B, M, N = [], [], [], []
+    for src in survey.srcList:
+        if isinstance(src.loc, list):
+            locA, locB = np.atleast_2d(src.loc[0]), np.atleast_2d(src.loc[1])
+        else:
+            locA = np.atleast_2d(src.loc)
+            locB = np.full(locA.shape, np.nan)
+        for rx in src.rxList:
+            if isinstance(rx.locs, list):
+                locM, locN = rx.locs
+            else:
+                locM = rx.locs
+                locN = np.full(locM.shape, np.nan)
+            nD = locM.shape[0]
+            A.append(np.repeat(locA, nD, axis=0))
+            B.append(np.repeat(locB, nD, axis=0))
+            M.append(locM)
+            N.append(locN)
+    return readings(*[np.vstack(X) for X in [A, B, M, N]])
+
+
+def superpose(potentials, inds):
+    """
+    Potential differences of the readings inds ((nData, 4) electrode indices
+    of A, B, M, N, -1 at infinity) from the (nE + 1, nE + 1) pole-pole
+    potentials (zeros in the last row and column, the electrode at infinity)
+    """
+    inds = np.atleast_2d(inds)
+    a, b, m, n = inds.T
+    V = potentials
+    return V[m, a] - V[m, b] - V[n, a] + V[n, b]
+
+
+class PoleFields(object):
+    """
+    Potentials of a unit current at each of the electrodes ((nE, 3)) of a
+    nodal DC problem (``DC.Problem3D_N``), solved at once for a model
+    """
+
+    def __init__(self, prob, electrodes):
+        if prob._formulation != 'EB':
+            raise NotImplementedError(
+                "Electrode fields need a nodal DC problem (Problem3D_N)"
+            )
+        self.prob = prob
+        self.mesh = prob.mesh
+        self.electrodes = np.atleast_2d(electrodes)
+        self.model = None
+        self.phi = None
+
+    @property
+    def nE(self):
+        return self.electrodes.shape[0]
+
+    @property
+    def Q(self):
+        """
+        (nE, nN) interpolation of the nodes at the electrodes: the sources
+        (transposed) and the receivers
+        """
+        if getattr(self, '_Q', None) is None:
+            self._Q = self.mesh.getInterpolationMat(self.electrodes, 'N')
+        return self._Q
+
+    def fields(self, m):
+        """
+        (nN, nE) nodal potentials of a unit current at each electrode, one
+        factorization and nE right-hand sides
+        """
+        if self.phi is not None and np.array_equal(m, self.model):
+            return self.phi
+        prob = self.prob
+        prob.model = m
+        Ainv = prob.Solver(prob.getA(), **prob.solverOpts)
+        try:
+            phi = Ainv * self.Q.T.toarray()
+        finally:
+            Ainv.clean()
+        self.model = np.array(m, copy=True)
+        self.phi = phi.reshape((self.mesh.nN, self.nE), order='F')
+        # pole-pole potentials, potentials of electrode j at electrode i
+        self._potentials = self.Q * self.phi
+        return self.phi
+
+    def potentials(self, m):
+        """
+        (nE + 1, nE + 1) pole-pole potentials; the last row and column, the
+        electrode at infinity, are zeros
+        """
+        self.fields(m)
+        out = np.zeros((self.nE+1, self.nE+1))
+        out[:-1, :-1] = self._potentials
+        return out
+
+    def dpred(self, m, inds):
+        """
+        Potential differences of the readings inds ((nData, 4) electrode
+        indices of A, B, M, N, -1 at infinity) for a unit current
+        """
+        return superpose(self.potentials(m), inds)
+
+    def _combine(self, phi, i, j):
+        # phi[:, i] - phi[:, j], with -1 the electrode at infinity
+        out = phi[:, i]
+        at = j >= 0
+        out[:, at] -= phi[:, j[at]]
+        return out
+
+    def blocks(self, m, inds, block_size=None):
+        """
+        Products, (nEdges, n), of the gradients on the edges of the source
+        and receiver potentials of the readings inds, n readings at a time
+        (block_size MB): yields (rows, W). The sensitivity of a reading to
+        the edge inner product is -W.
+        """
+        inds = np.atleast_2d(inds)
+        phi = self.fields(m)
+        Grad = self.mesh.nodalGrad
+        n = sensitivity.rows_per_block(Grad.shape[0], block_size)
+        for i0 in range(0, inds.shape[0], n):
+            a, b, m_, n_ = inds[i0:i0+n].T
+            src = Grad * self._combine(phi, a, b)
+            rx = Grad * self._combine(phi, m_, n_)
+            yield slice(i0, i0+len(a)), rx * src
+
+    def J(self, m, inds, block_size=None):
+        """
+        (nData, nP) sensitivities of the readings inds to the model, block
+        of readings by block of readings (block_size MB)
+        """
+        inds = np.atleast_2d(inds)
+        self.fields(m)
+        # the edge inner product is diagonal (isotropic conductivity on a
+        # tensor mesh): MeSigmaDeriv(u) = sdiag(u) * MeSigmaDeriv(1)
+        MeDeriv = self.prob.MeSigmaDeriv(np.ones(self.mesh.nE))
+        out = np.empty((inds.shape[0], MeDeriv.shape[1]))
+        for rows, W in self.blocks(m, inds, block_size):
+            out[rows] = -(MeDeriv.T * W).T
+        return out
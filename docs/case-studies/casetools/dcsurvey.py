@@ -0,0 +1,117 @@
+"""
+DC resistivity surveys from tables of electrode locations.
+
+A reading is a row A, B, M, N (the x, y of the current and potential
+electrodes) followed by its data, as in the UBC/Kevitsa ``dcipdata`` files::
+
+    Ax Ay Bx By Mx My Nx Ny appres voltage(mV)
+
+The electrodes are de-duplicated once, draped on the topography of the
+active cells once per unique electrode, and the readings are grouped by
+source with one stable sort, so building the survey costs O(nData log nData)
+rather than one pass over the data per electrode and per source.
+
+.. code:: python
+
+    DCsurvey, inds_data, G = dcsurvey.read_dcip(dcipdata, mesh, actind)
+    appres = geometric.apparent_resistivity(dpred, G)
+
+"""
+import numpy as np
+from SimPEG import EM
+
+from . import geometric
+
+
+def unique_rows(a):
+    """
+    Unique rows of a, sorted lexicographically (first column first), and the
+    index of each row of a in them
+    """
+    a = np.atleast_2d(a)
+    if a.shape[0] == 0:
+        return a, np.zeros(0, dtype=int)
+    order = np.lexsort(a.T[::-1])
+    sorted_a = a[order]
+    first = np.r_[True, np.any(sorted_a[1:] != sorted_a[:-1], axis=1)]
+    inverse = np.empty(a.shape[0], dtype=int)
+    inverse[order] = np.cumsum(first) - 1
+    return sorted_a[first], inverse
+
+
+def group(index):
+    """
+    Permutation that sorts the readings by group (stable, so the readings of
+    a group keep their order) and the slice of each group in it
+    """
+    index = np.asarray(index)
+    order = np.argsort(index, kind='mergesort')
+    bounds = np.r_[0, np.cumsum(np.bincount(index))]
+    return order, [slice(i0, i1) for i0, i1 in zip(bounds[:-1], bounds[1:])]
+
+
+def drape(mesh, xy, actind):
+    """
+    x, y, z of the electrodes xy, with z the elevation of the top active cell
+    below each of them. Unique locations are draped once.
+    """
+    xy = np.atleast_2d(xy)[:, :2]
+    uniq, inverse = unique_rows(xy)
+    loc = EM.Static.Utils.drapeTopotoLoc(mesh, uniq, actind=actind)
+    return np.c_[xy, loc[inverse, 2]]
+
+
+def survey(A, B, M, N, srcType='pole', rxType='dipole'):
+    """
+    DC.Survey of the readings A, B, M, N ((nData, 3) arrays), with one source
+    per unique A (pole) or A, B (dipole) location, sorted by location, and
+    the permutation inds_data of the readings in the order of the survey data
+    """
+    if srcType == 'pole':
+        src_locs, src_index = unique_rows(A)
+    elif srcType == 'dipole':
+        src_locs, src_index = unique_rows(np.c_[A, B])
+    else:
+        raise ValueError(
+            "srcType must be 'pole' or 'dipole', not {!r}".format(srcType)
+        )
+    if rxType not in ['pole', 'dipole']:
+        raise ValueError(
+            "rxType must be 'pole' or 'dipole', not {!r}".format(rxType)
+        )
+
+    inds_data, groups = group(src_index)
+    M, N = M[inds_data], N[inds_data]
+    srcList = []
+    for loc, rows in zip(src_locs, groups):
+        if rxType == 'pole':
+            rx = EM.Static.DC.Rx.Pole(M[rows])
+        else:
+            rx = EM.Static.DC.Rx.Dipole(M[rows], N[rows])
+        if srcType == 'pole':
+            src = EM.Static.DC.Src.Pole([rx], loc[:3])
+        else:
+            src = EM.Static.DC.Src.Dipole([rx], loc[:3], loc[3:])
+        srcList.append(src)
+    return EM.Static.DC.Survey(srcList), inds_data
+
+
+def read_dcip(dcipdata, mesh, actind, srcType='pole', rxType='dipole'):
+    """
+    DC.Survey of a dcipdata table, with its voltages (V) as dobs, the
+    permutation inds_data of the rows of the table in the order of the survey
+    data, and the (half-space) geometric factors of the survey data
+    """
+    dcipdata = np.asarray(dcipdata)
+    nD = dcipdata.shape[0]
+    xy = np.vstack([dcipdata[:, 2*i:2*i+2] for i in range(4)])
+    locs = drape(mesh, xy, actind)
+    A, B, M, N = [locs[i*nD:(i+1)*nD] for i in range(4)]
+
+    DCsurvey, inds_data = survey(A, B, M, N, srcType=srcType, rxType=rxType)
+    DCsurvey.dobs = dcipdata[inds_data, 9] * 1e-3
+    G = geometric.geometric_factor(
+        A[inds_data], B[inds_data], M[inds_data], N[inds_data],
+        surveyType='{}-{}'.format(srcType, rxType)
+    )
+    return DCsurvey, inds_data, G
@@ -0,0 +1,116 @@
+"""
+Spatially aware decimation of gridded potential field surveys.
+
+The stations are binned on a regular grid in plan view and the station
+closest to the centre of each bin is kept. The bins are refined where the
+data change quickly: the local horizontal gradient of the data is estimated
+at every station from its nearest neighbours (k-d tree), and stations in the
+upper half of the gradients fall in bins half the size, those in the upper
+quarter in bins a quarter of the size, and so on. The result only depends on
+the survey, so it is reproducible.
+
+.. code:: python
+
+    indx = decimation.decimate(locXYZ, dobs, spacing=800., levels=3)
+    survey = decimation.subset(obs, indx)
+
+"""
+from __future__ import print_function
+
+import numpy as np
+from scipy.spatial import cKDTree
+from SimPEG import PF
+
+
+def local_gradient(locs, d, k=8):
+    """
+    Magnitude of the horizontal gradient of d at each station, from a plane
+    fitted to its k nearest neighbours
+    """
+    xy = np.atleast_2d(locs)[:, :2]
+    d = np.asarray(d, dtype=float)
+    k = min(k, xy.shape[0]-1)
+    if k < 3:
+        return np.zeros(xy.shape[0])
+
+    _, nn = cKDTree(xy).query(xy, k=k+1)
+    dxy = xy[nn, :] - xy[:, None, :]  # (n, k+1, 2)
+    dd = d[nn] - d[:, None]
+
+    # least-squares plane through each neighbourhood, with a small ridge so
+    # collinear neighbours do not make the normal equations singular
+    A = np.concatenate([dxy, np.ones(dd.shape + (1,))], axis=2)
+    AtA = np.einsum('nki,nkj->nij', A, A)
+    scale = np.trace(AtA, axis1=1, axis2=2)[:, None, None]
+    AtA += 1e-10*scale*np.eye(3)
+    Atd = np.einsum('nki,nk->ni', A, dd)
+    g = np.linalg.solve(AtA, Atd[:, :, None])[:, :2, 0]
+    return np.sqrt(np.sum(g**2., axis=1))
+
+
+def levels_of(gradient, levels=3):
+    """
+    Refinement level of each station: 0 below the median gradient, 1 in the
+    upper half, 2 in the upper quarter, ... up to levels-1
+    """
+    if levels < 2:
+        return np.zeros(len(gradient), dtype=int)
+    q = 100.*(1. - 0.5**np.arange(1, levels))
+    return np.digitize(gradient, np.percentile(gradient, q))
+
+
+def decimate(locs, d=None, spacing=None, levels=3, k=8, gradient=None):
+    """
+    Sorted indices of the stations kept: one per bin of size
+    spacing/2**level in plan view (default spacing: ten times the median
+    station spacing). Without data (d) every station is at level 0.
+    """
+    locs = np.atleast_2d(locs)
+    xy = locs[:, :2]
+    if spacing is None:
+        dist, _ = cKDTree(xy).query(xy, k=2)
+        spacing = 10.*np.median(dist[:, 1])
+
+    if gradient is None and d is not None:
+        gradient = local_gradient(locs, d, k=k)
+    if gradient is None:
+        level = np.zeros(xy.shape[0], dtype=int)
+    else:
+        level = levels_of(gradient, levels)
+
+    size = spacing / 2.**level
+    origin = xy.min(axis=0)
+    cell = np.floor((xy - origin) / size[:, None]).astype(int)
+    center = origin + (cell + 0.5)*size[:, None]
+    dist = np.sum((xy - center)**2., axis=1)
+
+    # closest station to the centre of each (level, cell) bin; ties go to
+    # the first station
+    order = np.lexsort((np.arange(len(dist)), dist, cell[:, 1], cell[:, 0], level))
+    key = np.c_[level, cell][order]
+    first = np.r_[True, np.any(key[1:] != key[:-1], axis=1)]
+    return np.sort(order[first])
+
+
+def subset(survey, indx):
+    """
+    New LinearSurvey of the stations indx of a gravity or magnetic survey,
+    with their data and uncertainties
+    """
+    srcField = survey.srcField
+    locs = srcField.rxList[0].locs[indx, :]
+    if isinstance(srcField, PF.BaseMag.SrcField):
+        rx = PF.BaseMag.RxObs(locs)
+        rx.rxType = srcField.rxList[0].rxType
+        out = PF.BaseMag.LinearSurvey(
+            PF.BaseMag.SrcField([rx], param=srcField.param)
+        )
+    else:
+        out = PF.BaseGrav.LinearSurvey(
+            PF.BaseGrav.SrcField([PF.BaseGrav.RxObs(locs)])
+        )
+    if getattr(survey, 'dobs', None) is not None:
+        out.dobs = survey.dobs[indx]
+    if getattr(survey, 'std', None) is not None:
+        out.std = survey.std[indx]
+    return out
@@ -0,0 +1,219 @@
+"""
+Slider widgets over precomputed frames, drawn on one persistent figure.
+
+The field widgets of the case studies average the fields to the cell centres
+and draw a new figure, colorbar included, every time the slider moves. Here
+the frames are either averaged all at once (one sparse product on the
+stacked fields) or, for fields that are not all kept in memory, averaged
+when the slider reaches them and kept in a bounded LRU cache. The figure is
+drawn once, and moving the slider only replaces the data of the image: the
+cell shown by each pixel is found once by drawing the cell indices. With the
+inline backend the rendered frames are kept in a bounded LRU cache of PNG
+images, so revisiting a frame costs nothing.
+
+.. code:: python
+
+    frames = framecache.FieldFrames(f, src, 'e', range(prob.nT+1), mesh.aveE2CC)
+    viewer = framecache.FrameViewer(
+        frames, lambda v, ax: mesh.plotImage(v, ax=ax, mirror=True),
+        title=lambda i: '{:.0f} micro-s'.format(prob.times[i]*1e6)
+    )
+    interact(viewer.show, frame=IntSlider(min=0, max=prob.nT, value=11))
+
+"""
+from collections import OrderedDict
+from io import BytesIO
+
+import matplotlib
+import matplotlib.pyplot as plt
+import numpy as np
+
+
+def field_frames(f, src, name, tInds, average=None):
+    """
+    (nC, len(tInds)) frames of the field name of src at the time steps
+    tInds, averaged to the cell centres by average (e.g. mesh.aveE2CC) in
+    one product
+    """
+    stack = np.column_stack([f[src, name, tInd] for tInd in tInds])
+    if average is None:
+        return stack
+    return average * stack
+
+
+class FieldFrames(object):
+    """
+    Frames of the field name of src at the time steps tInds, averaged to
+    the cell centres by average (e.g. mesh.aveE2CC) one at a time, when they
+    are first asked for; the last cache_size frames are kept. Only the time
+    steps that are looked at are read, e.g. from the file of a
+    :func:`casetools.tdemstream.fields`.
+    """
+
+    def __init__(self, f, src, name, tInds, average=None, cache_size=32):
+        self.f, self.src, self.name = f, src, name
+        self.tInds = list(tInds)
+        self.average = average
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+
+    def __len__(self):
+        return len(self.tInds)
+
+    def __getitem__(self, i):
+        if i in self._cache:
+            self._cache[i] = self._cache.pop(i)
+            return self._cache[i]
+        frame = np.asarray(self.f[self.src, self.name, self.tInds[i]])
+        if frame.ndim > 1:
+            frame = frame[:, 0]
+        if self.average is not None:
+            frame = self.average * frame
+        self._cache[i] = frame
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return frame
+
+
+def _first(artists):
+    if isinstance(artists, (list, tuple)):
+        return artists[0]
+    return artists
+
+
+def _remove(artists):
+    if artists is None:
+        return
+    if not isinstance(artists, (list, tuple)):
+        artists = [artists]
+    for artist in artists:
+        if hasattr(artist, 'lines') and hasattr(artist, 'arrows'):
+            _remove([artist.lines, artist.arrows])  # StreamplotSet
+        elif isinstance(artist, (list, tuple)):
+            _remove(artist)
+        elif artist is not None and artist.axes is not None:
+            artist.remove()
+
+
+def inline():
+    return 'inline' in matplotlib.get_backend()
+
+
+class FrameViewer(object):
+    """
+    Frames, the columns of a (nC, nFrames) array or the items of a sequence
+    computed when needed (e.g. :class:`FieldFrames`), drawn by
+    plot(values, ax) (which returns the image, e.g. mesh.plotImage or
+    mesh.plotSlice) on one figure. title(i) gives the title of frame i, overlay(i, ax) draws what
+    changes with the frame on top of the image (streamlines, sources) and
+    returns it. clim fixes the colour scale, otherwise set per frame.
+    """
+
+    def __init__(
+        self, frames, plot, title=None, overlay=None, clim=None,
+        colorbar=None, cbOpts=None, figsize=None, cache_size=32, dpi=None
+    ):
+        if isinstance(frames, (list, tuple)) or not hasattr(
+            frames, '__getitem__'
+        ):
+            frames = np.asarray(frames)
+        self.frames = frames
+        self.title = title
+        self.overlay = overlay
+        self.clim = clim
+        self.cache_size = cache_size
+        self.dpi = dpi
+        self._cache = OrderedDict()
+        self._overlay = None
+
+        self.fig = plt.figure(figsize=figsize)
+        self.ax = self.fig.add_subplot(111)
+        # the cell shown by each pixel: draw the (1-based) cell indices
+        self.image = _first(plot(
+            np.arange(1., len(self.frame(0))+1), self.ax
+        ))
+        index = np.ma.getdata(self.image.get_array())
+        self.index = np.rint(index).astype(int) - 1
+        self.colorbar = None
+        if colorbar is not None:
+            self.colorbar = self.fig.colorbar(self.image, **(cbOpts or {}))
+            self.colorbar.set_label(colorbar)
+        self.update(0)
+        if inline():
+            # only shown through show()
+            plt.close(self.fig)
+
+    @property
+    def nFrames(self):
+        if isinstance(self.frames, np.ndarray):
+            return self.frames.shape[1]
+        return len(self.frames)
+
+    def frame(self, i):
+        """
+        Values of frame i on the cells
+        """
+        if isinstance(self.frames, np.ndarray):
+            return self.frames[:, i]
+        return self.frames[i]
+
+    def update(self, i):
+        """
+        Draw frame i on the figure
+        """
+        values = self.frame(i)[self.index]
+        self.image.set_array(np.ma.masked_invalid(values))
+        if self.clim is not None:
+            self.image.set_clim(*self.clim)
+        else:
+            self.image.autoscale()
+        if self.overlay is not None:
+            _remove(self._overlay)
+            xlim, ylim = self.ax.get_xlim(), self.ax.get_ylim()
+            self._overlay = self.overlay(i, self.ax)
+            self.ax.set_xlim(xlim)
+            self.ax.set_ylim(ylim)
+        if self.title is not None:
+            self.ax.set_title(self.title(i))
+        return self.fig
+
+    def render(self, i):
+        """
+        PNG image of frame i, from the cache when it was drawn recently
+        """
+        if i in self._cache:
+            self._cache[i] = self._cache.pop(i)
+            return self._cache[i]
+        self.update(i)
+        buf = BytesIO()
+        self.fig.savefig(buf, format='png', dpi=self.dpi)
+        self._cache[i] = buf.getvalue()
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return self._cache[i]
+
+    def clear(self):
+        """
+        Forget the rendered frames (after changing the figure)
+        """
+        self._cache.clear()
+
+    def prerender(self, frames=None):
+        """
+        Render the frames (default: all, up to the size of the cache)
+        """
+        if frames is None:
+            frames = range(min(self.nFrames, self.cache_size))
+        for i in frames:
+            self.render(i)
+
+    def show(self, frame):
+        """
+        Show frame, e.g. as the callback of an ipywidgets slider
+        """
+        if inline():
+            from IPython.display import Image, display
+            display(Image(data=self.render(frame), format='png'))
+        else:
+            self.update(frame)
+            self.fig.canvas.draw_idle()
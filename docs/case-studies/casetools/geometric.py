@@ -0,0 +1,151 @@
+"""
+Geometric factors and apparent resistivities of DC readings.
+
+The potential difference of a reading with current electrodes A, B and
+potential electrodes M, N over a homogeneous earth of resistivity rho is
+V = rho * I * G, with (half-space)
+
+.. math::
+
+    G = \\frac{1}{2\\pi} \\left( \\frac{1}{AM} - \\frac{1}{BM} -
+        \\frac{1}{AN} + \\frac{1}{BN} \\right)
+
+where B or N are left out of pole arrays (at infinity). Every function works
+on (nData, 2 or 3) arrays of electrode locations at once, using the full 3D
+distances, so the factors of millions of readings take one call.
+
+.. code:: python
+
+    G = geometric.from_dcip(dcipdata, surveyType='pole-dipole')
+    appres = geometric.apparent_resistivity(dpred, G)
+
+"""
+import numpy as np
+
+SURVEY_TYPES = ['pole-pole', 'pole-dipole', 'dipole-pole', 'dipole-dipole']
+
+
+def _check(surveyType, space_type):
+    if surveyType not in SURVEY_TYPES:
+        raise ValueError(
+            "surveyType must be one of {}, not {!r}".format(
+                ", ".join(SURVEY_TYPES), surveyType
+            )
+        )
+    if space_type not in ['half-space', 'whole-space']:
+        raise ValueError(
+            "space_type must be 'half-space' or 'whole-space', "
+            "not {!r}".format(space_type)
+        )
+
+
+def _xyz(locs, nD):
+    locs = np.atleast_2d(np.asarray(locs, dtype=float))
+    if locs.shape[1] == 2:
+        locs = np.c_[locs, np.zeros(locs.shape[0])]
+    return np.ones((nD, 1))*locs
+
+
+def _inverse_distance(src, rx, space_type, surface):
+    """
+    1/(2 pi r) (half-space) or 1/(4 pi r) (whole-space) between the
+    electrodes src and rx. With the elevation of the ground surface given,
+    the half-space term is that of electrodes buried below a flat surface:
+    1/(4 pi) (1/r + 1/r'), with r' the distance to the image of src.
+    """
+    r = np.sqrt(np.sum((src - rx)**2., axis=1))
+    if space_type == 'whole-space':
+        return 1./(4*np.pi*r)
+    if surface is None:
+        return 1./(2*np.pi*r)
+    image = src.copy()
+    image[:, 2] = 2.*surface - src[:, 2]
+    r_image = np.sqrt(np.sum((image - rx)**2., axis=1))
+    return 1./(4*np.pi) * (1./r + 1./r_image)
+
+
+def geometric_factor(
+    A, B=None, M=None, N=None, surveyType='dipole-dipole',
+    space_type='half-space', surface=None
+):
+    """
+    Geometric factors G (V = rho*I*G) of readings A, B, M, N, each a
+    (nData, 2 or 3) array (or one location shared by all readings).
+    B is ignored for pole sources and N for pole receivers.
+
+    surface, the elevation of the ground (a scalar or one per reading),
+    corrects the half-space factors for electrodes below it (boreholes, or
+    electrodes draped on cells under a rugged topography).
+    """
+    _check(surveyType, space_type)
+    src_type, rx_type = surveyType.split('-')
+    nD = max(
+        np.atleast_2d(loc).shape[0] for loc in [A, B, M, N] if loc is not None
+    )
+    if surface is not None:
+        surface = np.asarray(surface, dtype=float)
+
+    sources = [(_xyz(A, nD), 1.)]
+    if src_type == 'dipole':
+        sources.append((_xyz(B, nD), -1.))
+    receivers = [(_xyz(M, nD), 1.)]
+    if rx_type == 'dipole':
+        receivers.append((_xyz(N, nD), -1.))
+
+    G = np.zeros(nD)
+    for src, s in sources:
+        for rx, r in receivers:
+            G += s*r*_inverse_distance(src, rx, space_type, surface)
+    return G
+
+
+def from_dcip(dcipdata, surveyType='pole-dipole', z=None, **kwargs):
+    """
+    Geometric factors of the rows of a dcipdata table (Ax Ay Bx By Mx My Nx
+    Ny ...). z, optional, are the (nData, 4) elevations of A, B, M and N.
+    """
+    dcipdata = np.asarray(dcipdata, dtype=float)
+    nD = dcipdata.shape[0]
+    if z is None:
+        z = np.zeros((nD, 4))
+    A, B, M, N = [
+        np.c_[dcipdata[:, 2*i:2*i+2], z[:, i]] for i in range(4)
+    ]
+    return geometric_factor(A, B, M, N, surveyType=surveyType, **kwargs)
+
+
+def from_survey(survey, **kwargs):
+    """
+    Geometric factors of the data of a DC.Survey, in the order of dpred.
+    The survey type is that of each source and receiver.
+    """
+    G = []
+    for src in survey.srcList:
+        if isinstance(src.loc, list):
+            src_type, A, B = 'dipole', src.loc[0], src.loc[1]
+        else:
+            src_type, A, B = 'pole', src.loc, None
+        for rx in src.rxList:
+            if isinstance(rx.locs, list):
+                rx_type, M, N = 'dipole', rx.locs[0], rx.locs[1]
+            else:
+                rx_type, M, N = 'pole', rx.locs, None
+            G.append(geometric_factor(
+                A, B, M, N, surveyType='{}-{}'.format(src_type, rx_type),
+                **kwargs
+            ))
+    return np.hstack(G)
+
+
+def apparent_resistivity(dobs, G, I=1.):
+    """
+    Apparent resistivities of the voltages dobs for a current I; nan where
+    the geometric factor vanishes (M and N equidistant from the sources)
+    """
+    dobs, G = np.broadcast_arrays(
+        np.asarray(dobs, dtype=float), np.asarray(G, dtype=float)
+    )
+    out = np.full(dobs.shape, np.nan)
+    nonzero = G != 0
+    out[nonzero] = dobs[nonzero] / (I*G[nonzero])
+    return out
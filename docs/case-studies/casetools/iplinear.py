@@ -0,0 +1,109 @@
+"""
+Linearized IP from the fields of the DC step.
+
+In the Seigel model the chargeability eta lowers the conductivity to
+sigma(1 - eta) while the current is on, and the IP datum is the change in
+potential it makes. For small eta
+
+.. math::
+
+    d_{IP} = V(\\sigma (1 - \\eta)) - V(\\sigma)
+    \\approx -\\frac{\\partial V}{\\partial \\log \\sigma} \\eta = J \\eta
+
+so the IP problem is linear in eta, with the sensitivities of the DC data to
+log sigma, and these only need the DC potentials of the electrodes (see
+:mod:`casetools.dcelectrodes`). The potentials already solved for the DC
+forward step are re-used: the IP predicted data, ``Jvec`` and ``Jtvec`` make
+no solve at all. The sensitivity is never stored; the products stream over
+blocks of readings, the memory used is bounded by ``block_size`` megabytes.
+
+.. code:: python
+
+    poles = dcelectrodes.PoleFields(problem, electrodes)
+    dpred = poles.dpred(m, readings)  # the DC step
+    ip = iplinear.LinearIP(poles, readings, actind=actind)
+    dpred_ip = ip.dpred(eta)  # eta on the active cells
+
+"""
+import numpy as np
+from SimPEG import Utils
+
+
+class LinearIP(object):
+    """
+    Linearized IP data of the readings inds ((nData, 4) electrode indices
+    of A, B, M, N, -1 at infinity) for the chargeability on the cells
+    actind (default: all cells), about the model m (default: the model the
+    fields of poles, a :class:`casetools.dcelectrodes.PoleFields`, were last
+    computed for)
+    """
+
+    def __init__(self, poles, inds, m=None, actind=None, block_size=None):
+        if m is None:
+            if poles.model is None:
+                raise ValueError(
+                    "No DC fields to re-use: give the model m, or compute "
+                    "the fields of the poles first"
+                )
+            m = poles.model
+        self.poles = poles
+        self.inds = np.atleast_2d(inds)
+        self.model = np.array(m, copy=True)
+        self.block_size = block_size
+        mesh = poles.mesh
+        self.actind = (
+            np.ones(mesh.nC, dtype=bool) if actind is None else
+            np.asarray(actind, dtype=bool)
+        )
+        poles.fields(self.model)
+        sigma = poles.prob.sigma
+        # derivative of the edge inner product with log sigma on the
+        # active cells; the IP data are +W.T * P * eta (see PoleFields.blocks)
+        P = (
+            mesh.getEdgeInnerProductDeriv(sigma)(np.ones(mesh.nE)) *
+            Utils.sdiag(sigma)
+        )
+        self.P = P.tocsc()[:, np.where(self.actind)[0]]
+
+    @property
+    def nD(self):
+        return self.inds.shape[0]
+
+    def _blocks(self):
+        return self.poles.blocks(self.model, self.inds, self.block_size)
+
+    def Jvec(self, v):
+        """
+        J * v, v on the active cells
+        """
+        Pv = self.P * v
+        out = np.empty(self.nD)
+        for rows, W in self._blocks():
+            out[rows] = W.T.dot(Pv)
+        return out
+
+    def Jtvec(self, v):
+        """
+        J.T * v, v one value per reading
+        """
+        w = np.zeros(self.P.shape[0])
+        for rows, W in self._blocks():
+            w += W.dot(v[rows])
+        return self.P.T * w
+
+    def dpred(self, eta):
+        """
+        IP data (potential differences for a unit current) of the
+        chargeability eta on the active cells
+        """
+        return self.Jvec(eta)
+
+    def J(self):
+        """
+        (nData, nActive) IP sensitivity matrix, block of readings by block
+        of readings
+        """
+        out = np.empty((self.nD, self.P.shape[1]))
+        for rows, W in self._blocks():
+            out[rows] = (self.P.T * W).T
+        return out
@@ -0,0 +1,214 @@
+"""
+Magnetic response of a geological model by superposition of its units.
+
+The magnetic data are linear in the magnetization, so the response of a unit
+of the lithology model (all the cells with one ``LithoCode``) magnetized
+uniformly is that of a unit magnetization along x, y and z, summed over its
+cells, and scaled. These three responses are computed once per unit, block of
+receivers by block of receivers without forming the forward operator, and
+kept on disk, keyed by the mesh, the cells of the unit, the receivers and the
+inducing field. Any table of susceptibilities (and magnetization directions)
+is then a linear combination of the cached columns.
+
+.. code:: python
+
+    litho = lithology.LithologyResponses(mesh, rock, survey)
+    d = litho.forward({7: 0.1, 8: 0.02})  # induced, along the inducing field
+    d = litho.forward({7: 0.1}, inc=45., dec=10.)
+
+"""
+from __future__ import print_function
+
+import hashlib
+import multiprocessing
+import os
+import tempfile
+
+import numpy as np
+from SimPEG import PF
+
+from . import sensitivity
+
+CACHE_DIR = '.lithocache'
+
+
+# state of a worker process, set up once by _init_worker
+_worker = {}
+
+
+def _init_worker(kernel):
+    _worker['kernel'] = kernel
+
+
+def _column_sums(rows):
+    i0, i1 = rows
+    block = _worker['kernel'](i0, i1)
+    return i0, block.reshape(i1-i0, 3, -1).sum(axis=2)
+
+
+def column_sums(kernel, jobs=None, block_size=None):
+    """
+    (nD, 3) sums over the cells of the x, y and z columns of the forward
+    operator of a :class:`~casetools.sensitivity.MagneticVectorKernel`
+    """
+    n = sensitivity.rows_per_block(kernel.shape[1], block_size)
+    tasks = [
+        (i0, min(i0+n, kernel.shape[0]))
+        for i0 in range(0, kernel.shape[0], n)
+    ]
+    if jobs is None:
+        jobs = multiprocessing.cpu_count()
+    jobs = max(min(int(jobs), len(tasks)), 1)
+
+    out = np.empty((kernel.shape[0], 3))
+    if jobs == 1:
+        _init_worker(kernel)
+        try:
+            for rows in tasks:
+                i0, s = _column_sums(rows)
+                out[i0:i0+len(s)] = s
+        finally:
+            _worker.clear()
+        return out
+
+    pool = multiprocessing.Pool(
+        jobs, initializer=_init_worker, initargs=(kernel,)
+    )
+    try:
+        for i0, s in pool.imap_unordered(_column_sums, tasks):
+            out[i0:i0+len(s)] = s
+        pool.close()
+    except BaseException:
+        pool.terminate()
+        raise
+    finally:
+        pool.join()
+    return out
+
+
+class LithologyResponses(object):
+    """
+    Cached responses of the units of the lithology model rock (one code per
+    cell of mesh) at the receivers of a magnetic survey
+    """
+
+    def __init__(
+        self, mesh, rock, survey, cache_dir=None, jobs=None, block_size=None
+    ):
+        self.mesh = mesh
+        self.rock = np.asarray(rock)
+        self.survey = survey
+        if cache_dir is None:
+            cache_dir = CACHE_DIR
+        self.cache_dir = os.path.abspath(os.path.expanduser(cache_dir))
+        self.jobs = jobs
+        self.block_size = block_size
+        self._responses = {}
+
+    @property
+    def codes(self):
+        """
+        Unit codes found in the model
+        """
+        return np.unique(self.rock[np.isfinite(self.rock)])
+
+    @property
+    def srcField(self):
+        return self.survey.srcField
+
+    @property
+    def nD(self):
+        rx = self.srcField.rxList[0]
+        return rx.locs.shape[0]*(3 if rx.rxType == 'xyz' else 1)
+
+    def cells(self, code):
+        return np.where(self.rock == code)[0]
+
+    def key(self, code):
+        """
+        Hash of the mesh, the cells of the unit, the receivers and the
+        inducing field
+        """
+        sha = hashlib.sha256()
+        for h in self.mesh.h:
+            sha.update(np.ascontiguousarray(h, dtype=float).tobytes())
+        sha.update(np.ascontiguousarray(self.mesh.x0, dtype=float).tobytes())
+        sha.update(u"code:{!r}\n".format(float(code)).encode('utf-8'))
+        sha.update(self.cells(code).astype(np.int64).tobytes())
+        rx = self.srcField.rxList[0]
+        sha.update(np.ascontiguousarray(rx.locs, dtype=float).tobytes())
+        sha.update(u"{}\n".format(rx.rxType).encode('utf-8'))
+        sha.update(
+            np.asarray(self.srcField.param, dtype=float).tobytes()
+        )
+        return sha.hexdigest()
+
+    def _path(self, code):
+        return os.path.join(self.cache_dir, self.key(code) + '.npy')
+
+    def response(self, code):
+        """
+        (nD, 3) response of the unit magnetized by a unit vector along x, y
+        and z
+        """
+        code = float(code)
+        if code in self._responses:
+            return self._responses[code]
+
+        path = self._path(code)
+        if os.path.isfile(path):
+            R = np.load(path)
+        else:
+            R = self.compute(code)
+            if not os.path.isdir(self.cache_dir):
+                os.makedirs(self.cache_dir)
+            fd, tmp = tempfile.mkstemp(dir=self.cache_dir, suffix='.npy')
+            try:
+                with os.fdopen(fd, 'wb') as f:
+                    np.save(f, R)
+                os.rename(tmp, path)
+            finally:
+                if os.path.exists(tmp):
+                    os.remove(tmp)
+        self._responses[code] = R
+        return R
+
+    def compute(self, code):
+        inds = self.cells(code)
+        if len(inds) == 0:
+            raise ValueError("No cells with code {}".format(code))
+        Xn, Yn, Zn = sensitivity.cell_nodes(self.mesh, inds)
+        rx = self.srcField.rxList[0]
+        kernel = sensitivity.MagneticVectorKernel(
+            Xn, Yn, Zn, rx.locs, self.srcField.param, rxType=rx.rxType
+        )
+        return column_sums(kernel, jobs=self.jobs, block_size=self.block_size)
+
+    def direction(self, inc=None, dec=None):
+        """
+        Unit magnetization vector, along the inducing field by default
+        """
+        if inc is None:
+            inc = self.srcField.param[1]
+        if dec is None:
+            dec = self.srcField.param[2]
+        return PF.Magnetics.dipazm_2_xyz(
+            np.r_[float(inc)], np.r_[float(dec)]
+        )[0]
+
+    def forward(self, susceptibility, inc=None, dec=None):
+        """
+        Data of the units magnetized with the susceptibilities of the table
+        {code: susceptibility}. inc and dec, the direction of the
+        magnetization, are either one value for all units or tables by code.
+        """
+        d = np.zeros(self.nD)
+        for code, kappa in susceptibility.items():
+            if kappa == 0:
+                continue
+            M = self.direction(
+                inc.get(code) if isinstance(inc, dict) else inc,
+                dec.get(code) if isinstance(dec, dict) else dec
+            )
+            d += kappa*self.response(code).dot(M)
+        return d
@@ -0,0 +1,560 @@
+"""
+Out-of-core sensitivity matrix for the potential field integral problems.
+
+The dense forward operator G (ndata x ncells) of ``PF.Gravity.GravityIntegral``
+and ``PF.Magnetics.MagneticIntegral`` is filled one block of rows at a time
+by a pool of worker processes, straight into a memory-mapped ``.npy`` file.
+The column sums of G**2, needed for the sensitivity weights and the Jacobi
+preconditioner, are accumulated in the same pass, so G is never held in
+memory, nor squared. Products with G and G.T stream over the same blocks;
+the memory used is bounded by ``block_size`` megabytes per worker.
+
+.. code:: python
+
+    prob = PF.Magnetics.MagneticIntegral(mesh, chiMap=idenMap, actInd=actv)
+    survey.pair(prob)
+
+    G = sensitivity.attach(prob, './sensitivity', jobs=4, block_size=256)
+    wr = G.weights()  # replaces np.sum(prob.G**2., axis=0)**0.5 / max
+
+    update_Jacobi = sensitivity.Update_lin_PreCond()
+
+The store is keyed on the cells, the receivers and the inducing field: it is
+re-used as is when the notebook runs again with the same inputs, and filled
+again otherwise.
+"""
+from __future__ import print_function
+
+import copy
+import hashlib
+import json
+import multiprocessing
+import os
+import tempfile
+
+import numpy as np
+from SimPEG import Directives, Maps, PF, Regularization, Utils
+from SimPEG.Utils import mkvc
+
+BLOCK_SIZE = 128  # MB
+
+
+def active_index(prob):
+    """
+    Indices of the active cells of prob (all cells when actInd is not set)
+    """
+    actInd = getattr(prob, 'actInd', None)
+    if actInd is None:
+        return np.arange(prob.mesh.nC)
+    actInd = np.asarray(actInd)
+    if actInd.dtype == 'bool':
+        return np.where(actInd)[0]
+    return actInd.astype(int)
+
+
+def cell_nodes(mesh, inds):
+    """
+    Lower and upper corners, (nC, 2) each along x, y and z, of the cells
+    inds of a tensor mesh, in the order used by the integral problems
+    """
+    xn, yn, zn = mesh.vectorNx, mesh.vectorNy, mesh.vectorNz
+
+    yn2, xn2, zn2 = np.meshgrid(yn[1:], xn[1:], zn[1:])
+    yn1, xn1, zn1 = np.meshgrid(yn[0:-1], xn[0:-1], zn[0:-1])
+
+    Xn = np.c_[mkvc(xn1), mkvc(xn2)][inds, :]
+    Yn = np.c_[mkvc(yn1), mkvc(yn2)][inds, :]
+    Zn = np.c_[mkvc(zn1), mkvc(zn2)][inds, :]
+    return Xn, Yn, Zn
+
+
+class BaseKernel(object):
+    """
+    Rows of the forward operator of cells (Xn, Yn, Zn) seen from the
+    receivers at locs
+    """
+
+    components = ['z']
+
+    def __init__(self, Xn, Yn, Zn, locs):
+        self.Xn, self.Yn, self.Zn = Xn, Yn, Zn
+        self.locs = np.atleast_2d(locs)
+
+    @property
+    def shape(self):
+        return (
+            len(self.components)*self.locs.shape[0], self.Xn.shape[0]
+        )
+
+    def key(self):
+        sha = hashlib.sha256()
+        sha.update(type(self).__name__.encode('utf-8'))
+        sha.update(','.join(self.components).encode('utf-8'))
+        for a in self._inputs():
+            a = np.ascontiguousarray(a, dtype=float)
+            sha.update(str(a.shape).encode('utf-8'))
+            sha.update(a.tobytes())
+        return sha.hexdigest()
+
+    def _inputs(self):
+        return [self.Xn, self.Yn, self.Zn, self.locs]
+
+    def tensor(self, loc):
+        raise NotImplementedError
+
+    def cells(self, inds):
+        """
+        Copy of the kernel restricted to the cells inds (in any order, with
+        repeats)
+        """
+        out = copy.copy(self)
+        out.Xn, out.Yn, out.Zn = self.Xn[inds], self.Yn[inds], self.Zn[inds]
+        return out
+
+    def __call__(self, i0, i1):
+        """
+        Rows i0 to i1 of G. Rows are ordered by component, then receiver,
+        as in the integral problems
+        """
+        nD = self.locs.shape[0]
+        block = np.empty((i1-i0, self.shape[1]))
+        for i, row in enumerate(range(i0, i1)):
+            t = self.tensor(self.locs[row % nD, :])
+            block[i, :] = t[row // nD]
+        return block
+
+    def columns(self, j0, j1):
+        """
+        Columns j0 to j1 of G. The kernels only depend on where a cell is
+        relative to the receiver, so a column is the row of a receiver at
+        the origin seeing its cell moved by -loc for every receiver loc
+        """
+        nD, nC = self.locs.shape[0], self.Xn.shape[0]
+        block = np.empty((self.shape[0], j1-j0))
+        origin = np.zeros(self.locs.shape[1])
+        for i, col in enumerate(range(j0, j1)):
+            # columns of a vector model are stacked by component
+            k, cell = divmod(col, nC)
+            moved = self.cells(np.repeat(cell, nD))
+            moved.Xn = moved.Xn - self.locs[:, 0:1]
+            moved.Yn = moved.Yn - self.locs[:, 1:2]
+            moved.Zn = moved.Zn - self.locs[:, 2:3]
+            for c, t in enumerate(moved.tensor(origin)):
+                block[c*nD:(c+1)*nD, i] = t[k*nD:(k+1)*nD]
+        return block
+
+
+class GravityKernel(BaseKernel):
+    """
+    Vertical gravity (mGal) of a unit density (g/cc) in each cell
+    """
+
+    def tensor(self, loc):
+        tx, ty, tz = PF.Gravity.get_T_mat(self.Xn, self.Yn, self.Zn, loc)
+        return [mkvc(tz)]
+
+
+class MagneticKernel(BaseKernel):
+    """
+    Magnetic data (nT) of a unit susceptibility (SI) in each cell, induced
+    by the inducing field param = [amplitude, inclination, declination],
+    with magnetization directions M (nC, 3)
+    """
+
+    def __init__(self, Xn, Yn, Zn, locs, param, M=None, rxType='tmi'):
+        super(MagneticKernel, self).__init__(Xn, Yn, Zn, locs)
+        self.param = np.asarray(param, dtype=float)
+        if M is None:
+            M = PF.Magnetics.dipazm_2_xyz(
+                np.ones(Xn.shape[0])*self.param[1],
+                np.ones(Xn.shape[0])*self.param[2]
+            )
+        self.M = np.asarray(M)*self.param[0]
+        self._receivers(rxType)
+
+    def _receivers(self, rxType):
+        self.rxType = rxType
+        if rxType == 'tmi':
+            self.components = ['tmi']
+        elif rxType == 'xyz':
+            self.components = ['x', 'y', 'z']
+        else:
+            raise ValueError("rxType must be either 'tmi' | 'xyz'")
+
+        # projection on the inducing field, declination from north
+        D = np.deg2rad((450.-self.param[2]) % 360.)
+        I = np.deg2rad(self.param[1])
+        self.Ptmi = np.r_[np.cos(I)*np.cos(D), np.cos(I)*np.sin(D), np.sin(I)]
+
+    def _inputs(self):
+        return super(MagneticKernel, self)._inputs() + [self.param, self.M]
+
+    def cells(self, inds):
+        out = super(MagneticKernel, self).cells(inds)
+        out.M = self.M[inds]
+        return out
+
+    def tensor(self, loc):
+        nC = self.Xn.shape[0]
+        T = np.vstack(
+            PF.Magnetics.get_T_mat(self.Xn, self.Yn, self.Zn, loc)
+        )  # (3, 3*nC)
+        # induced magnetization, summed over its three components
+        T = (
+            T[:, :nC]*self.M[:, 0] + T[:, nC:2*nC]*self.M[:, 1] +
+            T[:, 2*nC:]*self.M[:, 2]
+        )
+        if self.rxType == 'tmi':
+            return [self.Ptmi.dot(T)]
+        return T
+
+
+class MagneticVectorKernel(MagneticKernel):
+    """
+    Magnetic data (nT) of a unit magnetization along x, y and z in each cell
+    (the columns of the three components are stacked)
+    """
+
+    def __init__(self, Xn, Yn, Zn, locs, param, rxType='tmi'):
+        BaseKernel.__init__(self, Xn, Yn, Zn, locs)
+        self.param = np.asarray(param, dtype=float)
+        self._receivers(rxType)
+
+    @property
+    def shape(self):
+        return (
+            len(self.components)*self.locs.shape[0], 3*self.Xn.shape[0]
+        )
+
+    def _inputs(self):
+        return BaseKernel._inputs(self) + [self.param]
+
+    def cells(self, inds):
+        return BaseKernel.cells(self, inds)
+
+    def tensor(self, loc):
+        T = np.vstack(
+            PF.Magnetics.get_T_mat(self.Xn, self.Yn, self.Zn, loc)
+        )*self.param[0]
+        if self.rxType == 'tmi':
+            return [self.Ptmi.dot(T)]
+        return T
+
+
+def gravity_kernel(prob):
+    """
+    GravityKernel of a paired PF.Gravity.GravityIntegral
+    """
+    Xn, Yn, Zn = cell_nodes(prob.mesh, active_index(prob))
+    return GravityKernel(Xn, Yn, Zn, prob.survey.srcField.rxList[0].locs)
+
+
+def magnetic_kernel(prob):
+    """
+    MagneticKernel of a paired PF.Magnetics.MagneticIntegral
+    """
+    Xn, Yn, Zn = cell_nodes(prob.mesh, active_index(prob))
+    srcField = prob.survey.srcField
+    return MagneticKernel(
+        Xn, Yn, Zn, srcField.rxList[0].locs, srcField.param,
+        M=getattr(prob, 'M', None), rxType=srcField.rxList[0].rxType
+    )
+
+
+def magnetic_vector_kernel(prob):
+    """
+    MagneticVectorKernel of a paired PF.Magnetics.MagneticVector
+    """
+    Xn, Yn, Zn = cell_nodes(prob.mesh, active_index(prob))
+    srcField = prob.survey.srcField
+    return MagneticVectorKernel(
+        Xn, Yn, Zn, srcField.rxList[0].locs, srcField.param,
+        rxType=srcField.rxList[0].rxType
+    )
+
+
+def kernel(prob):
+    """
+    Kernel of the forward operator of a paired integral problem
+    """
+    if isinstance(prob, PF.Gravity.GravityIntegral):
+        return gravity_kernel(prob)
+    if isinstance(prob, PF.Magnetics.MagneticVector):
+        return magnetic_vector_kernel(prob)
+    if isinstance(prob, PF.Magnetics.MagneticIntegral):
+        return magnetic_kernel(prob)
+    raise TypeError(
+        "No sensitivity kernel for {}".format(type(prob).__name__)
+    )
+
+
+def rows_per_block(ncol, block_size=None, itemsize=8):
+    if block_size is None:
+        block_size = BLOCK_SIZE
+    return max(int(float(block_size)*1024**2 // (ncol*itemsize)), 1)
+
+
+class _Transposed(object):
+
+    def __init__(self, op):
+        self.op = op
+        self.shape = op.shape[::-1]
+
+    def dot(self, r):
+        return self.op.rdot(r)
+
+    @property
+    def T(self):
+        return self.op
+
+
+class Operator(object):
+    """
+    Stand-in for the dense prob.G of an integral problem: provides
+    G.dot(m), G.T.dot(r) and the column sums of G**2, sumsq
+    """
+
+    sumsq = None
+
+    @property
+    def T(self):
+        return _Transposed(self)
+
+    def dot(self, m):
+        raise NotImplementedError
+
+    def rdot(self, r):
+        raise NotImplementedError
+
+    def weights(self, normalize=True):
+        """
+        Sensitivity weights, sqrt(sum(G**2, axis=0)), scaled to a maximum of
+        one unless normalize is False
+        """
+        wr = self.sumsq**0.5
+        if normalize:
+            wr = wr/np.max(wr)
+        return wr
+
+
+class SensitivityStore(Operator):
+    """
+    Forward operator stored in folder path (see :func:`compute`), with the
+    products of a dense matrix
+    """
+
+    def __init__(self, path, block_size=None):
+        self.path = os.path.abspath(path)
+        with open(os.path.join(self.path, 'meta.json')) as f:
+            self.meta = json.load(f)
+        self.G = np.load(os.path.join(self.path, 'G.npy'), mmap_mode='r')
+        self.sumsq = np.load(os.path.join(self.path, 'sumsq.npy'))
+        self.block_size = block_size
+
+    @property
+    def shape(self):
+        return self.G.shape
+
+    @property
+    def dtype(self):
+        return self.G.dtype
+
+    @property
+    def nbytes(self):
+        return self.G.nbytes
+
+    def blocks(self):
+        """
+        (i0, i1) of the blocks of rows that fit in block_size
+        """
+        n = rows_per_block(
+            self.shape[1], self.block_size, self.dtype.itemsize
+        )
+        return [
+            (i0, min(i0+n, self.shape[0]))
+            for i0 in range(0, self.shape[0], n)
+        ]
+
+    def dot(self, m):
+        """
+        G.dot(m)
+        """
+        out = np.empty((self.shape[0],) + np.shape(m)[1:])
+        for i0, i1 in self.blocks():
+            out[i0:i1] = np.asarray(self.G[i0:i1]).dot(m)
+        return out
+
+    def rdot(self, r):
+        """
+        G.T.dot(r)
+        """
+        out = np.zeros((self.shape[1],) + np.shape(r)[1:])
+        for i0, i1 in self.blocks():
+            out += np.asarray(self.G[i0:i1]).T.dot(r[i0:i1])
+        return out
+
+
+# state of a worker process, set up once by _init_worker
+_worker = {}
+
+
+def _init_worker(kernel, filename):
+    _worker.update(
+        kernel=kernel, G=np.load(filename, mmap_mode='r+')
+    )
+
+
+def _fill(rows):
+    i0, i1 = rows
+    block = _worker['kernel'](i0, i1)
+    G = _worker['G']
+    G[i0:i1] = block
+    G.flush()
+    block = block.astype(G.dtype)
+    return (block**2.).sum(axis=0)
+
+
+def compute(
+    kernel, path, jobs=None, block_size=None, dtype=np.float64,
+    overwrite=False
+):
+    """
+    Fill the forward operator of kernel into folder path, block_size
+    megabytes of rows at a time on jobs processes (default: one per core),
+    and return the :class:`SensitivityStore`. A store already in path that
+    was computed from the same inputs is returned as is.
+    """
+    path = os.path.abspath(path)
+    key = kernel.key()
+    dtype = np.dtype(dtype)
+    try:
+        store = SensitivityStore(path, block_size)
+        if (
+            not overwrite and store.meta['key'] == key and
+            store.dtype == dtype
+        ):
+            return store
+        del store
+    except (IOError, OSError, ValueError, KeyError):
+        pass
+
+    if not os.path.isdir(path):
+        os.makedirs(path)
+    for f in ['meta.json', 'sumsq.npy']:
+        if os.path.exists(os.path.join(path, f)):
+            os.remove(os.path.join(path, f))
+
+    filename = os.path.join(path, 'G.npy')
+    G = np.lib.format.open_memmap(
+        filename, mode='w+', dtype=dtype, shape=kernel.shape
+    )
+    del G  # the workers write to their own maps of the file
+
+    n = rows_per_block(kernel.shape[1], block_size, dtype.itemsize)
+    tasks = [
+        (i0, min(i0+n, kernel.shape[0]))
+        for i0 in range(0, kernel.shape[0], n)
+    ]
+    if jobs is None:
+        jobs = multiprocessing.cpu_count()
+    jobs = max(min(int(jobs), len(tasks)), 1)
+
+    sumsq = np.zeros(kernel.shape[1])
+    if jobs == 1:
+        _init_worker(kernel, filename)
+        try:
+            for rows in tasks:
+                sumsq += _fill(rows)
+        finally:
+            _worker.clear()
+    else:
+        pool = multiprocessing.Pool(
+            jobs, initializer=_init_worker, initargs=(kernel, filename)
+        )
+        try:
+            for s in pool.imap_unordered(_fill, tasks):
+                sumsq += s
+            pool.close()
+        except BaseException:
+            pool.terminate()
+            raise
+        finally:
+            pool.join()
+
+    np.save(os.path.join(path, 'sumsq.npy'), sumsq)
+    # written last, so an interrupted fill is never re-used
+    fd, tmp = tempfile.mkstemp(dir=path, suffix='.tmp')
+    with os.fdopen(fd, 'w') as f:
+        json.dump({
+            'key': key, 'shape': list(kernel.shape), 'dtype': dtype.str
+        }, f)
+    os.rename(tmp, os.path.join(path, 'meta.json'))
+
+    return SensitivityStore(path, block_size)
+
+
+def attach(prob, path, jobs=None, block_size=None, dtype=np.float64):
+    """
+    Compute (or re-use) the forward operator of a paired integral problem
+    in path and use it as prob.G
+    """
+    if not prob.ispaired:
+        raise Exception('Need to pair!')
+    store = compute(
+        kernel(prob), path, jobs=jobs, block_size=block_size, dtype=dtype
+    )
+    prob._G = store
+    return store
+
+
+def sum_squares(G):
+    """
+    np.sum(G**2., axis=0), from the operator when G is an :class:`Operator`
+    """
+    if isinstance(G, Operator):
+        return G.sumsq
+    return np.sum(G**2., axis=0)
+
+
+class Update_lin_PreCond(Directives.Update_lin_PreCond):
+    """
+    Jacobi preconditioner for the linear problem, using the column sums of
+    G**2 computed once with the forward operator
+    """
+
+    def _update(self):
+        if self.ComboObjFun:
+            reg_diag = []
+            for reg in self.reg.objfcts:
+                reg_diag.append(
+                    self.invProb.beta*(reg.W.T*reg.W).diagonal()
+                )
+            diagA = sum_squares(self.prob.G) + np.hstack(reg_diag)
+
+        else:
+            diagA = (
+                sum_squares(self.prob.G) +
+                self.invProb.beta*(self.reg.W.T*self.reg.W).diagonal()
+            )
+
+        self.opt.approxHinv = Utils.sdiag(
+            (self.mapping.deriv(None).T * diagA)**-1.
+        )
+
+    def initialize(self):
+        # Check if it is a ComboObjective
+        if not isinstance(self.reg, Regularization.BaseComboRegularization):
+            self.ComboObjFun = True
+
+        if getattr(self, 'mapping', None) is None:
+            self.mapping = Maps.IdentityMap(nP=self.reg.mapping.nP)
+
+        if getattr(self.opt, 'approxHinv', None) is None:
+            self._update()
+
+    def endIter(self):
+        if self.onlyOnStart is True:
+            return
+
+        if getattr(self.opt, 'approxHinv', None) is not None:
+            self._update()
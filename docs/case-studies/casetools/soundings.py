@@ -0,0 +1,204 @@
+"""
+Chunked, per-sounding storage of time-domain EM data in HDF5.
+
+Each transmitter gets its own group, ``soundings/<index>``, holding its
+location and data, so a forward simulation can append soundings as they are
+computed (and pick up where it stopped), and an inversion can read back only
+the soundings it uses. The mesh, model and time channels are stored next to
+them, with a hash of all four: soundings computed for another model are
+removed when the model is written again, so a resumed run never mixes
+them into the new data::
+
+    /                     attrs model_hash
+    /mesh/h0, h1, h2, x0
+    /sigma
+    /times, /timeSteps
+    /soundings/000000/xyz, dpred[, dobs]
+    /downsample           indices of the soundings to invert, attrs perc, floor
+
+.. code:: python
+
+    with SoundingStore('TKCATEMfwd.h5', 'a') as store:
+        store.write_model(mesh, sigma, times, timeSteps)
+        store.append(itx, xyz[itx, :], dpred)
+
+    with SoundingStore('TKCATEMfwd.h5') as store:
+        xyz, dpred = store.read(store.downsample, field="dpred")
+
+"""
+import hashlib
+
+import numpy as np
+
+try:
+    import h5py
+except ImportError:
+    h5py = False
+
+
+class SoundingStore(object):
+
+    def __init__(self, filename, mode="r"):
+        if not h5py:
+            raise ImportError(
+                "SoundingStore needs h5py, install it with `pip install h5py`"
+            )
+        self.filename = filename
+        self.file = h5py.File(filename, mode)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        self.file.close()
+
+    def flush(self):
+        self.file.flush()
+
+    def _replace(self, name, data, **kwargs):
+        if name in self.file:
+            del self.file[name]
+        return self.file.create_dataset(name, data=data, **kwargs)
+
+    # model
+
+    @staticmethod
+    def model_hash(mesh, sigma, times, timeSteps=None):
+        """
+        sha256 of the mesh, the conductivity model and the time channels
+        """
+        sha = hashlib.sha256()
+        arrays = list(mesh.h) + [mesh.x0, sigma, times]
+        if timeSteps is not None:
+            arrays.append(timeSteps)
+        for name, a in zip(
+            ["h{}".format(i) for i in range(len(mesh.h))] +
+            ["x0", "sigma", "times", "timeSteps"], arrays
+        ):
+            a = np.ascontiguousarray(a, dtype=float)
+            sha.update("{}:{}:".format(name, a.shape).encode("utf-8"))
+            sha.update(a.tobytes())
+        return sha.hexdigest()
+
+    def write_model(self, mesh, sigma, times, timeSteps=None):
+        """
+        Store the mesh, the conductivity model and the time channels. The
+        soundings in the store are kept when they were computed for the same
+        ones (an interrupted run is resumed), otherwise they are removed.
+        Returns True when soundings were kept.
+        """
+        key = self.model_hash(mesh, sigma, times, timeSteps)
+        resume = self.file.attrs.get("model_hash") == key
+        if not resume:
+            for name in ["soundings", "downsample"]:
+                if name in self.file:
+                    del self.file[name]
+        for i, h in enumerate(mesh.h):
+            self._replace("mesh/h{}".format(i), h)
+        self._replace("mesh/x0", mesh.x0)
+        self._replace("sigma", np.asarray(sigma), compression="gzip")
+        self._replace("times", np.asarray(times))
+        if timeSteps is not None:
+            self._replace("timeSteps", np.asarray(timeSteps))
+        elif "timeSteps" in self.file:
+            del self.file["timeSteps"]
+        self.file.attrs["model_hash"] = key
+        return resume and "soundings" in self.file
+
+    def read_mesh(self):
+        from SimPEG import Mesh
+        group = self.file["mesh"]
+        h = [group["h{}".format(i)][()] for i in range(len(group) - 1)]
+        return Mesh.TensorMesh(h, x0=group["x0"][()])
+
+    @property
+    def sigma(self):
+        return self.file["sigma"][()]
+
+    @property
+    def times(self):
+        return self.file["times"][()]
+
+    @property
+    def timeSteps(self):
+        if "timeSteps" not in self.file:
+            return None
+        return self.file["timeSteps"][()]
+
+    # soundings
+
+    @staticmethod
+    def _name(itx):
+        return "soundings/{:06d}".format(itx)
+
+    def append(self, itx, xyz, dpred, dobs=None):
+        """
+        Store (or replace) the data of sounding itx
+        """
+        name = self._name(itx)
+        if name in self.file:
+            del self.file[name]
+        group = self.file.create_group(name)
+        group.create_dataset("xyz", data=np.asarray(xyz, dtype=float).ravel())
+        group.create_dataset("dpred", data=np.asarray(dpred))
+        if dobs is not None:
+            group.create_dataset("dobs", data=np.asarray(dobs))
+        return group
+
+    def indices(self):
+        """
+        Sorted indices of the soundings in the store
+        """
+        if "soundings" not in self.file:
+            return np.array([], dtype=int)
+        return np.array(sorted(int(k) for k in self.file["soundings"]))
+
+    def __contains__(self, itx):
+        return self._name(itx) in self.file
+
+    def read(self, indices=None, field="dobs"):
+        """
+        Locations (n, 3) and data of the soundings in indices (default:
+        all), concatenated sounding by sounding as in a SimPEG survey.
+        field is "dobs" (observed) or "dpred" (predicted); a KeyError is
+        raised when a sounding has no such data.
+        """
+        if indices is None:
+            indices = self.indices()
+        xyz, data = [], []
+        for itx in indices:
+            group = self.file[self._name(itx)]
+            xyz.append(group["xyz"][()])
+            if field not in group:
+                raise KeyError(
+                    "sounding {} has no {} data".format(itx, field)
+                )
+            data.append(group[field][()])
+        return np.vstack(xyz), np.hstack(data)
+
+    # subset used by the inversion
+
+    def set_downsample(self, indices, perc, floor):
+        """
+        Record which soundings the inversion uses and their uncertainties
+        """
+        dset = self._replace("downsample", np.asarray(indices, dtype=int))
+        dset.attrs["perc"] = perc
+        dset.attrs["floor"] = floor
+
+    @property
+    def downsample(self):
+        if "downsample" not in self.file:
+            return self.indices()
+        return self.file["downsample"][()]
+
+    @property
+    def uncertainty(self):
+        """
+        (perc, floor) of the down-sampled data
+        """
+        attrs = self.file["downsample"].attrs
+        return attrs["perc"], attrs["floor"]
@@ -0,0 +1,214 @@
+"""
+Forward simulations of a stack of models over one survey.
+
+Sensitivity studies run the same survey over many models. The models are
+put in shared memory and simulated by a pool of worker processes; each
+worker builds its problem (mesh, operators, survey) once, with setup(), and
+re-uses it for all the models it is given. The predicted data come back in
+model order, as they finish, with the progress printed. max_memory caps
+the memory each worker may allocate, so a model too large for the machine
+fails with a MemoryError instead of swapping.
+
+.. code:: python
+
+    def setup():
+        prob = EM.TDEM.Problem3D_b(mesh, timeSteps=timeSteps,
+                                   sigmaMap=Maps.IdentityMap(mesh))
+        prob.pair(EM.TDEM.Survey(srcList))
+        return prob
+
+    dpred = sweep.run(setup, np.vstack(models), jobs=4, max_memory=2000)
+
+"""
+from __future__ import print_function
+
+import multiprocessing
+import sys
+import time
+import warnings
+
+import numpy as np
+from SimPEG import EM
+
+from . import tdemstream
+from .tdemparallel import _shared, batches
+
+try:
+    import resource
+except ImportError:  # not on Windows
+    resource = False
+
+
+def dpred(prob, m):
+    """
+    Predicted data of model m. TDEM problems are stepped without keeping
+    their fields (see :mod:`casetools.tdemstream`).
+    """
+    if isinstance(prob, EM.TDEM.BaseTDEMProblem):
+        return tdemstream.fields(prob, m).dpred
+    return prob.survey.dpred(m)
+
+
+def address_space():
+    """
+    Address space of this process, in bytes (0 where unknown)
+    """
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[0])*resource.getpagesize()
+    except (IOError, OSError):
+        return 0
+
+
+def limit_memory(max_memory):
+    """
+    Cap the address space of this process to what it holds now plus
+    max_memory MB. Where that size is unknown (no /proc, e.g. on macOS) no
+    cap is set, with a warning: a cap of max_memory alone would be below
+    what the interpreter already maps.
+    """
+    if not resource:
+        raise NotImplementedError(
+            "max_memory needs the resource module (POSIX only)"
+        )
+    current = address_space()
+    if current == 0:
+        warnings.warn(
+            "the address space of the process is unknown on this system, "
+            "max_memory is not applied"
+        )
+        return
+    _, hard = resource.getrlimit(resource.RLIMIT_AS)
+    soft = current + int(max_memory*2**20)
+    if hard != resource.RLIM_INFINITY:
+        soft = min(soft, hard)
+    resource.setrlimit(resource.RLIMIT_AS, (soft, hard))
+
+
+def start_method():
+    """
+    How the pool starts its workers: 'fork', 'spawn' or 'forkserver'
+    """
+    if hasattr(multiprocessing, 'get_start_method'):
+        return multiprocessing.get_start_method()
+    return 'spawn' if sys.platform == 'win32' else 'fork'
+
+
+def check_workers_reach(func, name):
+    """
+    Raise a ValueError when func cannot be handed to the workers: functions
+    are pickled by reference, and one defined interactively (in a notebook)
+    only exists in a worker that was forked from this process
+    """
+    if start_method() == 'fork':
+        return
+    main = sys.modules.get('__main__')
+    if (
+        getattr(func, '__module__', None) == '__main__' and
+        getattr(main, '__file__', None) is None
+    ):
+        raise ValueError(
+            "{} is defined interactively and the workers are started with "
+            "{!r}: they can only use it when they are forked. Define it in "
+            "a module, or run with jobs=1".format(name, start_method())
+        )
+
+
+# state of a worker process, set up once by _init_worker
+_worker = {}
+
+
+def _init_worker(setup, models, nP, simulate, max_memory):
+    try:
+        if max_memory is not None:
+            limit_memory(max_memory)
+        _worker.update(
+            prob=setup(),
+            # view on the shared memory, nothing is copied
+            models=np.frombuffer(models, dtype=float).reshape(-1, nP),
+            simulate=simulate, error=None
+        )
+    except Exception as err:
+        # raised with the first model: an initializer that fails makes the
+        # pool start new workers forever
+        _worker['error'] = err
+
+
+def _simulate(inds):
+    if _worker.get('error') is not None:
+        raise _worker['error']
+    prob = _worker['prob']
+    return inds, np.vstack([
+        _worker['simulate'](prob, _worker['models'][i]) for i in inds
+    ])
+
+
+def run(
+    setup, models, jobs=None, chunk_size=1, max_memory=None,
+    simulate=dpred, callback=None, verbose=True
+):
+    """
+    Predicted data, (nModels, nData), of the rows of models.
+
+    setup() returns the problem, paired with its survey; it is called once
+    per worker and has to reach the workers. A function defined in a
+    notebook does with the fork start method (the default on Linux) only;
+    with spawn (Windows, macOS) it has to be defined at the top level of a
+    module, and a ValueError is raised otherwise. simulate(prob, m) returns
+    the data of a model (default: :func:`dpred`). The models are given to the jobs
+    processes (default: one per core) chunk_size at a time, and
+    callback(inds, dpred) is called in the parent as each chunk finishes.
+    max_memory is the memory, in MB, each worker may allocate on top of
+    what it holds when it starts (POSIX only).
+    """
+    models = np.atleast_2d(models)
+    nModels = models.shape[0]
+    if jobs is None:
+        jobs = multiprocessing.cpu_count()
+    jobs = max(min(int(jobs), nModels), 1)
+    tasks = batches(np.arange(nModels), chunk_size)
+
+    if jobs > 1:
+        check_workers_reach(setup, 'setup')
+        check_workers_reach(simulate, 'simulate')
+
+    shared = _shared(models)
+    initargs = (setup, shared, models.shape[1], simulate, max_memory)
+    state = {'dpred': None, 'done': 0, 'start': time.time()}
+
+    def collect(result):
+        inds, d = result
+        if state['dpred'] is None:
+            state['dpred'] = np.empty((nModels, d.shape[1]))
+        state['dpred'][inds, :] = d
+        state['done'] += len(inds)
+        if callback is not None:
+            callback(inds, d)
+        if verbose:
+            print("{} / {} models ({:.1f} s)".format(
+                state['done'], nModels, time.time() - state['start']
+            ))
+
+    if jobs == 1:
+        # in this process: max_memory is not applied
+        _init_worker(setup, shared, models.shape[1], simulate, None)
+        try:
+            for inds in tasks:
+                collect(_simulate(inds))
+        finally:
+            _worker.clear()
+        return state['dpred']
+
+    pool = multiprocessing.Pool(
+        jobs, initializer=_init_worker, initargs=initargs
+    )
+    try:
+        for result in pool.imap_unordered(_simulate, tasks):
+            collect(result)
+        pool.close()
+    except BaseException:
+        pool.terminate()
+        raise
+    finally:
+        pool.join()
+    return state['dpred']
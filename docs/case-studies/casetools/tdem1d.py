@@ -0,0 +1,337 @@
+"""
+Semi-analytic 1D time-domain EM of a horizontal loop over a layered earth.
+
+For layered approximations, and for the starting models of the airborne
+inversions, a sounding does not need the time stepping of a cylindrical or
+3D mesh. At the centre of a loop of radius a at height h, the secondary field
+for a unit current is a Hankel transform of the TE reflection coefficient of
+the layers,
+
+.. math::
+
+    H_z(\\omega) = \\frac{a}{2} \\int_0^\\infty r_{TE}(\\lambda, \\omega)
+    e^{-\\lambda (h + z)} \\lambda J_1(\\lambda a) \\, d\\lambda
+
+and the step-off response is its sine transform,
+:math:`\\partial_t b_z = \\frac{2 \\mu_0}{\\pi} \\int_0^\\infty
+\\mathrm{Im} H_z \\sin(\\omega t) \\, d\\omega`. Both transforms are digital
+filters: weighted sums of the kernel on log-spaced samples, the weights
+derived from the Mellin transforms of :math:`J_1` and :math:`\\sin`. The
+sine transform is a lagged convolution, one set of frequencies for all the
+times. The response to the ``VTEMWaveform`` (or any other waveform ending at
+``offTime``) is the convolution of the step-off response with the derivative
+of the current. Everything is vectorized over the soundings, and chunks of
+soundings are simulated on a pool of processes.
+
+.. code:: python
+
+    sigma1D, thickness, top = tdem1d.column(mesh, sigma)  # CylMesh axis
+    d = tdem1d.dbdt(
+        rx.times, sigma1D, thickness, waveform=src.waveform, radius=13.,
+        height=41. - top
+    )  # ~ survey.dpred(sigma) on the CylMesh
+    dpred = tdem1d.simulate(sigmas, thickness, times, heights, jobs=4)
+
+"""
+import multiprocessing
+
+import numpy as np
+from numpy.polynomial.legendre import leggauss
+from scipy.constants import mu_0
+from scipy.interpolate import CubicSpline
+from scipy.special import loggamma
+from SimPEG import EM
+
+from . import waveforms
+
+#: log spacing of the filter abscissae
+SPACING = 0.1
+#: frequencies per decade at which the frequency response is computed
+PER_DECADE = 10
+
+_filters = {}
+
+
+def _mellin(kernel, k):
+    # int_0^inf x^(-ik) kernel(x) dx
+    if kernel == 'j1':
+        return np.exp(
+            -1j*k*np.log(2.) + loggamma(1. - 0.5j*k) - loggamma(1. + 0.5j*k)
+        )
+    if kernel == 'sin':
+        # Gamma(mu) sin(pi mu/2), mu = 1 - ik
+        mu = 1. - 1j*k
+        return (
+            np.exp(loggamma(mu) + 0.5j*np.pi*mu) -
+            np.exp(loggamma(mu) - 0.5j*np.pi*mu)
+        )/2j
+    raise ValueError("kernel must be 'j1' or 'sin', not {!r}".format(kernel))
+
+
+def _window(x):
+    # 1 for x <= 0, 0 for x >= 1, smooth in between
+    x = np.clip(x, 1e-12, 1. - 1e-12)
+    a, b = np.exp(-1./x), np.exp(-1./(1. - x))
+    return b/(a + b)
+
+
+def digital_filter(kernel, spacing=SPACING, tol=1e-9, nk=4000):
+    """
+    (base, weights) of the digital filter of the kernel 'j1' or 'sin':
+    int_0^inf f(x) kernel(x r) dx = sum(weights*f(base/r))/r for f smooth
+    in log(x). The weights are the sinc interpolation of f in log(x)
+    convolved with the kernel, band-limited by a smooth window; those below
+    tol (relative) at the ends are dropped. Computed once per parameters.
+    """
+    key = (kernel, spacing, tol, nk)
+    if key in _filters:
+        return _filters[key]
+    kmax = np.pi/spacing
+    k = np.linspace(0., kmax, nk)
+    W = np.where(k <= 0.4*kmax, 1., _window((k/kmax - 0.4)/0.6))
+    s = spacing*np.arange(-int(30./spacing), int(30./spacing) + 1)
+    # trapezoidal rule in k
+    dk = np.full(nk, k[1])
+    dk[[0, -1]] *= 0.5
+    M = W*_mellin(kernel, k)*dk
+    weights = spacing/np.pi*np.real(np.exp(1j*np.outer(s, k)).dot(M))
+    keep = np.where(np.abs(weights) > tol*np.abs(weights).max())[0]
+    keep = slice(keep[0], keep[-1] + 1)
+    _filters[key] = np.exp(s[keep]), weights[keep]
+    return _filters[key]
+
+
+def _layers(sigma, thickness):
+    sigma = np.atleast_2d(np.asarray(sigma, dtype=float))
+    thickness = np.asarray(thickness, dtype=float)
+    thickness = np.broadcast_to(
+        thickness, (sigma.shape[0], sigma.shape[1] - 1)
+    )
+    return sigma, thickness
+
+
+def reflection(lam, omega, sigma, thickness):
+    """
+    (nS, nw, nl) TE reflection coefficients (exp(iwt), quasi-static) of the
+    (nS, nLayers) conductivities sigma of layers of thicknesses
+    ((nLayers - 1), or (nS, nLayers - 1), the last layer is a half-space) at
+    the wavenumbers lam and angular frequencies omega
+    """
+    sigma, thickness = _layers(sigma, thickness)
+    lam2 = (np.asarray(lam, dtype=float)**2)[None, None, :]
+    iwm = 1j*mu_0*np.asarray(omega, dtype=float)[None, :, None]
+    # admittances (up to 1/(i w mu_0)) from the bottom half-space up
+    Y = np.sqrt(lam2 + iwm*sigma[:, -1, None, None])
+    for i in range(sigma.shape[1] - 2, -1, -1):
+        u = np.sqrt(lam2 + iwm*sigma[:, i, None, None])
+        # tanh(u t), with exp(-2ut) as Re(u) > 0
+        e = np.exp(-2.*u*thickness[:, i, None, None])
+        tanh = (1. - e)/(1. + e)
+        Y = u*(Y + u*tanh)/(u + Y*tanh)
+    lam = np.sqrt(lam2)
+    return (lam - Y)/(lam + Y)
+
+
+def frequency_response(
+    omega, sigma, thickness, radius=13., height=41., rx_height=None
+):
+    """
+    (nS, nw) secondary Hz at the centre of a loop of radius radius carrying
+    a unit current, at height (scalar or (nS,)) above the layers, the
+    receiver at rx_height (default: height)
+    """
+    sigma, thickness = _layers(sigma, thickness)
+    height = np.broadcast_to(np.asarray(height, dtype=float), sigma.shape[:1])
+    if rx_height is None:
+        rx_height = height
+    rx_height = np.broadcast_to(
+        np.asarray(rx_height, dtype=float), sigma.shape[:1]
+    )
+    base, weights = digital_filter('j1')
+    lam = base/radius
+    # the wavenumbers past the decay of the image term do not contribute
+    decay = np.exp(-lam*(height + rx_height).min())
+    lam, weights = lam[decay > 1e-30], weights[decay > 1e-30]
+    rTE = reflection(lam, omega, sigma, thickness)
+    image = np.exp(-np.outer(height + rx_height, lam))[:, None, :]
+    return 0.5*(rTE*image).dot(weights*lam)
+
+
+def step_off(times, sigma, thickness, per_decade=PER_DECADE, **kwargs):
+    """
+    (nS, nt) dbz/dt at the times (s, > 0) after a unit current is switched
+    off (see :func:`frequency_response` for the geometry). The frequency
+    response is computed at per_decade frequencies per decade and
+    interpolated at the frequencies of the filter (None: computed at each)
+    """
+    times = np.asarray(times, dtype=float)
+    if np.any(times <= 0.):
+        raise ValueError("The times of a step-off response must be > 0")
+    base, weights = digital_filter('sin')
+    spacing = np.log(base[1]/base[0])
+    # lagged convolution: t_i = tmax*exp(-i*spacing) takes its frequencies
+    # base[j]/t_i = omega[i + j] from a single set
+    nt = int(np.ceil(np.log(times.max()/times.min())/spacing)) + 3
+    t = times.max()*np.exp(-spacing*np.arange(nt))
+    omega = base[0]/times.max()*np.exp(spacing*np.arange(len(base) + nt - 1))
+    if per_decade is None:
+        K = np.imag(frequency_response(omega, sigma, thickness, **kwargs))
+    else:
+        # the response is smooth in log(omega), and of one sign for
+        # conductivities alone: its log is interpolated where it is
+        logw = np.log(omega)
+        n = int(np.ceil((logw[-1] - logw[0])/np.log(10.)*per_decade)) + 1
+        samples = np.linspace(logw[0], logw[-1], max(n, 4))
+        K = np.imag(frequency_response(
+            np.exp(samples), sigma, thickness, **kwargs
+        ))
+        signed = np.all(K < 0., axis=1)
+        K[signed] = np.log(-K[signed])
+        K = CubicSpline(samples, K, axis=1)(logw)
+        K[signed] = -np.exp(K[signed])
+    out = np.empty((K.shape[0], nt))
+    for i in range(nt):
+        out[:, i] = K[:, i:i+len(base)].dot(weights)/t[i]
+    out *= 2.*mu_0/np.pi
+    spline = CubicSpline(np.log(t[::-1]), out[:, ::-1], axis=1)
+    return spline(np.log(times))
+
+
+def _segments(waveform):
+    # on-time pieces where the current is smooth
+    if isinstance(waveform, EM.TDEM.Src.VTEMWaveform):
+        return [(0., waveform.peakTime), (waveform.peakTime, waveform.offTime)]
+    # the time meshes of the problems start at 0
+    return [(0., waveform.offTime)]
+
+
+def dbdt(times, sigma, thickness, waveform=None, ngauss=32, **kwargs):
+    """
+    (nS, nt) dbz/dt at the times (after waveform.offTime, as the times of
+    the SimPEG receivers) for the current waveform (default: step-off at
+    t=0): the step-off response convolved with the derivative of the
+    current, ngauss Gauss-Legendre points per smooth piece of the waveform
+    """
+    times = np.asarray(times, dtype=float)
+    if isinstance(waveform, waveforms.TabulatedWaveform):
+        waveform = waveform.waveform
+    if waveform is None or isinstance(
+        waveform, EM.TDEM.Src.StepOffWaveform
+    ):
+        offTime = 0. if waveform is None else waveform.offTime
+        return step_off(times - offTime, sigma, thickness, **kwargs)
+    if np.any(times <= waveform.offTime):
+        raise ValueError("The times must be after the waveform offTime")
+    segments = _segments(waveform)
+    x, w = leggauss(ngauss)
+    # d(t) = -int I'(tau) dbdt_off(t - tau) dtau, in u = log(t - tau)
+    us, ws = [], []
+    for t0, t1 in segments:
+        lo, hi = np.log(times - t1), np.log(times - t0)
+        us.append(0.5*(hi - lo)[:, None]*x[None, :] + 0.5*(hi + lo)[:, None])
+        ws.append(0.5*(hi - lo)[:, None]*w[None, :])
+    u, wu = np.hstack(us), np.hstack(ws)
+    lag = np.exp(u)
+    dI = waveforms.derivative(waveform, times[:, None] - lag)
+    response = step_off(lag.ravel(), sigma, thickness, **kwargs)
+    response = response.reshape((-1,) + lag.shape)
+    return -(response*(dI*wu*lag)[None, :, :]).sum(axis=2)
+
+
+def column(mesh, sigma, at=0., air=1e-8):
+    """
+    (sigma1D, thickness, top): the layers of the column of cells of a
+    CylMesh (at the radius at) or 3D tensor mesh (at (x, y)) below
+    the cells of conductivity air, consecutive equal cells merged, and the
+    elevation of their top
+    """
+    sigma = np.asarray(sigma, dtype=float).reshape(mesh.vnC, order='F')
+    at = np.asarray(at, dtype=float).ravel()
+    if mesh.dim == 3 and not getattr(mesh, 'isSymmetric', False):
+        x, y = np.broadcast_to(at, (2,))
+        col = sigma[
+            np.argmin(np.abs(mesh.vectorCCx - x)),
+            np.argmin(np.abs(mesh.vectorCCy - y)), :
+        ]
+    else:
+        col = sigma[np.argmin(np.abs(mesh.vectorCCx - at[0])), 0, :]
+    z = mesh.vectorNz
+    earth = np.where(col > air)[0]
+    if len(earth) == 0:
+        raise ValueError("The column has no cells below the air")
+    col, h = col[:earth[-1] + 1][::-1], np.diff(z)[:earth[-1] + 1][::-1]
+    keep = np.r_[True, col[1:] != col[:-1]]
+    starts = np.where(keep)[0]
+    thickness = np.add.reduceat(h, starts)
+    return col[starts], thickness[:-1], z[earth[-1] + 1]
+
+
+def dpred(prob, m, **kwargs):
+    """
+    1D counterpart of ``prob.survey.dpred(m)`` for the coincident loops of
+    a TDEM problem (``CircularLoop`` sources and z ``Point_dbdt`` receivers
+    at their centres): the layers of the column of the model below each
+    source, to compare with the results on the mesh of the problem
+    """
+    prob.model = m
+    sigma = prob.sigma
+    out = []
+    for src in prob.survey.srcList:
+        loc = np.asarray(src.loc, dtype=float).ravel()
+        sigma1D, thickness, top = column(prob.mesh, sigma, at=loc[:2])
+        for rx in src.rxList:
+            locs = np.atleast_2d(rx.locs)
+            if not (
+                isinstance(src, EM.TDEM.Src.CircularLoop) and
+                isinstance(rx, EM.TDEM.Rx.Point_dbdt) and
+                rx.projComp == 'z' and np.allclose(locs[:, :2], loc[:2])
+            ):
+                raise NotImplementedError(
+                    "Only dbz/dt at the centre of circular loops"
+                )
+            for z in locs[:, 2]:
+                out.append(dbdt(
+                    rx.times, sigma1D, thickness, waveform=src.waveform,
+                    radius=src.radius, height=loc[2] - top,
+                    rx_height=z - top, **kwargs
+                )[0])
+    return np.hstack(out)
+
+
+def _simulate(chunk):
+    times, sigma, thickness, height, kwargs = chunk
+    return dbdt(times, sigma, thickness, height=height, **kwargs)
+
+
+def simulate(
+    sigma, thickness, times, height=41., jobs=None, chunk_size=50,
+    **kwargs
+):
+    """
+    (nS, nt) dbz/dt of the soundings, (nS, nLayers) conductivities sigma
+    and heights height, chunk_size soundings at a time on jobs processes
+    (default: one per core); kwargs go to :func:`dbdt`
+    """
+    sigma, thickness = _layers(sigma, thickness)
+    height = np.broadcast_to(np.asarray(height, dtype=float), sigma.shape[:1])
+    chunks = [
+        (times, sigma[i:i+chunk_size], thickness[i:i+chunk_size],
+         height[i:i+chunk_size], kwargs)
+        for i in range(0, sigma.shape[0], chunk_size)
+    ]
+    if jobs is None:
+        jobs = multiprocessing.cpu_count()
+    jobs = max(min(int(jobs), len(chunks)), 1)
+    if jobs == 1:
+        return np.vstack([_simulate(chunk) for chunk in chunks])
+
+    pool = multiprocessing.Pool(jobs)
+    try:
+        out = pool.map(_simulate, chunks)
+        pool.close()
+    except BaseException:
+        pool.terminate()
+        raise
+    finally:
+        pool.join()
+    return np.vstack(out)
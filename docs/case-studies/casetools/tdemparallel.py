@@ -0,0 +1,227 @@
+"""
+Parallel time-domain EM forward modelling, one batch of transmitters at a
+time.
+
+The transmitters are split into batches that are simulated concurrently by
+a pool of worker processes. Each worker builds the mesh and the problem once
+from shared memory and keeps the factorization of every distinct time step
+for the life of the worker, so the factorizations are shared by all sources
+of a batch and re-used for every batch the worker solves. The predicted data
+are put back in transmitter order.
+
+.. code:: python
+
+    dpred = simulate(
+        mesh, sigma, xyz, times, timeSteps, Solver=Solver, jobs=4,
+        batch_size=50
+    )  # (ntx, ntimes)
+
+"""
+from __future__ import print_function
+
+import multiprocessing
+
+import numpy as np
+from SimPEG import EM, Maps
+
+from . import tdemstream
+
+
+def circular_loop_sources(locs, times, radius=13., orientation='z'):
+    """
+    Step-off circular loop sources at locs, each with a coincident b-field
+    receiver
+    """
+    srcList = []
+    for loc in locs:
+        rx = EM.TDEM.Rx.Point_b(
+            loc.reshape([1, -1]), times, orientation=orientation
+        )
+        src = EM.TDEM.Src.CircularLoop(
+            [rx], waveform=EM.TDEM.Src.StepOffWaveform(),
+            loc=loc.reshape([1, -1]), radius=radius
+        )
+        srcList.append(src)
+    return srcList
+
+
+class FactoredProblem3D_b(EM.TDEM.Problem3D_b):
+    """
+    Problem3D_b that keeps the factorization of each distinct time step
+    until the model changes, so several surveys can be simulated against
+    the same factors. Setting the model again to the same values keeps
+    them.
+    """
+
+    @property
+    def deleteTheseOnModelUpdate(self):
+        toDelete = super(FactoredProblem3D_b, self).deleteTheseOnModelUpdate
+        factored = getattr(self, '_factored_model', None)
+        if (
+            factored is None or self.model is None or
+            not np.array_equal(factored, self.model)
+        ):
+            toDelete = toDelete + ['_factors']
+        return toDelete
+
+    def factor(self, tInd):
+        if getattr(self, '_factors', None) is None:
+            self._factors = {}
+            self._factored_model = np.array(self.model, copy=True)
+        dt = self.timeSteps[tInd]
+        if dt not in self._factors:
+            self._factors[dt] = self.Solver(
+                self.getAdiag(tInd), **self.solverOpts
+            )
+        return self._factors[dt]
+
+    def clean(self):
+        for Ainv in (getattr(self, '_factors', None) or {}).values():
+            Ainv.clean()
+        self._factors = None
+
+    def fields(self, m):
+        self.model = m
+
+        F = self.fieldsPair(self.mesh, self.survey)
+
+        # set initial fields
+        F[:, self._fieldType+'Solution', 0] = self.getInitialFields()
+
+        # timestep to solve forward
+        for tInd, dt in enumerate(self.timeSteps):
+            Ainv = self.factor(tInd)
+            rhs = self.getRHS(tInd+1)
+            Asubdiag = self.getAsubdiag(tInd)
+            sol = Ainv * (
+                rhs - Asubdiag * F[:, (self._fieldType + 'Solution'), tInd]
+            )
+            if sol.ndim == 1:
+                sol.shape = (sol.size, 1)
+            F[:, self._fieldType+'Solution', tInd+1] = sol
+        return F
+
+
+# state of a worker process, set up once by _init_worker
+_worker = {}
+
+
+def _init_worker(
+    h, x0, sigma, locs, times, timeSteps, Solver, sources, source_kwargs
+):
+    from SimPEG import Mesh
+
+    mesh = Mesh.TensorMesh(h, x0=x0)
+    problem = FactoredProblem3D_b(
+        mesh, verbose=False, sigmaMap=Maps.IdentityMap(mesh)
+    )
+    problem.timeSteps = timeSteps
+    if Solver is not None:
+        problem.Solver = Solver
+
+    _worker.update(
+        problem=problem,
+        # views on the shared memory, nothing is copied
+        sigma=np.frombuffer(sigma, dtype=float),
+        locs=np.frombuffer(locs, dtype=float).reshape(-1, len(x0)),
+        times=times, sources=sources, source_kwargs=source_kwargs
+    )
+
+
+def _simulate(itxs):
+    problem = _worker['problem']
+    survey = EM.TDEM.Survey(_worker['sources'](
+        _worker['locs'][itxs, :], _worker['times'],
+        **_worker['source_kwargs']
+    ))
+    problem.unpair()
+    problem.pair(survey)
+    # only the data are needed: the fields are not kept over time
+    dpred = tdemstream.fields(problem, _worker['sigma']).dpred
+    return itxs, dpred.reshape(len(itxs), -1)
+
+
+def _shared(array):
+    array = np.ascontiguousarray(array, dtype=float)
+    shared = multiprocessing.RawArray('d', array.size)
+    np.frombuffer(shared, dtype=float)[:] = array.ravel()
+    return shared
+
+
+def batches(indices, batch_size):
+    indices = np.asarray(indices, dtype=int)
+    return [
+        indices[i:i + batch_size]
+        for i in range(0, len(indices), max(int(batch_size), 1))
+    ]
+
+
+def simulate(
+    mesh, sigma, locs, times, timeSteps, Solver=None, jobs=None,
+    batch_size=None, indices=None, callback=None,
+    sources=circular_loop_sources, **source_kwargs
+):
+    """
+    Predicted data, (len(indices), ntimes), of the transmitters at
+    locs[indices] (default: all).
+
+    The transmitters are simulated in batches of batch_size (default: an
+    even share per worker) by jobs processes (default: one per core).
+    callback(itxs, dpred) is called in the parent as each batch finishes,
+    e.g. to store the soundings. sources(locs, times, **source_kwargs)
+    builds the source list of a batch; it has to be importable from the
+    workers.
+    """
+    locs = np.atleast_2d(locs)
+    if indices is None:
+        indices = np.arange(locs.shape[0])
+    indices = np.asarray(indices, dtype=int)
+    if len(indices) == 0:
+        return np.empty((0, len(times)))
+    if jobs is None:
+        jobs = multiprocessing.cpu_count()
+    jobs = max(min(int(jobs), len(indices)), 1)
+    if batch_size is None:
+        batch_size = int(np.ceil(len(indices) / float(jobs)))
+
+    initargs = (
+        mesh.h, mesh.x0, _shared(sigma), _shared(locs), times, timeSteps,
+        Solver, sources, source_kwargs
+    )
+    order = dict((itx, i) for i, itx in enumerate(indices))
+    dpred = None
+
+    def collect(result):
+        itxs, d = result
+        out = dpred
+        if out is None:
+            out = np.empty((len(indices), d.shape[1]))
+        out[[order[itx] for itx in itxs], :] = d
+        if callback is not None:
+            callback(itxs, d)
+        return out
+
+    tasks = batches(indices, batch_size)
+    if jobs == 1:
+        _init_worker(*initargs)
+        try:
+            for itxs in tasks:
+                dpred = collect(_simulate(itxs))
+        finally:
+            _worker['problem'].clean()
+            _worker.clear()
+        return dpred
+
+    pool = multiprocessing.Pool(
+        jobs, initializer=_init_worker, initargs=initargs
+    )
+    try:
+        for result in pool.imap_unordered(_simulate, tasks):
+            dpred = collect(result)
+        pool.close()
+    except BaseException:
+        pool.terminate()
+        raise
+    finally:
+        pool.join()
+    return dpred
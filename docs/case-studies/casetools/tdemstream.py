@@ -0,0 +1,215 @@
+"""
+Time-domain EM fields that only keep the time steps of interest.
+
+``problem.fields(m)`` stores the solution at every time step for every
+source, which is what runs out of memory on 3D meshes. Here the problem is
+stepped through time holding only the previous solution: the receivers are
+evaluated at every step as it is solved (their time interpolation is applied
+at the end, so the data are those of ``survey.dpred``), the steps asked for
+(times or every other n-th step) are kept in memory and the others are
+either written to a compressed HDF5 store or dropped.
+
+.. code:: python
+
+    f = tdemstream.fields(prob, sigma, every=5, store='fields.h5')
+    dpred = f.dpred
+    e = f[src, 'e', 11]  # from memory, or read back from the store
+
+"""
+import numpy as np
+from SimPEG import Utils
+
+try:
+    import h5py
+except ImportError:
+    h5py = False
+
+
+def time_indices(prob, times=None, every=None):
+    """
+    Indices of the time steps (0 to prob.nT) closest to times, and every
+    every-th step (the last one included)
+    """
+    nT = prob.nT
+    tInds = []
+    if times is not None:
+        times = np.atleast_1d(times)
+        tInds += list(np.argmin(
+            np.abs(prob.times[:, None] - times[None, :]), axis=0
+        ))
+    if every is not None:
+        tInds += list(range(0, nT+1, int(every))) + [nT]
+    return sorted(set(int(tInd) for tInd in tInds))
+
+
+class StreamedFields(object):
+    """
+    Solutions of a TDEM problem at some of its time steps, indexed like the
+    fields of the problem: f[src, 'e', tInd]
+    """
+
+    def __init__(self, prob, tInds, store=None):
+        if store is not None and not h5py:
+            raise ImportError(
+                "Storing the fields needs h5py, install it with "
+                "`pip install h5py`"
+            )
+        self.prob = prob
+        self.survey = prob.survey
+        self.tInds = list(tInds)
+        self.solution = prob._fieldType + 'Solution'
+        self.dpred = None
+        self._fields = prob.fieldsPair(prob.mesh, prob.survey)
+        self._solutions = {}
+        self._store = None
+        if store is not None:
+            self._store = h5py.File(store, 'w')
+            nP = self._fields._storageShape(
+                self._fields.knownFields[self.solution]
+            )[0]
+            shape = (nP, self.survey.nSrc, prob.nT+1)
+            self._store.create_dataset(
+                self.solution, shape=shape, dtype=float,
+                chunks=(nP, self.survey.nSrc, 1), compression='gzip'
+            )
+            self._store.create_dataset('times', data=prob.times)
+
+    @property
+    def times(self):
+        return self.prob.times[self.tInds]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        if self._store is not None:
+            self._store.close()
+            self._store = None
+
+    def _set(self, tInd, sol):
+        if tInd in self.tInds:
+            self._solutions[tInd] = sol.copy()
+        elif self._store is not None:
+            self._store[self.solution][:, :, tInd] = sol
+
+    def _get(self, tInd):
+        if tInd in self._solutions:
+            return self._solutions[tInd]
+        if self._store is not None:
+            return self._store[self.solution][:, :, tInd]
+        raise KeyError(
+            "Time step {} was not kept, use one of {}".format(
+                tInd, self.tInds
+            )
+        )
+
+    def evaluate(self, name, sol, tInd, srcList=None):
+        """
+        Field name, (nP, nSrc), from the solution sol of the sources srcList
+        (default: all) at time step tInd
+        """
+        if srcList is None:
+            srcList = self.survey.srcList
+        if name == self.solution:
+            return sol
+        _, _, func = self._fields.aliasFields[name]
+        if not callable(func):
+            func = getattr(self._fields, func)
+        return func(sol, srcList, tInd)
+
+    def __getitem__(self, key):
+        src, name, tInd = key
+        if isinstance(src, list):
+            srcList = src
+        elif src == slice(None):
+            srcList = self.survey.srcList
+        else:
+            srcList = [src]
+        srcInd = [self.survey.srcList.index(s) for s in srcList]
+        sol = self._get(tInd)[:, srcInd]
+        out = self.evaluate(name, sol, tInd, srcList)
+        if out.shape[1] == 1:
+            return out[:, 0]
+        return out
+
+
+def _receivers(F):
+    """
+    Field each receiver projects, spatial and time projections of the
+    receivers, in the order of the data
+    """
+    prob = F.prob
+    receivers = []
+    for src in F.survey.srcList:
+        for rx in src.rxList:
+            name = rx.projField
+            if name not in F._fields.aliasFields and name != F.solution:
+                name = 'b'  # dbdt from the time derivative of b
+            receivers.append((
+                F.survey.srcList.index(src), name,
+                rx.getSpatialP(prob.mesh, F._fields),
+                rx.getTimeP(prob.timeMesh, F._fields)
+            ))
+    return receivers
+
+
+def fields(prob, m, times=None, every=None, store=None):
+    """
+    Solve the TDEM problem for model m, evaluating the receivers at every
+    time step but keeping only the steps closest to times and every
+    every-th step (default: none). The other steps go to the HDF5 file
+    store, if given, and are dropped otherwise. Returns a
+    :class:`StreamedFields`, with the predicted data in dpred.
+    """
+    prob.model = m
+    F = StreamedFields(
+        prob, time_indices(prob, times=times, every=every), store=store
+    )
+    receivers = _receivers(F)
+    names = set(name for _, name, _, _ in receivers)
+    projected = [
+        np.empty((Ps.shape[0], prob.nT+1)) for _, _, Ps, _ in receivers
+    ]
+
+    def project(tInd, sol):
+        values = dict(
+            (name, F.evaluate(name, sol, tInd)) for name in names
+        )
+        for (i, name, Ps, _), Y in zip(receivers, projected):
+            Y[:, tInd] = Ps * values[name][:, i]
+
+    sol = Utils.mkvc(prob.getInitialFields(), 2)
+    if sol.shape[1] != prob.survey.nSrc:
+        sol = sol.reshape((-1, prob.survey.nSrc), order='F')
+    F._set(0, sol)
+    project(0, sol)
+
+    # factors are kept while dt does not change (or by the problem itself,
+    # see tdemparallel.FactoredProblem3D_b)
+    factor = getattr(prob, 'factor', None)
+    Ainv = None
+    for tInd, dt in enumerate(prob.timeSteps):
+        if factor is not None:
+            Ainv = factor(tInd)
+        elif Ainv is None or dt != prob.timeSteps[tInd-1]:
+            if Ainv is not None:
+                Ainv.clean()
+            Ainv = prob.Solver(prob.getAdiag(tInd), **prob.solverOpts)
+
+        rhs = prob.getRHS(tInd+1)
+        sol = Ainv * (rhs - prob.getAsubdiag(tInd) * sol)
+        if sol.ndim == 1:
+            sol.shape = (sol.size, 1)
+        F._set(tInd+1, sol)
+        project(tInd+1, sol)
+    if factor is None and Ainv is not None:
+        Ainv.clean()
+
+    F.dpred = np.hstack([
+        Utils.mkvc((Pt * Y.T).T)
+        for (_, _, _, Pt), Y in zip(receivers, projected)
+    ])
+    return F
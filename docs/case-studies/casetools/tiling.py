@@ -0,0 +1,209 @@
+"""
+Overlapping tiles for potential field surveys too large for one inversion.
+
+The survey is split, in plan view, into a grid of tiles. Each tile keeps the
+stations of its core extended by an overlap, and gets its own padded
+TensorMesh around them, so the forward operator of a tile is
+nData_tile x nC_tile rather than nData x nC. The tiles are inverted
+independently on a pool of processes and their models are merged on a global
+mesh, blended linearly across the overlaps.
+
+.. code:: python
+
+    tiles = tiling.make_tiles(locXYZ, size=4000., overlap=1000.)
+    for tile in tiles:
+        tile.mesh = tiling.tile_mesh(tile.bounds, dx, hz, top)
+
+    def invert(tile):
+        survey = tile.survey(obs)
+        ...
+        return actvMap*mrec  # on tile.mesh
+
+    models = tiling.run(tiles, invert, jobs=4)
+    model = tiling.merge(mesh, tiles, models)
+
+"""
+from __future__ import print_function
+
+import multiprocessing
+
+import numpy as np
+from SimPEG import Mesh, Utils
+
+from .decimation import subset
+from .sweep import check_workers_reach
+
+
+class Tile(object):
+    """
+    Stations index of a survey that fall within core = [xmin, xmax, ymin,
+    ymax] extended by overlap, and the mesh they are inverted on
+    """
+
+    mesh = None
+
+    def __init__(self, index, core, overlap=0.):
+        self.index = np.asarray(index, dtype=int)
+        self.core = np.asarray(core, dtype=float)
+        self.overlap = float(overlap)
+
+    @property
+    def bounds(self):
+        return self.core + np.r_[-1., 1., -1., 1.]*self.overlap
+
+    @property
+    def nD(self):
+        return len(self.index)
+
+    def survey(self, survey):
+        """
+        LinearSurvey of the stations of the tile, with their data
+        """
+        return subset(survey, self.index)
+
+    def weights(self, xy):
+        """
+        Blending weights at points xy: one over the core, falling linearly
+        to zero at the edge of the overlap
+        """
+        xy = np.atleast_2d(xy)
+        w = np.ones(xy.shape[0])
+        for i in range(2):
+            lo, hi = self.core[2*i], self.core[2*i+1]
+            dist = np.maximum(lo - xy[:, i], xy[:, i] - hi)  # > 0 outside
+            if self.overlap > 0:
+                w *= np.clip(1. - dist/self.overlap, 0., 1.)
+            else:
+                w *= dist <= 0
+        return w
+
+
+def make_tiles(locs, size, overlap=0., min_data=1):
+    """
+    Grid of tiles, about size x size in plan view, covering the stations
+    locs. Tiles with less than min_data stations are dropped.
+    """
+    xy = np.atleast_2d(locs)[:, :2]
+    lo, hi = xy.min(axis=0), xy.max(axis=0)
+    n = np.maximum(np.ceil((hi - lo) / float(size)), 1).astype(int)
+    edges = [np.linspace(lo[i], hi[i], n[i]+1) for i in range(2)]
+
+    tiles = []
+    for j in range(n[1]):
+        for i in range(n[0]):
+            core = np.r_[
+                edges[0][i], edges[0][i+1], edges[1][j], edges[1][j+1]
+            ]
+            bounds = core + np.r_[-1., 1., -1., 1.]*overlap
+            index = np.where(
+                (xy[:, 0] >= bounds[0]) & (xy[:, 0] <= bounds[1]) &
+                (xy[:, 1] >= bounds[2]) & (xy[:, 1] <= bounds[3])
+            )[0]
+            if len(index) >= min_data:
+                tiles.append(Tile(index, core, overlap))
+    return tiles
+
+
+def tile_mesh(
+    bounds, dx, hz, top, dy=None, npad=5, expansion=1.3, align=None
+):
+    """
+    TensorMesh over bounds = [xmin, xmax, ymin, ymax], with core cells of
+    dx by dy and npad padding cells on each side. hz are the vertical cell
+    sizes, bottom up, in the format of TensorMesh; the top of the mesh is at
+    elevation top. Given a point align = [x, y], the core cell edges fall on
+    the grid of dx by dy through it (e.g. the core of a global mesh), so the
+    tile models can be merged without resampling.
+    """
+    if dy is None:
+        dy = dx
+    h = []
+    x0 = []
+    for i, d in enumerate([dx, dy]):
+        lo, hi = bounds[2*i], bounds[2*i+1]
+        if align is not None:
+            lo = align[i] + np.floor((lo - align[i]) / d)*d
+        ncore = max(int(np.ceil((hi - lo) / d)), 1)
+        if align is None:
+            lo = 0.5*(lo + hi) - 0.5*ncore*d
+        hi = Utils.meshTensor(
+            [(d, npad, -expansion), (d, ncore), (d, npad, expansion)]
+        )
+        h.append(hi)
+        x0.append(lo - hi[:npad].sum())
+    hz = Utils.meshTensor(hz)
+    h.append(hz)
+    x0.append(top - hz.sum())
+    return Mesh.TensorMesh(h, x0=np.r_[x0])
+
+
+def run(tiles, invert, jobs=None):
+    """
+    invert(tile) for every tile, on jobs processes (default: one per core);
+    results in tile order. Each process inverts one tile and is replaced, so
+    the memory of a tile is released as soon as it is done. As with
+    :func:`casetools.sweep.run`, an invert defined in a notebook only
+    reaches forked workers; a ValueError is raised otherwise.
+    """
+    if jobs is None:
+        jobs = multiprocessing.cpu_count()
+    jobs = max(min(int(jobs), len(tiles)), 1)
+    if jobs == 1:
+        return [invert(tile) for tile in tiles]
+    check_workers_reach(invert, 'invert')
+
+    pool = multiprocessing.Pool(jobs, maxtasksperchild=1)
+    try:
+        results = pool.map(invert, tiles, chunksize=1)
+        pool.close()
+    except BaseException:
+        pool.terminate()
+        raise
+    finally:
+        pool.join()
+    return results
+
+
+def cell_index(mesh, points):
+    """
+    Index of the cell of a tensor mesh holding each point, -1 outside
+    """
+    points = np.atleast_2d(points)
+    ijk = []
+    inside = np.ones(points.shape[0], dtype=bool)
+    for i, nodes in enumerate([mesh.vectorNx, mesh.vectorNy, mesh.vectorNz]):
+        j = np.searchsorted(nodes, points[:, i]) - 1
+        inside &= (points[:, i] >= nodes[0]) & (points[:, i] <= nodes[-1])
+        ijk.append(np.clip(j, 0, len(nodes)-2))
+    vnC = mesh.vnC
+    ind = ijk[0] + vnC[0]*(ijk[1] + vnC[1]*ijk[2])
+    ind[~inside] = -1
+    return ind
+
+
+def merge(mesh, tiles, models, ndv=-100):
+    """
+    Blend the models of the tiles, each on tile.mesh with ndv for inactive
+    cells, onto the cell centres of mesh. Cells seen by no tile get ndv.
+    """
+    points = mesh.gridCC
+    total = np.zeros((2, mesh.nC))
+    weight = np.zeros((2, mesh.nC))
+    for tile, model in zip(tiles, models):
+        model = np.asarray(model)
+        ind = cell_index(tile.mesh, points)
+        values = model[np.maximum(ind, 0)]
+        seen = (ind >= 0) & (values != ndv)
+
+        # blended over the cores and overlaps; cells only seen in the
+        # padding of the tiles get the average of the paddings
+        w = np.vstack([tile.weights(points[:, :2]), np.ones(mesh.nC)])*seen
+        total += w*values
+        weight += w
+
+    out = np.ones(mesh.nC)*ndv
+    padding = (weight[0] == 0) & (weight[1] > 0)
+    core = weight[0] > 0
+    out[core] = total[0, core] / weight[0, core]
+    out[padding] = total[1, padding] / weight[1, padding]
+    return out
@@ -0,0 +1,157 @@
+"""
+Binary, memory-mapped copies of UBC text files.
+
+Parsing large UBC meshes, models and observation files dominates the start
+up of the case studies. The readers here parse a text file once and store
+the result as ``.npy``/``.npz`` in a ``.ubccache`` folder next to it; later
+reads memory-map the binary copy. A cached copy is keyed on the size and
+modification time of the text file (and the mesh, for models), so editing
+or re-downloading the text file invalidates it.
+
+.. code:: python
+
+    from casetools import ubcio
+    mesh = ubcio.read_mesh('dc_mesh.txt')
+    sigma = ubcio.read_model(mesh, 'dc_sigma.txt')
+    data = ubcio.read_array('dcipdata_12150N.txt')
+
+Models and arrays are mapped copy-on-write: they can be modified in place
+without touching the cache. Files can be converted ahead of time with::
+
+    python -m casetools.ubcio --mesh dc_mesh.txt dc_sigma.txt
+    python -m casetools.ubcio --array dcipdata_12150N.txt
+
+"""
+from __future__ import print_function
+
+import argparse
+import glob
+import hashlib
+import os
+import sys
+import tempfile
+
+import numpy as np
+
+CACHE_DIRNAME = ".ubccache"
+
+
+def _stamp(path, *extra):
+    stat = os.stat(path)
+    sha = hashlib.sha1(
+        "{}:{!r}:{}".format(stat.st_size, stat.st_mtime, extra).encode("utf-8")
+    )
+    return sha.hexdigest()[:16]
+
+
+def cache_path(path, ext, *extra):
+    """
+    Where the binary copy of a text file is kept
+    """
+    dirname, name = os.path.split(os.path.abspath(path))
+    return os.path.join(
+        dirname, CACHE_DIRNAME,
+        "{}.{}{}".format(name, _stamp(path, *extra), ext)
+    )
+
+
+def _save(path, save, *args, **kwargs):
+    """
+    Write a cache file atomically and drop stale copies of the same file
+    """
+    dirname, name = os.path.split(path)
+    if not os.path.isdir(dirname):
+        os.makedirs(dirname)
+    prefix = name.split(".")[:-2]
+    for stale in glob.glob(os.path.join(
+        dirname, ".".join(prefix) + ".*" + os.path.splitext(name)[1]
+    )):
+        if stale != path:
+            os.remove(stale)
+
+    fd, tmp = tempfile.mkstemp(dir=dirname, suffix=os.path.splitext(name)[1])
+    try:
+        with os.fdopen(fd, "wb") as f:
+            save(f, *args, **kwargs)
+        os.chmod(tmp, 0o644)
+        os.rename(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+
+def _mmap(path):
+    # plain ndarray view of a copy-on-write map, so it behaves like the
+    # array parsed from text everywhere downstream
+    return np.asarray(np.load(path, mmap_mode="c"))
+
+
+def read_mesh(path):
+    """
+    TensorMesh from a UBC mesh file
+    """
+    from SimPEG import Mesh
+
+    cached = cache_path(path, ".npz")
+    if os.path.isfile(cached):
+        with np.load(cached) as f:
+            h = [f[k] for k in sorted(f.files) if k.startswith("h")]
+            return Mesh.TensorMesh(h, x0=f["x0"])
+
+    mesh = Mesh.TensorMesh.readUBC(path)
+    _save(
+        cached, np.savez,
+        x0=mesh.x0, **dict(("h{}".format(i), h) for i, h in enumerate(mesh.h))
+    )
+    return mesh
+
+
+def read_model(mesh, path):
+    """
+    Model on mesh from a UBC model file, memory-mapped
+    """
+    cached = cache_path(path, ".npy", tuple(mesh.vnC), tuple(mesh.x0))
+    if not os.path.isfile(cached):
+        model = mesh.readModelUBC(path)
+        _save(cached, np.save, np.asarray(model))
+    return _mmap(cached)
+
+
+def read_array(path, **kwargs):
+    """
+    np.loadtxt(path, **kwargs), memory-mapped
+    """
+    cached = cache_path(path, ".npy", sorted(kwargs.items()))
+    if not os.path.isfile(cached):
+        _save(cached, np.save, np.loadtxt(path, **kwargs))
+    return _mmap(cached)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Convert UBC text files to their binary cache"
+    )
+    parser.add_argument("models", nargs="*", help="UBC model files")
+    parser.add_argument("--mesh", help="UBC mesh of the models")
+    parser.add_argument(
+        "--array", action="append", default=[],
+        help="plain text data file (e.g. observations), can be repeated"
+    )
+    args = parser.parse_args(argv)
+
+    if args.models and not args.mesh:
+        parser.error("models need a --mesh")
+    if args.mesh:
+        mesh = read_mesh(args.mesh)
+        print(cache_path(args.mesh, ".npz"))
+        for model in args.models:
+            read_model(mesh, model)
+            print(cache_path(model, ".npy", tuple(mesh.vnC), tuple(mesh.x0)))
+    for array in args.array:
+        read_array(array)
+        print(cache_path(array, ".npy", []))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,192 @@
+"""
+Source waveforms of time-domain EM surveys evaluated on arrays of times.
+
+The SimPEG waveforms are evaluated one time at a time (``waveform.eval(t)``),
+by the notebooks to plot them and by the problem at every time step to build
+the right-hand side. Here the known waveforms (step-off, raw and VTEM) are
+evaluated on a whole time grid in one NumPy call, and the tables of a
+waveform and its derivative on the time mesh of a problem are computed once
+and cached, keyed by the waveform parameters and the time grid.
+
+.. code:: python
+
+    wave = waveforms.evaluate(src.waveform, prob.times)
+    waveforms.tabulate(prob)  # the sources look their waveform up
+
+"""
+import hashlib
+from collections import OrderedDict
+
+import numpy as np
+from SimPEG import EM
+
+#: number of (waveform, times) tables kept in memory
+CACHE_SIZE = 32
+
+_tables = OrderedDict()
+
+
+def _vtem(waveform, times):
+    on = times <= waveform.peakTime
+    ramp = (times < waveform.offTime) & ~on
+    scale = 1. - np.exp(-waveform.a)
+    wave = np.zeros(times.shape)
+    wave[on] = (1. - np.exp(-waveform.a*times[on]/waveform.peakTime))/scale
+    wave[ramp] = (
+        -1. / (waveform.offTime-waveform.peakTime) *
+        (times[ramp] - waveform.offTime)
+    )
+    dwave = np.zeros(times.shape)
+    dwave[on] = (
+        waveform.a/waveform.peakTime *
+        np.exp(-waveform.a*times[on]/waveform.peakTime)/scale
+    )
+    dwave[ramp] = -1. / (waveform.offTime-waveform.peakTime)
+    return wave, dwave
+
+
+def evaluate(waveform, times):
+    """
+    Waveform at times, an array
+    """
+    times = np.asarray(times, dtype=float)
+    if isinstance(waveform, TabulatedWaveform):
+        return waveform.lookup(times)[0]
+    if isinstance(waveform, EM.TDEM.Src.VTEMWaveform):
+        return _vtem(waveform, times)[0]
+    if isinstance(waveform, EM.TDEM.Src.StepOffWaveform):
+        return np.zeros(times.shape)
+    if isinstance(waveform, EM.TDEM.Src.RawWaveform):
+        try:
+            wave = np.asarray(waveform.waveFct(times), dtype=float)
+            if wave.shape == times.shape:
+                return wave
+        except (TypeError, ValueError):
+            pass  # waveFct only takes scalars
+    return np.reshape(
+        [waveform.eval(t) for t in times.ravel()], times.shape
+    ).astype(float)
+
+
+def derivative(waveform, times, dt=1e-9):
+    """
+    Time derivative of the waveform at times: exact for the VTEM and
+    step-off waveforms, centred differences of size dt otherwise
+    """
+    times = np.asarray(times, dtype=float)
+    if isinstance(waveform, TabulatedWaveform):
+        return waveform.lookup(times)[1]
+    if isinstance(waveform, EM.TDEM.Src.VTEMWaveform):
+        return _vtem(waveform, times)[1]
+    if isinstance(waveform, EM.TDEM.Src.StepOffWaveform):
+        return np.zeros(times.shape)
+    return (evaluate(waveform, times+dt) - evaluate(waveform, times-dt))/(2*dt)
+
+
+def parameters(waveform):
+    """
+    Hashable description of a waveform: its class and parameters
+    """
+    names = ['offTime', 'peakTime', 'a', 'eps', 'hasInitialFields', 'waveFct']
+    return (type(waveform).__name__,) + tuple(
+        (name, getattr(waveform, name)) for name in names
+        if name in vars(waveform) or name in vars(type(waveform))
+    )
+
+
+def key(waveform, times):
+    times = np.ascontiguousarray(times, dtype=float)
+    return parameters(waveform) + (hashlib.sha1(times.tobytes()).hexdigest(),)
+
+
+def table(waveform, times):
+    """
+    (wave, dwave), the waveform and its derivative at times, computed once
+    per waveform parameters and time grid
+    """
+    k = key(waveform, times)
+    if k in _tables:
+        _tables[k] = _tables.pop(k)  # most recently used
+        return _tables[k]
+    wave = evaluate(waveform, times)
+    dwave = derivative(waveform, times)
+    wave.flags.writeable = False
+    dwave.flags.writeable = False
+    _tables[k] = (wave, dwave)
+    while len(_tables) > CACHE_SIZE:
+        _tables.popitem(last=False)
+    return wave, dwave
+
+
+class TabulatedWaveform(EM.TDEM.Src.BaseWaveform):
+    """
+    Waveform looked up in its table on a time grid (e.g. the time mesh of
+    the problem); times off the grid are evaluated
+    """
+
+    def __init__(self, waveform, times):
+        self.waveform = waveform
+        self.times = np.asarray(times, dtype=float)
+        self.offTime = getattr(waveform, 'offTime', self.times[-1])
+        self.hasInitialFields = getattr(waveform, 'hasInitialFields', False)
+        self.wave, self.dwave = table(waveform, self.times)
+
+    def lookup(self, times):
+        times = np.asarray(times, dtype=float)
+        ind = np.clip(
+            np.searchsorted(self.times, times), 0, len(self.times)-1
+        )
+        found = self.times[ind] == times
+        if np.all(found):
+            return self.wave[ind], self.dwave[ind]
+        wave, dwave = self.wave[ind].copy(), self.dwave[ind].copy()
+        wave[~found] = evaluate(self.waveform, times[~found])
+        dwave[~found] = derivative(self.waveform, times[~found])
+        return wave, dwave
+
+    def eval(self, time):
+        return float(self.lookup(np.r_[time])[0][0])
+
+    def evalDeriv(self, time):
+        return float(self.lookup(np.r_[time])[1][0])
+
+
+class TabulatedSource(object):
+    """
+    Wrapper of a source that hands out its tabulated waveform, when it has
+    one, in place of its own
+    """
+
+    tabulated = None
+
+    @property
+    def waveform(self):
+        if self.tabulated is not None:
+            return self.tabulated
+        return super(TabulatedSource, self).waveform
+
+
+_sources = {}
+
+
+def _tabulated_class(cls):
+    if issubclass(cls, TabulatedSource):
+        return cls
+    if cls not in _sources:
+        _sources[cls] = type(cls)(
+            'Tabulated' + cls.__name__, (TabulatedSource, cls), {}
+        )
+    return _sources[cls]
+
+
+def tabulate(prob):
+    """
+    Look the waveforms of the sources of the survey of prob up in their
+    tables on the time mesh of prob. The sources keep their own waveform:
+    they are wrapped in a :class:`TabulatedSource` (the waveform setter of
+    the SimPEG sources does not allow replacing it)
+    """
+    for src in prob.survey.srcList:
+        src.__class__ = _tabulated_class(type(src))
+        src.tabulated = None
+        src.tabulated = TabulatedWaveform(src.waveform, prob.times)
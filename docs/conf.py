@@ -41,6 +41,7 @@ extensions = [
     'edit_on_github',
     'IPython.sphinxext.ipython_console_highlighting',
     'nbsphinx',
+    'nbcache',  # replay unchanged notebooks instead of re-executing them
     'pyexec'
     # 'sphinx_gallery.gen_gallery'
     # 'sphinxcontrib.bibtex', # citations that can be made from a bibtex
@@ -138,6 +139,16 @@ edit_on_github_project = 'geoscixyz/computation'
 edit_on_github_branch = 'master'
 check_meta = False
 
+# -- Notebook execution cache ---------------------------------------------
+
+# executed notebooks are cached in NBCACHE_DIR (default
+# ~/.cache/geosci-computation/nbcache), capped at NBCACHE_MAXSIZE MB
+nbcache_dir = os.environ.get('NBCACHE_DIR')
+nbcache_maxsize = os.environ.get('NBCACHE_MAXSIZE')
+# shared code and data the notebooks import, relative to this folder; a
+# change to any of them re-executes the notebooks
+nbcache_extra_inputs = [os.path.join('case-studies', 'casetools')]
+
 # -- Options for HTML output ----------------------------------------------
 
 # The theme to use for HTML and HTML Help pages.  See the documentation for
@@ -1,12 +1,256 @@
 # Import numpy, python's n-dimensional array package,
 # the mesh class with differential operators from SimPEG
 # matplotlib, the basic python plotting package
+from collections import OrderedDict
+import io
+import threading
+
 import numpy as np
-from SimPEG import Mesh, Utils, Solver
+from SimPEG import Mesh, Utils, SolverLU
 import matplotlib.pyplot as plt
 plt.set_cmap(plt.get_cmap('viridis'))  # use a nice colormap!
 
 
+class DCEngine(object):
+    """
+    DC resistivity on a unit-square mesh with a conductive block.
+
+    The mesh and the operators are built once. Factorizations of the system
+    matrix (and the potentials solved with them) are kept for the
+    `cache_size` most recently used (sigma_background, sigma_block) pairs,
+    so moving a slider back and forth, or switching between plot types,
+    does not solve the problem again.
+    """
+
+    def __init__(
+        self, n=100, cache_size=8,
+        x_block=np.r_[0.4, 0.6], y_block=np.r_[0.4, 0.6]
+    ):
+        # Define a unit-cell mesh
+        self.mesh = Mesh.TensorMesh([n, n])  # setup a mesh on which to solve
+        self.cache_size = cache_size
+
+        # operators that do not depend on the model
+        self.Div = self.mesh.faceDiv
+        self.Vol = Utils.sdiag(self.mesh.vol)
+
+        # indices of the block on the mesh
+        gridCC = self.mesh.gridCC
+        self.block_indices = (
+            (gridCC[:, 0] >= x_block[0]) &  # left boundary
+            (gridCC[:, 0] <= x_block[1]) &  # right boundary
+            (gridCC[:, 1] >= y_block[0]) &  # bottom boundary
+            (gridCC[:, 1] <= y_block[1])    # top boundary
+        )
+
+        self._factors = OrderedDict()  # model -> (Sigma, Ainv)
+        self._phi = OrderedDict()  # (model, source) -> phi
+
+        # the progressive widget solves from a background thread
+        self._lock = threading.RLock()
+
+    @staticmethod
+    def _lru_get(cache, key):
+        value = cache.pop(key, None)
+        if value is not None:
+            cache[key] = value  # most recently used goes last
+        return value
+
+    def _lru_put(self, cache, key, value, size):
+        cache[key] = value
+        while len(cache) > size:
+            cache.popitem(last=False)
+        return value
+
+    def sigma(self, sigma_background, sigma_block):
+        """
+        Physical property model with the block
+        """
+        sigma = sigma_background * np.ones(self.mesh.nC)
+        sigma[self.block_indices] = sigma_block
+        return sigma
+
+    def factor(self, sigma_background, sigma_block):
+        """
+        Face inner product and factorized system matrix for a model
+        """
+        key = (sigma_background, sigma_block)
+        with self._lock:
+            factors = self._lru_get(self._factors, key)
+            if factors is None:
+                sigma = self.sigma(sigma_background, sigma_block)
+                Sigma = self.mesh.getFaceInnerProduct(
+                    sigma, invProp=True, invMat=True
+                )
+
+                # assemble the system matrix
+                A = self.Vol * self.Div * Sigma * self.Div.T * self.Vol
+
+                # factor it once, re-use it for every solve with this model
+                Ainv = SolverLU(A, checkAccuracy=False)
+                factors = self._lru_put(
+                    self._factors, key, (Sigma, Ainv), self.cache_size
+                )
+            return factors
+
+    def closest_cells(self, locs):
+        """
+        Index of the cell closest to each location, found one axis at a
+        time on the tensor mesh
+        """
+        locs = np.atleast_2d(locs)
+        ix = np.argmin(
+            (self.mesh.vectorCCx[None, :] - locs[:, [0]])**2, axis=1
+        )
+        iy = np.argmin(
+            (self.mesh.vectorCCy[None, :] - locs[:, [1]])**2, axis=1
+        )
+        return ix + iy * len(self.mesh.vectorCCx)
+
+    def source_indices(self, a_loc, b_loc):
+        """
+        Cells closest to the A and B electrodes
+        """
+        return self.closest_cells(np.vstack([a_loc, b_loc]))
+
+    def potential(self, sigma_background, sigma_block, a_loc, b_loc):
+        """
+        Electric potential for a +1/-1 source at the A and B electrodes
+        """
+        source_loc_inds = self.source_indices(a_loc, b_loc)
+        key = (sigma_background, sigma_block, tuple(source_loc_inds))
+        with self._lock:
+            phi = self._lru_get(self._phi, key)
+            if phi is None:
+                _, Ainv = self.factor(sigma_background, sigma_block)
+
+                # right hand side
+                q = np.zeros(self.mesh.nC)
+                q[source_loc_inds] = np.r_[+1, -1]
+
+                phi = self._lru_put(
+                    self._phi, key, Ainv * q, self.cache_size
+                )
+            return phi
+
+    def potentials(self, sigma_background, sigma_block, a_locs, b_locs):
+        """
+        Electric potentials for many A-B pairs, solved against a single
+        factorization. a_locs and b_locs are (nSrc, 2) arrays, the result
+        is a (nC, nSrc) array.
+        """
+        a_inds = self.closest_cells(a_locs)
+        b_inds = self.closest_cells(b_locs)
+        src_inds = np.arange(len(a_inds))
+
+        # one right hand side per source
+        Q = np.zeros((self.mesh.nC, len(a_inds)))
+        np.add.at(Q, (a_inds, src_inds), +1.)
+        np.add.at(Q, (b_inds, src_inds), -1.)
+
+        _, Ainv = self.factor(sigma_background, sigma_block)
+        return (Ainv * Q).reshape(Q.shape)
+
+    def dipole_voltages(self, phi, m_locs, n_locs):
+        """
+        Potential differences between the M and N electrodes, (nRx, 2)
+        arrays, for every column of phi. Returns a (nRx, nSrc) array.
+        """
+        P = (
+            self.mesh.getInterpolationMat(np.atleast_2d(m_locs), 'CC') -
+            self.mesh.getInterpolationMat(np.atleast_2d(n_locs), 'CC')
+        )
+        return P * phi
+
+    def survey(
+        self, sigma_background, sigma_block, a_locs, b_locs, m_locs, n_locs
+    ):
+        """
+        Potentials (nC, nSrc) and dipole voltages (nRx, nSrc) for many
+        A-B pairs, e.g. to build a pseudo-section
+        """
+        phi = self.potentials(sigma_background, sigma_block, a_locs, b_locs)
+        return phi, self.dipole_voltages(phi, m_locs, n_locs)
+
+    def current(self, sigma_background, sigma_block, a_loc, b_loc):
+        """
+        Current density on the faces
+        """
+        Sigma, _ = self.factor(sigma_background, sigma_block)
+        phi = self.potential(sigma_background, sigma_block, a_loc, b_loc)
+        return Sigma * self.Div.T * self.Vol * phi
+
+
+_engines = {}  # mesh size -> engine
+
+
+def get_engine(n=100):
+    """
+    The engine on an n x n mesh shared by the widgets in this module
+    """
+    if n not in _engines:
+        _engines[n] = DCEngine(n=n)
+    return _engines[n]
+
+
+def dc_survey(
+    a_locs, b_locs, m_locs, n_locs,
+    log_sigma_background=1.,  # Conductivity of the background, S/m
+    log_sigma_block=2         # Conductivity of the block, S/m
+):
+    """
+    Solve every A-B pair in one go and sample the M-N dipole voltages.
+    Returns phi (nC, nSrc) and the voltages (nRx, nSrc).
+    """
+    return get_engine().survey(
+        10**log_sigma_background, 10**log_sigma_block,
+        a_locs, b_locs, m_locs, n_locs
+    )
+
+
+def plot_dc(engine, sigma_background, sigma_block, plot_type, ax=None):
+    """
+    Plot the conductivity, potential or current of a model on ax
+    """
+    if ax is None:
+        ax = plt.gca()
+    mesh = engine.mesh
+
+    # Define a source
+    a_loc, b_loc = np.r_[0.2, 0.5], np.r_[0.8, 0.5]
+
+    # locate it on the mesh
+    source_loc_inds = engine.source_indices(a_loc, b_loc)
+    a_loc_mesh = mesh.gridCC[source_loc_inds[0], :]
+    b_loc_mesh = mesh.gridCC[source_loc_inds[1], :]
+
+    if plot_type == 'conductivity':
+        sigma = engine.sigma(sigma_background, sigma_block)
+        ax.figure.colorbar(mesh.plotImage(sigma, ax=ax)[0], ax=ax)
+        ax.plot(a_loc_mesh[0], a_loc_mesh[1], 'wv', markersize=8)
+        ax.plot(b_loc_mesh[0], b_loc_mesh[1], 'w^', markersize=8)
+        ax.set_title('electrical conductivity, $\sigma$')
+        return ax
+
+    if plot_type == 'potential':
+        phi = engine.potential(sigma_background, sigma_block, a_loc, b_loc)
+        ax.figure.colorbar(mesh.plotImage(phi, ax=ax)[0], ax=ax)
+        ax.set_title('Electric Potential, $\phi$')
+        return ax
+
+    if plot_type == 'current':
+        j = engine.current(sigma_background, sigma_block, a_loc, b_loc)
+        ax.figure.colorbar(mesh.plotImage(
+            j,
+            vType='F',
+            view='vec',
+            streamOpts={'color': 'w'},
+            ax=ax
+        )[0], ax=ax)
+        ax.set_title('Current, $j$')
+        return ax
+
+
 def dc_resistivity(
     log_sigma_background=1.,  # Conductivity of the background, S/m
     log_sigma_block=2,        # Conductivity of the block, S/m
@@ -15,73 +259,148 @@ def dc_resistivity(
     from pylab import rcParams
     rcParams['figure.figsize'] = 10, 10
 
-    # Define a unit-cell mesh
-    mesh = Mesh.TensorMesh([100, 100])  # setup a mesh on which to solve
-
     # model parameters
     sigma_background = 10**log_sigma_background
     sigma_block = 10**log_sigma_block
 
-    # add a block to our model
-    x_block = np.r_[0.4, 0.6]
-    y_block = np.r_[0.4, 0.6]
+    plot_dc(get_engine(), sigma_background, sigma_block, plot_type)
 
-    # assign them on the mesh
-    # create a physical property model
-    sigma = sigma_background * np.ones(mesh.nC)
 
-    block_indices = ((mesh.gridCC[:, 0] >= x_block[0]) &  # left boundary
-                     (mesh.gridCC[:, 0] <= x_block[1]) &  # right boundary
-                     (mesh.gridCC[:, 1] >= y_block[0]) &  # bottom boundary
-                     (mesh.gridCC[:, 1] <= y_block[1]))   # top boundary
+class ProgressiveDC(object):
+    """
+    Coarse-to-fine DC widget.
 
-    # add the block to the physical property model
-    sigma[block_indices] = sigma_block
+    Every change of the controls is solved on the coarsest mesh in
+    `levels` and shown straight away, the finer meshes are then solved in a
+    background thread and replace the image as each one finishes. A newer
+    change cancels the refinement still in flight: the level being solved
+    is finished but not drawn, and the remaining levels are skipped.
 
-    # Define a source
-    a_loc, b_loc = np.r_[0.2, 0.5], np.r_[0.8, 0.5]
-    source_locs = [a_loc, b_loc]
+    .. code:: python
 
-    # locate it on the mesh
-    source_loc_inds = Utils.closestPoints(mesh, source_locs)
-    a_loc_mesh = mesh.gridCC[source_loc_inds[0], :]
-    b_loc_mesh = mesh.gridCC[source_loc_inds[1], :]
+        from dc_interact import ProgressiveDC
+        ProgressiveDC(levels=(25, 50, 100)).widget()
 
-    if plot_type == 'conductivity':
-        plt.colorbar(mesh.plotImage(sigma)[0])
-        plt.plot(a_loc_mesh[0], a_loc_mesh[1], 'wv', markersize=8)
-        plt.plot(b_loc_mesh[0], b_loc_mesh[1], 'w^', markersize=8)
-        plt.title('electrical conductivity, $\sigma$')
-        return
+    """
 
-    # Assemble and solve the DC resistivity problem
-    Div = mesh.faceDiv
-    Sigma = mesh.getFaceInnerProduct(sigma, invProp=True, invMat=True)
-    Vol = Utils.sdiag(mesh.vol)
+    def __init__(self, levels=(25, 50, 100), figsize=(6, 6), dpi=90):
+        self.levels = sorted(levels)
+        self.figsize = figsize
+        self.dpi = dpi
+        self.image = None  # ipywidgets.Image, created in widget()
+        self.status = None  # ipywidgets.Label
 
-    # assemble the system matrix
-    A = Vol * Div * Sigma * Div.T * Vol
+        self._generation = 0
+        self._request = None
+        self._cond = threading.Condition()
+        self._thread = None
 
-    # right hand side
-    q = np.zeros(mesh.nC)
-    q[source_loc_inds] = np.r_[+1, -1]
+    def render(
+        self, n, log_sigma_background, log_sigma_block, plot_type
+    ):
+        """
+        PNG of the solution on an n x n mesh
+        """
+        # figures are not made with pyplot so they are safe to draw off
+        # the main thread and are not shown by the inline backend
+        from matplotlib.figure import Figure
+        from matplotlib.backends.backend_agg import FigureCanvasAgg
 
-    # solve the DC resistivity problem
-    Ainv = Solver(A)  # create a matrix that behaves like A inverse
-    phi = Ainv * q
+        fig = Figure(figsize=self.figsize, dpi=self.dpi)
+        FigureCanvasAgg(fig)
+        ax = fig.add_subplot(111)
+        plot_dc(
+            get_engine(n), 10**log_sigma_background, 10**log_sigma_block,
+            plot_type, ax=ax
+        )
+        ax.set_title('{0} ({1} x {1} mesh)'.format(ax.get_title(), n))
 
-    if plot_type == 'potential':
-        plt.colorbar(mesh.plotImage(phi)[0])
-        plt.title('Electric Potential, $\phi$')
-        return
+        buf = io.BytesIO()
+        fig.savefig(buf, format='png')
+        return buf.getvalue()
 
-    if plot_type == 'current':
-        j = Sigma * mesh.faceDiv.T * Utils.sdiag(mesh.vol) * phi
-        plt.colorbar(mesh.plotImage(
-            j,
-            vType='F',
-            view='vec',
-            streamOpts={'color': 'w'}
-        )[0])
-        plt.title('Current, $j$')
-        return
+    def _show(self, generation, n, png):
+        with self._cond:
+            if generation != self._generation:
+                return  # a newer request is on its way
+            self.image.value = png
+            if n == self.levels[-1]:
+                self.status.value = 'done'
+            else:
+                self.status.value = 'refining ...'
+
+    def update(
+        self, log_sigma_background=1., log_sigma_block=2,
+        plot_type='potential'
+    ):
+        """
+        Show the coarsest level now and queue the refinement
+        """
+        args = (log_sigma_background, log_sigma_block, plot_type)
+        with self._cond:
+            self._generation += 1
+            generation = self._generation
+            self._request = None  # cancel the refinement in flight
+
+        self._show(generation, self.levels[0], self.render(
+            self.levels[0], *args
+        ))
+
+        if len(self.levels) > 1:
+            with self._cond:
+                self._request = (generation, args)
+                self._cond.notify()
+            self._start()
+
+    def _start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._refine)
+            self._thread.daemon = True
+            self._thread.start()
+
+    def _refine(self):
+        while True:
+            with self._cond:
+                while self._request is None:
+                    self._cond.wait()
+                generation, args = self._request
+                self._request = None
+
+            for n in self.levels[1:]:
+                if generation != self._generation:
+                    break
+                try:
+                    png = self.render(n, *args)
+                except Exception as err:
+                    with self._cond:
+                        if generation == self._generation:
+                            self.status.value = 'refinement failed: {}'.format(
+                                err
+                            )
+                    break
+                self._show(generation, n, png)
+
+    def widget(self):
+        """
+        Sliders, plot type and the image they drive
+        """
+        import ipywidgets
+
+        self.image = ipywidgets.Image(format='png')
+        self.status = ipywidgets.Label()
+        controls = ipywidgets.interactive(
+            self.update,
+            log_sigma_background=(-4, 4),
+            log_sigma_block=(-4, 4),
+            plot_type=['potential', 'conductivity', 'current']
+        )
+        controls.update()
+        return ipywidgets.VBox([controls, self.image, self.status])
+
+
+def dc_resistivity_progressive(levels=(25, 50, 100)):
+    """
+    Widget for :func:`dc_resistivity` that previews on a coarse mesh and
+    refines in the background. Pass levels to choose the mesh sizes.
+    """
+    return ProgressiveDC(levels=levels).widget()
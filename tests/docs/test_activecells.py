@@ -0,0 +1,94 @@
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+import numpy as np
+from SimPEG import Mesh, Utils
+
+dirname, _ = os.path.split(os.path.abspath(__file__))
+sys.path.append(os.path.sep.join(dirname.split(os.path.sep)[:-2]+['docs', 'case-studies']))
+from casetools import activecells
+
+
+class ActiveCells_Test(unittest.TestCase):
+
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+        rng = np.random.RandomState(0)
+        self.mesh = Mesh.TensorMesh([
+            [(5., 4, -1.3), (5., 12), (5., 4, 1.3)],
+            [(5., 3, -1.3), (5., 10), (5., 3, 1.3)],
+            [(5., 4, -1.3), (5., 10)]
+        ], 'CCC')
+        self.topo = np.c_[
+            rng.uniform(-100., 100., (2000, 2)),
+            rng.uniform(-30., 10., 2000)
+        ]
+
+    def tearDown(self):
+        shutil.rmtree(self.cache_dir)
+
+    def test_nodes(self):
+        actv, inds = activecells.active(
+            self.mesh, self.topo, cache_dir=self.cache_dir
+        )
+        ref = Utils.surface2ind_topo(self.mesh, self.topo, 'N')
+        self.assertTrue(np.all(actv == ref))
+        self.assertTrue(np.all(inds == np.where(ref)[0]))
+
+    def test_nodes_2D(self):
+        mesh = Mesh.TensorMesh([[(5., 30)], [(5., 20)]], 'CN')
+        x = np.linspace(-100., 100., 50)
+        topo = np.c_[x, 10.*np.sin(x/20.) - 40.]
+        actv, _ = activecells.active(mesh, topo, cache_dir=self.cache_dir)
+        self.assertTrue(np.all(
+            actv == Utils.surface2ind_topo(mesh, topo, 'N')
+        ))
+
+    def test_cell_centers(self):
+        actv, _ = activecells.active(
+            self.mesh, self.topo, gridLoc='CC', cache_dir=self.cache_dir
+        )
+        top = Utils.mkvc(activecells.surface(self.mesh, self.topo, 'CC'))
+        self.assertTrue(np.all(
+            actv == (self.mesh.gridCC[:, 2] <= np.tile(top, self.mesh.nCz))
+        ))
+
+    def test_cache(self):
+        actv, _ = activecells.active(
+            self.mesh, self.topo, cache_dir=self.cache_dir
+        )
+        path = os.path.join(
+            self.cache_dir, activecells.key(self.mesh, self.topo) + '.npy'
+        )
+        self.assertTrue(os.path.isfile(path))
+        self.assertEqual(os.listdir(self.cache_dir), [os.path.basename(path)])
+        # read back from the cache
+        counts = np.load(path)
+        counts[:] = 0
+        np.save(path, counts)
+        actv, inds = activecells.active(
+            self.mesh, self.topo, cache_dir=self.cache_dir
+        )
+        self.assertFalse(actv.any())
+        self.assertEqual(len(inds), 0)
+
+    def test_topography(self):
+        actv, inds = activecells.active(
+            self.mesh, self.topo, cache_dir=self.cache_dir
+        )
+        mesh2D, topoCC = activecells.topography(self.mesh, inds)
+        self.assertEqual(mesh2D.nC, self.mesh.nCx*self.mesh.nCy)
+        ZC = self.mesh.gridCC[:, 2].reshape((mesh2D.nC, -1), order='F')
+        ACTV = actv.reshape((mesh2D.nC, -1), order='F')
+        for i in range(mesh2D.nC):
+            if ACTV[i].any():
+                self.assertEqual(topoCC[i], ZC[i][ACTV[i]].max())
+            else:
+                self.assertTrue(np.isnan(topoCC[i]))
+
+
+if __name__ == '__main__':
+    unittest.main()
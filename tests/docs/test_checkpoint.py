@@ -0,0 +1,86 @@
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+import numpy as np
+from SimPEG import (
+    Mesh, Problem, Survey, Maps, Regularization, DataMisfit, Optimization,
+    InvProblem, Directives, Inversion
+)
+
+dirname, _ = os.path.split(os.path.abspath(__file__))
+sys.path.append(os.path.sep.join(dirname.split(os.path.sep)[:-2]+['docs', 'case-studies']))
+from casetools import checkpoint
+
+
+class Interrupt(Directives.InversionDirective):
+    """
+    Stop the inversion as if the job was killed
+    """
+    at = None
+
+    def endIter(self):
+        if self.opt.iter == self.at:
+            raise KeyboardInterrupt
+
+
+class Checkpoint_Test(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.fileName = os.path.join(self.tmpdir, 'checkpoint.npz')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def inversion(self, at=None):
+        np.random.seed(1)
+        mesh = Mesh.TensorMesh([50])
+        prob = Problem.LinearProblem(mesh, G=np.random.randn(20, 50))
+        survey = Survey.LinearSurvey()
+        survey.pair(prob)
+        mtrue = np.zeros(50)
+        mtrue[20:30] = 1.
+        survey.dobs = prob.G.dot(mtrue) + 0.01*np.random.randn(20)
+
+        reg = Regularization.Sparse(mesh, mapping=Maps.IdentityMap(mesh))
+        reg.norms = [0., 1., 1., 1.]
+        reg.eps_p = reg.eps_q = 1e-2
+        dmis = DataMisfit.l2_DataMisfit(survey)
+        dmis.W = np.ones(20)/0.01
+        opt = Optimization.ProjectedGNCG(
+            maxIter=20, lower=-2., upper=2., maxIterCG=20, tolCG=1e-4
+        )
+        invProb = InvProblem.BaseInvProblem(dmis, reg, opt)
+
+        self.IRLS = Directives.Update_IRLS(f_min_change=1e-4, minGNiter=3)
+        interrupt = Interrupt()
+        interrupt.at = at
+        return Inversion.BaseInversion(invProb, directiveList=[
+            Directives.BetaEstimate_ByEig(), self.IRLS,
+            Directives.Update_lin_PreCond(),
+            checkpoint.SaveCheckpoint(fileName=self.fileName), interrupt
+        ])
+
+    def test_resume(self):
+        m0 = np.ones(50)*1e-4
+        mref = checkpoint.run(self.inversion(), m0, resume=False)
+        mode = self.IRLS.mode
+        os.remove(self.fileName)
+
+        # killed half way, then picked up from the checkpoint
+        self.assertRaises(
+            KeyboardInterrupt, checkpoint.run, self.inversion(at=12), m0, True
+        )
+        inv = self.inversion()
+        m = checkpoint.run(inv, m0, resume=True)
+
+        self.assertEqual(inv.invProb.opt.iter, 20)
+        self.assertEqual(self.IRLS.mode, mode)
+        self.assertTrue(np.allclose(m, mref))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,98 @@
+import os
+import sys
+import unittest
+
+import numpy as np
+from SimPEG import Mesh, Maps, PF
+
+dirname, _ = os.path.split(os.path.abspath(__file__))
+sys.path.append(os.path.sep.join(dirname.split(os.path.sep)[:-2]+['docs', 'case-studies']))
+from casetools import compression
+
+
+class Compression_Test(unittest.TestCase):
+
+    def setUp(self):
+        mesh = Mesh.TensorMesh([[(10., 16)], [(10., 16)], [(10., 9)]], 'CCN')
+        actv = np.where(mesh.gridCC[:, 2] < -20.)[0]
+        xr = np.linspace(-60., 60., 10)
+        X, Y = np.meshgrid(xr, xr)
+        locs = np.c_[X.ravel(), Y.ravel(), np.ones(X.size)*2.]
+
+        survey = PF.BaseGrav.LinearSurvey(
+            PF.BaseGrav.SrcField([PF.BaseGrav.RxObs(locs)])
+        )
+        self.prob = PF.Gravity.GravityIntegral(
+            mesh, rhoMap=Maps.IdentityMap(nP=len(actv)), actInd=actv
+        )
+        survey.pair(self.prob)
+        self.G = self.prob.G
+        self.W = compression.transform(self.prob)
+
+    def test_haar(self):
+        a = np.random.randn(3, 7, 4)
+        for axis in range(3):
+            w = compression.haar(a, axis)
+            self.assertTrue(np.allclose(compression.ihaar(w, axis), a))
+            self.assertAlmostEqual(np.linalg.norm(w), np.linalg.norm(a))
+
+        m = np.random.randn(self.W.nC)
+        self.assertTrue(np.allclose(self.W.adjoint(self.W.forward(m)), m))
+
+    def test_wavelet(self):
+        Gc = compression.wavelet(
+            compression.sensitivity.kernel(self.prob), self.W, tol=1e-2,
+            jobs=1, block_size=0.5
+        )
+        # each row is within tol of the dense row
+        err = Gc.rdot(np.eye(self.G.shape[0])).T - self.G
+        self.assertTrue(np.all(
+            np.linalg.norm(err, axis=1) <=
+            1.0001e-2*np.linalg.norm(self.G, axis=1)
+        ))
+        self.assertTrue(np.allclose(Gc.sumsq, np.sum(self.G**2., axis=0)))
+
+        out = compression.report(Gc, self.G, verbose=False)
+        self.assertTrue(out['ratio'] > 1.)
+        self.assertTrue(out['forward'] < 1e-2)
+
+    def test_aca(self):
+        A = np.random.randn(60, 6).dot(np.random.randn(6, 80))
+        Gc = compression.aca(A, tol=1e-8)
+        self.assertTrue(Gc.rank < 10)
+        self.assertTrue(np.allclose(Gc.U.dot(Gc.V), A))
+
+        Gc = compression.aca(self.G, tol=1e-2)
+        self.assertTrue(
+            np.linalg.norm(Gc.U.dot(Gc.V) - self.G) <
+            2e-2*np.linalg.norm(self.G)
+        )
+
+        # the same crosses, evaluated from the kernel without a dense G
+        kernel = compression.sensitivity.kernel(self.prob)
+        calls = []
+        columns = kernel.columns
+        kernel.columns = lambda j0, j1: calls.append(j1-j0) or columns(j0, j1)
+        Gk = compression.aca(kernel, tol=1e-2)
+        self.assertEqual(Gk.rank, Gc.rank)
+        self.assertEqual(len(calls), Gk.rank)
+        self.assertTrue(np.allclose(Gk.U.dot(Gk.V), Gc.U.dot(Gc.V)))
+
+        # the keyword arguments of the wavelet method are accepted
+        Gp = compression.compress(self.prob, tol=1e-2, method='aca', jobs=4)
+        self.assertTrue(np.allclose(Gp.U.dot(Gp.V), Gc.U.dot(Gc.V)))
+        self.assertRaises(
+            TypeError, compression.compress, self.prob, method='aca',
+            maxrank=3
+        )
+        self.assertRaises(
+            TypeError, compression.compress, self.prob, method='wavelet',
+            max_rank=3
+        )
+        self.assertRaises(
+            ValueError, compression.compress, self.prob, method='svd'
+        )
+
+
+if __name__ == '__main__':
+    unittest.main()
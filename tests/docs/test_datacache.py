@@ -0,0 +1,71 @@
+import json
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+dirname, _ = os.path.split(os.path.abspath(__file__))
+sys.path.append(os.path.sep.join(dirname.split(os.path.sep)[:-2]+['docs', 'case-studies']))
+from casetools import datacache
+
+URL = 'https://storage.googleapis.com/simpeg/test/data.txt'
+
+
+class DataCache_Test(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.mirror = os.path.join(self.tmpdir, 'mirror')
+        os.makedirs(os.path.join(self.mirror, 'simpeg', 'test'))
+        with open(os.path.join(self.mirror, 'simpeg', 'test', 'data.txt'), 'w') as f:
+            f.write('1 2 3\n')
+        self.cache = datacache.DataCache(
+            os.path.join(self.tmpdir, 'cache'), self.mirror
+        )
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_get(self):
+        self.assertTrue(self.cache.lookup(URL) is None)
+        path = self.cache.get(URL)
+        with open(path) as f:
+            self.assertEqual(f.read(), '1 2 3\n')
+
+        # pinned on first use, the mirror is not needed anymore
+        shutil.rmtree(self.mirror)
+        self.assertEqual(self.cache.get(URL), path)
+        self.assertEqual(self.cache.get(URL, os.path.basename(path)), path)
+        self.assertTrue(self.cache.verify(URL))
+
+    def test_checksum(self):
+        self.assertRaises(
+            datacache.ChecksumError, self.cache.get, URL, '0' * 64
+        )
+        self.assertTrue(self.cache.lookup(URL) is None)
+
+    def test_fetch(self):
+        manifest = os.path.join(self.tmpdir, 'manifest.json')
+        with open(manifest, 'w') as f:
+            json.dump({'test': {
+                'url': 'https://storage.googleapis.com/simpeg/test/',
+                'files': {'data': {'name': 'data.txt', 'sha256': None}}
+            }}, f)
+        folder = os.path.join(self.tmpdir, 'notebook')
+        for _ in range(2):
+            files = datacache.fetch(
+                'test', folder, cache=self.cache,
+                manifest=datacache.load_manifest(manifest)
+            )
+            self.assertEqual(files['data'], os.path.join(folder, 'data.txt'))
+            self.assertTrue(os.path.isfile(files['data']))
+
+        datacache.pin(cache=self.cache, path=manifest)
+        with open(manifest) as f:
+            digest = json.load(f)['test']['files']['data']['sha256']
+        self.assertEqual(digest, datacache.sha256(files['data']))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,114 @@
+import os
+import sys
+import unittest
+
+import numpy as np
+from scipy.special import k0
+from SimPEG import EM, Maps, Mesh
+
+dirname, _ = os.path.split(os.path.abspath(__file__))
+sys.path.append(os.path.sep.join(dirname.split(os.path.sep)[:-2]+['docs', 'case-studies']))
+from casetools import dc25d, dcelectrodes
+
+
+class DC25D_Test(unittest.TestCase):
+
+    def setUp(self):
+        self.mesh = Mesh.TensorMesh([
+            [(20., 6, -1.4), (20., 16), (20., 6, 1.4)],
+            [(20., 6, -1.5), (20., 1), (20., 6, 1.5)],
+            [(20., 6, -1.4), (20., 6)]
+        ], 'CCN')
+        x = np.arange(-140., 141., 20.)
+        self.x = x
+        E = np.c_[x, np.zeros_like(x), np.zeros_like(x)]
+        # pole-dipole readings
+        self.a, self.m, self.n = np.array([
+            (i, j, j+1) for i in range(len(x)) for j in range(len(x)-1)
+            if i not in [j, j+1]
+        ]).T
+        self.electrodes, self.inds = dcelectrodes.readings(
+            E[self.a], None, E[self.m], E[self.n]
+        )
+        cc = self.mesh.gridCC
+        self.halfspace = np.where(cc[:, 2] < 0., 1e-2, np.nan)
+        # conductive block, constant across the line
+        self.sigma = self.halfspace.copy()
+        self.sigma[
+            (np.abs(cc[:, 0] - 30.) < 50.) & (cc[:, 2] < -40.) &
+            (cc[:, 2] > -120.)
+        ] = 1e-1
+
+    def test_wavenumbers(self):
+        k, c = dc25d.wavenumbers(5., 500., tol=1e-3)
+        self.assertTrue(np.all(np.diff(k) > 0))
+        r = np.logspace(np.log10(5.), np.log10(500.), 317)
+        fit = k0(np.outer(r, k)).dot(c)*2.*r/np.pi
+        self.assertLess(np.abs(fit - 1.).max(), 2e-3)
+        # more wavenumbers for a tighter tolerance
+        self.assertGreater(len(dc25d.wavenumbers(5., 500., tol=1e-5)[0]), len(k))
+
+    def test_section(self):
+        mesh2D, sigma2D = dc25d.section(self.mesh, self.sigma, axis='x', at=0.)
+        self.assertEqual(mesh2D.nC, self.mesh.nCx*self.mesh.nCz)
+        self.assertTrue(np.all(mesh2D.vectorNx == self.mesh.vectorNx))
+        self.assertTrue(np.all(mesh2D.vectorNy == self.mesh.vectorNz))
+        self.assertEqual(np.sum(sigma2D == 1e-8), np.isnan(self.sigma).sum()/self.mesh.nCy)
+        self.assertTrue(np.all(
+            dc25d.line_locations(self.electrodes, 'x') ==
+            self.electrodes[:, [0, 2]]
+        ))
+
+    def test_halfspace(self):
+        mesh2D, sigma2D = dc25d.section(self.mesh, self.halfspace, at=0.)
+        line = dc25d.LinePoles(
+            mesh2D, dc25d.line_locations(self.electrodes, 'x')
+        )
+        d = line.dpred(sigma2D, self.inds)
+        x = self.x
+        d_analytic = 1./(2*np.pi*1e-2)*(
+            1./np.abs(x[self.a] - x[self.m]) - 1./np.abs(x[self.a] - x[self.n])
+        )
+        error = np.abs(d/d_analytic - 1.)
+        self.assertLess(np.median(error), 0.03)
+        self.assertLess(error.max(), 0.1)
+
+    def test_3D(self):
+        # the response of the block relative to the half-space, as in 3D
+        actind = ~np.isnan(self.halfspace)
+        mapping = (
+            Maps.ExpMap(self.mesh) *
+            Maps.InjectActiveCells(self.mesh, actind, np.log(1e-8))
+        )
+        poles = dcelectrodes.PoleFields(
+            EM.Static.DC.Problem3D_N(self.mesh, sigmaMap=mapping),
+            self.electrodes
+        )
+        line = None
+        ratios = []
+        for sigma in [self.sigma, self.halfspace]:
+            d3 = poles.dpred(np.log(sigma[actind]), self.inds)
+            mesh2D, sigma2D = dc25d.section(self.mesh, sigma, at=0.)
+            if line is None:
+                line = dc25d.LinePoles(
+                    mesh2D, dc25d.line_locations(self.electrodes, 'x')
+                )
+            ratios.append(line.dpred(sigma2D, self.inds)/d3)
+        error = np.abs(ratios[0]/ratios[1] - 1.)
+        self.assertLess(np.median(error), 0.03)
+        self.assertLess(error.max(), 0.15)
+
+    def test_simulate(self):
+        mesh2D, sigma2D = dc25d.section(self.mesh, self.sigma, at=0.)
+        locs = dc25d.line_locations(self.electrodes, 'x')
+        d = dc25d.LinePoles(mesh2D, locs).dpred(sigma2D, self.inds)
+        out = dc25d.simulate(
+            [(mesh2D, sigma2D, locs, self.inds)]*2, jobs=2
+        )
+        self.assertEqual(len(out), 2)
+        for dpred in out:
+            self.assertTrue(np.all(dpred == d))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,168 @@
+import os
+import sys
+import threading
+import time
+import unittest
+
+import numpy as np
+from SimPEG import Mesh, Solver, Utils
+
+dirname, _ = os.path.split(os.path.abspath(__file__))
+sys.path.append(os.path.sep.join(
+    dirname.split(os.path.sep)[:-2] +
+    ['notebooks', 'fundamentals', 'pixels_and_neighbors']
+))
+import dc_interact
+
+
+def single_solve(n, sigma_background, sigma_block, a_loc, b_loc):
+    # potential and current as the widget first computed them, one model and
+    # one source at a time
+    mesh = Mesh.TensorMesh([n, n])
+    sigma = sigma_background * np.ones(mesh.nC)
+    block_indices = (
+        (mesh.gridCC[:, 0] >= 0.4) & (mesh.gridCC[:, 0] <= 0.6) &
+        (mesh.gridCC[:, 1] >= 0.4) & (mesh.gridCC[:, 1] <= 0.6)
+    )
+    sigma[block_indices] = sigma_block
+    source_loc_inds = Utils.closestPoints(mesh, [a_loc, b_loc])
+    Div = mesh.faceDiv
+    Sigma = mesh.getFaceInnerProduct(sigma, invProp=True, invMat=True)
+    Vol = Utils.sdiag(mesh.vol)
+    A = Vol * Div * Sigma * Div.T * Vol
+    q = np.zeros(mesh.nC)
+    q[source_loc_inds] = np.r_[+1, -1]
+    phi = Solver(A) * q
+    return phi, Sigma * mesh.faceDiv.T * Utils.sdiag(mesh.vol) * phi
+
+
+class DCEngine_Test(unittest.TestCase):
+
+    def setUp(self):
+        self.engine = dc_interact.DCEngine(n=20, cache_size=2)
+        self.a_loc, self.b_loc = np.r_[0.2, 0.5], np.r_[0.8, 0.5]
+
+    def test_single_solve(self):
+        for model in [(10., 100.), (1e-2, 1.)]:
+            phi, j = single_solve(20, model[0], model[1], self.a_loc, self.b_loc)
+            phi_engine = self.engine.potential(model[0], model[1], self.a_loc, self.b_loc)
+            j_engine = self.engine.current(model[0], model[1], self.a_loc, self.b_loc)
+            self.assertTrue(np.allclose(phi_engine, phi, rtol=1e-8, atol=0.))
+            self.assertTrue(np.allclose(j_engine, j, rtol=1e-8, atol=1e-12*np.abs(j).max()))
+
+    def test_lru(self):
+        engine = self.engine
+        first = engine.factor(1., 10.)
+        engine.factor(1., 100.)
+        # a hit makes (1., 10.) the most recently used
+        self.assertIs(engine.factor(1., 10.), first)
+        engine.factor(1., 1000.)
+        self.assertEqual(list(engine._factors), [(1., 10.), (1., 1000.)])
+        self.assertIs(engine.factor(1., 10.), first)
+        engine.factor(1., 100.)
+        self.assertEqual(list(engine._factors), [(1., 10.), (1., 100.)])
+        self.assertNotIn((1., 1000.), engine._factors)
+
+    def test_reuse_phi(self):
+        engine = self.engine
+        phi = engine.potential(1., 10., self.a_loc, self.b_loc)
+        # no solve may happen from here on
+        Sigma, _ = engine._factors[(1., 10.)]
+        engine._factors[(1., 10.)] = (Sigma, None)
+        self.assertIs(engine.potential(1., 10., self.a_loc, self.b_loc), phi)
+        j = engine.current(1., 10., self.a_loc, self.b_loc)
+        self.assertTrue(np.allclose(j, Sigma * engine.Div.T * engine.Vol * phi))
+        self.assertEqual(len(engine._phi), 1)
+
+    def test_potentials(self):
+        engine = self.engine
+        x = engine.mesh.vectorCCx
+        a_locs = np.c_[x[[2, 4, 6]], [0.5]*3]
+        b_locs = np.c_[x[[15, 13, 17]], [0.5]*3]
+        factorizations = []
+        SolverLU = dc_interact.SolverLU
+
+        def counting(A, **kwargs):
+            factorizations.append(A)
+            return SolverLU(A, **kwargs)
+
+        dc_interact.SolverLU = counting
+        try:
+            phi = engine.potentials(1., 10., a_locs, b_locs)
+        finally:
+            dc_interact.SolverLU = SolverLU
+        self.assertEqual(phi.shape, (engine.mesh.nC, 3))
+        self.assertEqual(len(factorizations), 1)
+        for i in range(3):
+            phi_i = engine.potential(1., 10., a_locs[i], b_locs[i])
+            self.assertTrue(np.allclose(phi[:, i], phi_i, rtol=1e-10, atol=0.))
+        self.assertEqual(len(factorizations), 1)
+
+    def test_dipole_voltages(self):
+        engine = self.engine
+        cc = engine.mesh.gridCC
+        a_locs, b_locs = np.r_[[[0.1, 0.5], [0.3, 0.5]]], np.r_[[[0.9, 0.5], [0.7, 0.5]]]
+        # receivers at cell centres, where the interpolation is exact
+        m_inds, n_inds = np.r_[21, 45, 250], np.r_[22, 60, 251]
+        phi, V = engine.survey(1., 10., a_locs, b_locs, cc[m_inds], cc[n_inds])
+        self.assertEqual(V.shape, (3, 2))
+        self.assertTrue(np.allclose(V, phi[m_inds] - phi[n_inds], rtol=1e-10, atol=0.))
+
+
+class Value(object):
+    # records what the widget publishes, as an ipywidgets value would hold it
+    def __init__(self):
+        self.history = []
+
+    @property
+    def value(self):
+        return self.history[-1]
+
+    @value.setter
+    def value(self, value):
+        self.history.append(value)
+
+
+class GatedDC(dc_interact.ProgressiveDC):
+    # renders labels; the refinement of the first request waits on a gate
+
+    def __init__(self, *args, **kwargs):
+        super(GatedDC, self).__init__(*args, **kwargs)
+        self.rendered = []
+        self.entered = threading.Event()
+        self.gate = threading.Event()
+
+    def render(self, n, log_sigma_background, log_sigma_block, plot_type):
+        self.rendered.append((n, log_sigma_background))
+        if n > self.levels[0] and log_sigma_background == 1.:
+            self.entered.set()
+            self.gate.wait(10.)
+        return '{} {}'.format(n, log_sigma_background)
+
+
+class ProgressiveDC_Test(unittest.TestCase):
+
+    def test_cancel(self):
+        widget = GatedDC(levels=(10, 20, 40))
+        widget.image, widget.status = Value(), Value()
+        widget.update(log_sigma_background=1.)
+        # the first refinement is being solved when the second request comes
+        self.assertTrue(widget.entered.wait(10.))
+        widget.update(log_sigma_background=2.)
+        self.assertEqual(widget._generation, 2)
+        widget.gate.set()
+        for _ in range(1000):
+            if widget.status.history[-1] == 'done':
+                break
+            time.sleep(0.01)
+        # the stale level is finished but never published, the next skipped
+        self.assertEqual(
+            widget.image.history, ['10 1.0', '10 2.0', '20 2.0', '40 2.0']
+        )
+        self.assertIn((20, 1.), widget.rendered)
+        self.assertNotIn((40, 1.), widget.rendered)
+        self.assertEqual(widget.status.value, 'done')
+
+
+if __name__ == '__main__':
+    unittest.main()
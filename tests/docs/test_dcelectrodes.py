@@ -0,0 +1,87 @@
+import os
+import sys
+import unittest
+
+import numpy as np
+from SimPEG import EM, Maps, Mesh
+
+dirname, _ = os.path.split(os.path.abspath(__file__))
+sys.path.append(os.path.sep.join(dirname.split(os.path.sep)[:-2]+['docs', 'case-studies']))
+from casetools import dcelectrodes, dcsurvey
+
+DC = EM.Static.DC
+
+
+class DCElectrodes_Test(unittest.TestCase):
+
+    def setUp(self):
+        mesh = Mesh.TensorMesh([
+            [(25., 4, -1.3), (25., 12), (25., 4, 1.3)],
+            [(25., 4, -1.3), (25., 4), (25., 4, 1.3)],
+            [(25., 5, -1.3), (25., 6)]
+        ], 'CCN')
+        actind = mesh.gridCC[:, 2] < 0.
+        x = np.arange(-125., 126., 25.)
+        E = np.c_[x, np.zeros_like(x), np.zeros_like(x)]
+        # pole-dipole and dipole-dipole readings
+        a, b, m, n = np.array([
+            (i, j, k, k+1) for i in range(len(x)-3) for j in [-1, i+1]
+            for k in range(i+2, len(x)-1)
+        ]).T
+        pd = b < 0
+        survey1, _ = dcsurvey.survey(
+            E[a[pd]], None, E[m[pd]], E[n[pd]], srcType='pole'
+        )
+        survey2, _ = dcsurvey.survey(
+            E[a[~pd]], E[b[~pd]], E[m[~pd]], E[n[~pd]], srcType='dipole'
+        )
+        self.survey = DC.Survey(survey1.srcList + survey2.srcList)
+        mapping = (
+            Maps.ExpMap(mesh) *
+            Maps.InjectActiveCells(mesh, actind, np.log(1e-8))
+        )
+        self.prob = DC.Problem3D_N(mesh, sigmaMap=mapping)
+        self.prob.pair(self.survey)
+        self.m = np.log(1e-2) + 0.5*np.random.RandomState(0).randn(
+            actind.sum()
+        )
+        self.electrodes, self.inds = dcelectrodes.from_survey(self.survey)
+        self.poles = dcelectrodes.PoleFields(self.prob, self.electrodes)
+
+    def test_readings(self):
+        A = np.r_[[[0., 0., 0.], [1., 0., 0.]]]
+        M = np.r_[[[1., 0., 0.], [2., 0., 0.]]]
+        N = np.r_[[[2., 0., 0.], [3., 0., 0.]]]
+        electrodes, inds = dcelectrodes.readings(A, None, M, N)
+        self.assertEqual(len(electrodes), 4)
+        self.assertTrue(np.all(inds == [[0, -1, 1, 2], [1, -1, 2, 3]]))
+        self.assertEqual(len(self.electrodes), 11)
+        self.assertEqual(self.inds.shape, (self.survey.nD, 4))
+
+    def test_dpred(self):
+        d = self.poles.dpred(self.m, self.inds)
+        d_ref = self.survey.dpred(self.m)
+        self.assertLess(np.abs(d - d_ref).max(), 1e-10*np.abs(d_ref).max())
+        # reciprocity
+        V = self.poles.potentials(self.m)
+        self.assertLess(np.abs(V - V.T).max(), 1e-10*np.abs(V).max())
+
+    def test_J(self):
+        J = self.poles.J(self.m, self.inds, block_size=0.05)
+        self.assertEqual(J.shape, (self.survey.nD, len(self.m)))
+        w = np.random.RandomState(1).randn(self.survey.nD)
+        Jtw = self.prob.Jtvec(self.m, w)
+        self.assertLess(
+            np.abs(J.T.dot(w) - Jtw).max(), 1e-8*np.abs(Jtw).max()
+        )
+        v = np.random.RandomState(2).randn(len(self.m))
+        h = 1e-5
+        dd = (
+            self.poles.dpred(self.m + h*v, self.inds) -
+            self.poles.dpred(self.m - h*v, self.inds)
+        )/(2*h)
+        self.assertLess(np.abs(J.dot(v) - dd).max(), 1e-6*np.abs(dd).max())
+
+
+if __name__ == '__main__':
+    unittest.main()
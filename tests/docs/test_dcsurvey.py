@@ -0,0 +1,73 @@
+import os
+import sys
+import unittest
+
+import numpy as np
+from SimPEG import Mesh
+
+dirname, _ = os.path.split(os.path.abspath(__file__))
+sys.path.append(os.path.sep.join(dirname.split(os.path.sep)[:-2]+['docs', 'case-studies']))
+from casetools import dcsurvey
+
+
+class DCSurvey_Test(unittest.TestCase):
+
+    def setUp(self):
+        x = np.arange(20)*10.
+        A, M = np.meshgrid(x[:6], x[8:15])
+        self.dcipdata = np.c_[
+            A.ravel(), np.zeros(A.size), np.ones(A.size)*1e4, np.zeros(A.size),
+            M.ravel(), np.zeros(A.size), M.ravel()+10., np.zeros(A.size),
+            np.ones(A.size)*100., np.arange(A.size)*1.
+        ]
+        np.random.RandomState(0).shuffle(self.dcipdata)
+
+    def test_unique_rows(self):
+        a = np.random.RandomState(1).randint(0, 3, (50, 2))*1.
+        uniq, inverse = dcsurvey.unique_rows(a)
+        self.assertTrue(np.all(uniq[inverse] == a))
+        self.assertEqual(len(uniq), len(set(map(tuple, a))))
+        self.assertTrue(np.all(np.lexsort(uniq.T[::-1]) == np.arange(len(uniq))))
+
+    def test_survey(self):
+        d = self.dcipdata
+        A, B, M, N = [np.c_[d[:, 2*i:2*i+2], np.zeros(d.shape[0])] for i in range(4)]
+        survey, inds_data = dcsurvey.survey(A, B, M, N)
+        self.assertEqual(survey.nSrc, 6)
+        self.assertTrue(np.all(np.sort(inds_data) == np.arange(d.shape[0])))
+
+        # each source holds its readings, in the order of inds_data
+        i0 = 0
+        for src in survey.srcList:
+            rx = src.rxList[0]
+            rows = inds_data[i0:i0+rx.nD]
+            self.assertTrue(np.all(A[rows] == src.loc))
+            self.assertTrue(np.all(M[rows] == rx.locs[0]))
+            self.assertTrue(np.all(N[rows] == rx.locs[1]))
+            self.assertTrue(np.all(np.diff(rows) > 0))
+            i0 += rx.nD
+
+        survey, _ = dcsurvey.survey(A, B, M, N, srcType='dipole')
+        self.assertEqual(survey.nSrc, 6)
+        self.assertRaises(ValueError, dcsurvey.survey, A, B, M, N, 'gradient')
+
+    def test_read_dcip(self):
+        mesh = Mesh.TensorMesh(
+            [[(10., 24)], [(10., 4)], [(10., 6)]], x0=np.r_[-20., -20., -60.]
+        )
+        actind = mesh.gridCC[:, 2] < -10.
+        survey, inds_data, geometric = dcsurvey.read_dcip(
+            self.dcipdata, mesh, actind
+        )
+        self.assertTrue(np.all(survey.dobs == self.dcipdata[inds_data, 9]*1e-3))
+        MA = self.dcipdata[inds_data, 4] - self.dcipdata[inds_data, 0]
+        self.assertTrue(np.allclose(
+            geometric, 1./(2*np.pi)*(1./MA - 1./(MA+10.))
+        ))
+        # draped on the top active cells
+        z = np.hstack([src.rxList[0].locs[0][:, 2] for src in survey.srcList])
+        self.assertTrue(np.allclose(z, -15.))
+
+
+if __name__ == '__main__':
+    unittest.main()
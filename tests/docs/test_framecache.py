@@ -0,0 +1,120 @@
+import os
+import sys
+import unittest
+
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt
+import numpy as np
+import scipy.sparse as sp
+from SimPEG import Mesh
+
+dirname, _ = os.path.split(os.path.abspath(__file__))
+sys.path.append(os.path.sep.join(dirname.split(os.path.sep)[:-2]+['docs', 'case-studies']))
+from casetools import framecache
+
+
+class FrameCache_Test(unittest.TestCase):
+
+    def setUp(self):
+        self.mesh = Mesh.CylMesh([[(10., 8)], 1, [(10., 12)]], x0='00C')
+        self.frames = np.random.rand(self.mesh.nC, 6)
+        self.viewer = framecache.FrameViewer(
+            self.frames,
+            lambda v, ax: self.mesh.plotImage(v, ax=ax, mirror=True),
+            title=lambda i: 'frame {}'.format(i), colorbar='e', cache_size=3
+        )
+
+    def tearDown(self):
+        plt.close('all')
+
+    def test_field_frames(self):
+        f = {('src', 'e', i): np.arange(4.)*i for i in range(3)}
+
+        class Fields(object):
+            def __getitem__(self, key):
+                return f[key]
+        frames = framecache.field_frames(Fields(), 'src', 'e', [2, 0], 2*sp.identity(4))
+        self.assertTrue(np.all(frames == np.c_[4*np.arange(4.), np.zeros(4)]))
+
+    def test_field_frames_lazy(self):
+        read = []
+
+        class Fields(object):
+            def __getitem__(self, key):
+                read.append(key[2])
+                return np.arange(4.)[:, None]*key[2]
+        frames = framecache.FieldFrames(
+            Fields(), 'src', 'e', [0, 5, 10, 15], 2*sp.identity(4),
+            cache_size=2
+        )
+        self.assertEqual(len(frames), 4)
+        self.assertEqual(read, [])
+        self.assertTrue(np.all(frames[2] == 20*np.arange(4.)))
+        frames[1]
+        frames[2]
+        self.assertEqual(read, [10, 5])
+        frames[3]
+        frames[1]
+        # only two frames are kept, 1 was the least recently used
+        self.assertEqual(read, [10, 5, 15, 5])
+
+        mesh = Mesh.TensorMesh([2, 2])
+        viewer = framecache.FrameViewer(
+            frames, lambda v, ax: mesh.plotImage(v, ax=ax)
+        )
+        self.assertEqual(viewer.nFrames, 4)
+        viewer.update(3)
+        self.assertTrue(np.all(
+            viewer.image.get_array().ravel() == 30*np.arange(4.)
+        ))
+
+    def test_update(self):
+        for i in [3, 0, 5]:
+            self.viewer.update(i)
+            _, ax = plt.subplots()
+            image = self.mesh.plotImage(self.frames[:, i], ax=ax, mirror=True)[0]
+            self.assertTrue(np.all(
+                self.viewer.image.get_array() == image.get_array()
+            ))
+            self.assertEqual(
+                self.viewer.image.get_clim(),
+                (self.frames[:, i].min(), self.frames[:, i].max())
+            )
+            self.assertEqual(self.viewer.ax.get_title(), 'frame {}'.format(i))
+
+    def test_render(self):
+        self.viewer.prerender()
+        self.assertEqual(list(self.viewer._cache), [0, 1, 2])
+        png = self.viewer.render(0)
+        self.assertTrue(png.startswith(b'\x89PNG'))
+        self.viewer.render(4)
+        self.assertEqual(list(self.viewer._cache), [2, 0, 4])
+        self.viewer.clear()
+        self.assertEqual(len(self.viewer._cache), 0)
+
+    def test_overlay(self):
+        mesh = Mesh.TensorMesh([8, 6, 5])
+        J = np.random.rand(3*mesh.nC, 4)
+        viewer = framecache.FrameViewer(
+            np.sqrt(J[:mesh.nC]**2 + J[2*mesh.nC:]**2),
+            lambda v, ax: mesh.plotSlice(v, normal='Y', ind=2, ax=ax),
+            overlay=lambda i, ax: mesh.plotSlice(
+                J[:, i], vType='CCv', view='vec', normal='Y', ind=2, ax=ax
+            )
+        )
+        ncollections = len(viewer.ax.collections)
+        for i in [2, 1]:
+            viewer.update(i)
+            _, ax = plt.subplots()
+            image = mesh.plotSlice(
+                J[:, i], vType='CCv', view='vec', normal='Y', ind=2, ax=ax
+            )[0]
+            self.assertTrue(np.allclose(
+                viewer.image.get_array(), image.get_array()
+            ))
+            self.assertEqual(len(viewer.ax.collections), ncollections)
+
+
+if __name__ == '__main__':
+    unittest.main()
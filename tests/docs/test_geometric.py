@@ -0,0 +1,89 @@
+import os
+import sys
+import unittest
+
+import numpy as np
+from SimPEG import EM
+
+dirname, _ = os.path.split(os.path.abspath(__file__))
+sys.path.append(os.path.sep.join(dirname.split(os.path.sep)[:-2]+['docs', 'case-studies']))
+from casetools import geometric
+
+
+class Geometric_Test(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.RandomState(0)
+        self.A, self.B, self.M, self.N = [
+            np.c_[rng.rand(50, 2)*1000., -rng.rand(50)*10.] for _ in range(4)
+        ]
+
+    def test_arrays(self):
+        A, B, M, N = self.A, self.B, self.M, self.N
+
+        def inv(a, b):
+            return 1./np.linalg.norm(a - b, axis=1)
+
+        expected = {
+            'pole-pole': inv(A, M),
+            'pole-dipole': inv(A, M) - inv(A, N),
+            'dipole-pole': inv(A, M) - inv(B, M),
+            'dipole-dipole': inv(A, M) - inv(B, M) - inv(A, N) + inv(B, N),
+        }
+        for surveyType, G in expected.items():
+            self.assertTrue(np.allclose(
+                geometric.geometric_factor(A, B, M, N, surveyType=surveyType),
+                G/(2*np.pi)
+            ))
+            self.assertTrue(np.allclose(
+                geometric.geometric_factor(
+                    A, B, M, N, surveyType=surveyType, space_type='whole-space'
+                ),
+                G/(4*np.pi)
+            ))
+        self.assertRaises(
+            ValueError, geometric.geometric_factor, A, B, M, N, 'wenner'
+        )
+
+    def test_surface(self):
+        A, B, M, N = [np.c_[loc[:, :2], np.zeros(50)] for loc in
+                      [self.A, self.B, self.M, self.N]]
+        # electrodes on the surface are their own image
+        self.assertTrue(np.allclose(
+            geometric.geometric_factor(A, B, M, N, surface=0.),
+            geometric.geometric_factor(A, B, M, N)
+        ))
+        # electrodes far below the surface see a whole space
+        self.assertTrue(np.allclose(
+            geometric.geometric_factor(A, B, M, N, surface=1e9),
+            geometric.geometric_factor(A, B, M, N, space_type='whole-space')
+        ))
+
+    def test_dcip(self):
+        A, B, M, N = self.A, self.B, self.M, self.N
+        dcipdata = np.c_[A[:, :2], B[:, :2], M[:, :2], N[:, :2], np.ones(50)]
+        z = np.c_[A[:, 2], B[:, 2], M[:, 2], N[:, 2]]
+        G = geometric.from_dcip(dcipdata, 'dipole-dipole', z=z)
+        self.assertTrue(np.allclose(
+            G, geometric.geometric_factor(A, B, M, N)
+        ))
+
+        # the factors of a survey follow its data
+        rx = EM.Static.DC.Rx.Dipole(M, N)
+        survey = EM.Static.DC.Survey([
+            EM.Static.DC.Src.Pole([rx], A[0]),
+            EM.Static.DC.Src.Dipole([EM.Static.DC.Rx.Pole(M)], A[1], B[1]),
+        ])
+        G = geometric.from_survey(survey)
+        self.assertTrue(np.allclose(G, np.r_[
+            geometric.geometric_factor(A[0], None, M, N, 'pole-dipole'),
+            geometric.geometric_factor(A[1], B[1], M, None, 'dipole-pole'),
+        ]))
+
+        appres = geometric.apparent_resistivity(G*100., G)
+        self.assertTrue(np.allclose(appres, 100.))
+        self.assertTrue(np.isnan(geometric.apparent_resistivity(1., 0.)))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,83 @@
+import os
+import sys
+import unittest
+
+import numpy as np
+from SimPEG import EM, Maps, Mesh
+
+dirname, _ = os.path.split(os.path.abspath(__file__))
+sys.path.append(os.path.sep.join(dirname.split(os.path.sep)[:-2]+['docs', 'case-studies']))
+from casetools import dcelectrodes, iplinear
+
+
+class LinearIP_Test(unittest.TestCase):
+
+    def setUp(self):
+        mesh = Mesh.TensorMesh([
+            [(25., 4, -1.3), (25., 12), (25., 4, 1.3)],
+            [(25., 4, -1.3), (25., 4), (25., 4, 1.3)],
+            [(25., 5, -1.3), (25., 6)]
+        ], 'CCN')
+        self.actind = mesh.gridCC[:, 2] < 0.
+        x = np.arange(-125., 126., 25.)
+        E = np.c_[x, np.zeros_like(x), np.zeros_like(x)]
+        # dipole-dipole readings
+        a, m, n = np.array([
+            (i, k, k+1) for i in range(len(x)-3) for k in range(i+2, len(x)-1)
+        ]).T
+        self.electrodes, self.inds = dcelectrodes.readings(
+            E[a], E[a+1], E[m], E[n]
+        )
+        mapping = (
+            Maps.ExpMap(mesh) *
+            Maps.InjectActiveCells(mesh, self.actind, np.log(1e-8))
+        )
+        prob = EM.Static.DC.Problem3D_N(mesh, sigmaMap=mapping)
+        self.poles = dcelectrodes.PoleFields(prob, self.electrodes)
+        nP = self.actind.sum()
+        self.m = np.log(1e-2) + 0.5*np.random.RandomState(0).randn(nP)
+        self.eta = 0.1*np.random.RandomState(1).rand(nP)
+        self.dc = self.poles.dpred(self.m, self.inds)
+
+    def test_dpred(self):
+        ip = iplinear.LinearIP(
+            self.poles, self.inds, actind=self.actind, block_size=0.05
+        )
+        d = ip.dpred(self.eta)
+        # Seigel: the potentials of sigma*(1 - eta), for a small eta
+        h = 1e-4
+        d_ref = (
+            self.poles.dpred(self.m + np.log(1. - h*self.eta), self.inds) -
+            self.dc
+        )/h
+        self.assertLess(np.abs(d - d_ref).max(), 1e-3*np.abs(d_ref).max())
+        # about log sigma, the negative of the DC sensitivities
+        J = self.poles.J(self.m, self.inds)
+        self.assertTrue(np.allclose(ip.J(), -J))
+
+    def test_adjoint(self):
+        ip = iplinear.LinearIP(
+            self.poles, self.inds, actind=self.actind, block_size=0.05
+        )
+        w = np.random.RandomState(2).randn(len(self.inds))
+        Jv, Jtw = ip.Jvec(self.eta), ip.Jtvec(w)
+        self.assertAlmostEqual(
+            w.dot(Jv)/self.eta.dot(Jtw), 1., places=10
+        )
+        self.assertTrue(np.allclose(ip.J().T.dot(w), Jtw))
+
+    def test_no_solve(self):
+        # the fields of the DC step are re-used as they are
+        phi = self.poles.phi
+        ip = iplinear.LinearIP(self.poles, self.inds, actind=self.actind)
+        ip.Jtvec(ip.Jvec(self.eta))
+        self.assertIs(self.poles.phi, phi)
+        self.assertRaises(
+            ValueError, iplinear.LinearIP,
+            dcelectrodes.PoleFields(self.poles.prob, self.electrodes),
+            self.inds
+        )
+
+
+if __name__ == '__main__':
+    unittest.main()
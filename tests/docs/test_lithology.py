@@ -0,0 +1,97 @@
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+import numpy as np
+from SimPEG import Mesh, Maps, PF
+from SimPEG.Utils import mkvc
+
+dirname, _ = os.path.split(os.path.abspath(__file__))
+sys.path.append(os.path.sep.join(dirname.split(os.path.sep)[:-2]+['docs', 'case-studies']))
+from casetools import lithology
+
+
+class Lithology_Test(unittest.TestCase):
+
+    def setUp(self):
+        self.mesh = Mesh.TensorMesh(
+            [[(10., 12)], [(10., 12)], [(10., 6)]], 'CCN'
+        )
+        cc = self.mesh.gridCC
+        self.rock = np.ones(self.mesh.nC)*3.
+        self.rock[(np.abs(cc[:, 0]) < 30.) & (cc[:, 2] > -30.)] = 7.
+        self.rock[(cc[:, 1] > 20.) & (cc[:, 2] < -30.)] = 8.
+
+        xr = np.linspace(-50., 50., 6)
+        X, Y = np.meshgrid(xr, xr)
+        locs = np.c_[X.ravel(), Y.ravel(), np.ones(X.size)*5.]
+        self.survey = PF.BaseMag.LinearSurvey(
+            PF.BaseMag.SrcField(
+                [PF.BaseMag.RxObs(locs)], param=(50000., 70., 20.)
+            )
+        )
+        self.cache_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.cache_dir)
+
+    def dense(self, code, ke, inc, dec):
+        actv = self.rock == code
+        nC = int(actv.sum())
+        prob = PF.Magnetics.MagneticVector(
+            self.mesh, chiMap=Maps.IdentityMap(nP=3*nC), actInd=actv
+        )
+        self.survey.pair(prob)
+        m = mkvc(PF.Magnetics.dipazm_2_xyz(
+            np.ones(nC)*inc, np.ones(nC)*dec
+        ))*ke
+        d = prob.G.dot(m)
+        self.survey.unpair()
+        return d
+
+    def test_forward(self):
+        litho = lithology.LithologyResponses(
+            self.mesh, self.rock, self.survey, cache_dir=self.cache_dir,
+            jobs=1, block_size=0.01
+        )
+        self.assertTrue(np.all(litho.codes == [3., 7., 8.]))
+
+        d = litho.forward({7: 0.1}, inc=-50., dec=120.)
+        self.assertTrue(np.allclose(d, self.dense(7, 0.1, -50., 120.)))
+
+        # superposition, along the inducing field by default
+        d = litho.forward({7: 0.1, 8: 0.05, 3: 0.})
+        self.assertTrue(np.allclose(
+            d, self.dense(7, 0.1, 70., 20.) + self.dense(8, 0.05, 70., 20.)
+        ))
+
+    def test_cache(self):
+        litho = lithology.LithologyResponses(
+            self.mesh, self.rock, self.survey, cache_dir=self.cache_dir,
+            jobs=1
+        )
+        R = litho.response(7)
+        self.assertEqual(R.shape, (36, 3))
+        self.assertEqual(len(os.listdir(self.cache_dir)), 1)
+
+        # a new engine reads it back from disk
+        litho = lithology.LithologyResponses(
+            self.mesh, self.rock, self.survey, cache_dir=self.cache_dir
+        )
+        litho.compute = None
+        self.assertTrue(np.all(litho.response(7) == R))
+
+        # other cells in the unit, other key
+        rock = self.rock.copy()
+        rock[0] = 7.
+        other = lithology.LithologyResponses(
+            self.mesh, rock, self.survey, cache_dir=self.cache_dir
+        )
+        self.assertNotEqual(other.key(7), litho.key(7))
+        self.assertRaises(ValueError, other.response, 5)
+
+
+if __name__ == '__main__':
+    unittest.main()
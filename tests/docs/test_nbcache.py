@@ -0,0 +1,101 @@
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+import nbformat
+
+dirname, _ = os.path.split(os.path.abspath(__file__))
+sys.path.append(os.path.sep.join(dirname.split(os.path.sep)[:-2]+['docs', '_ext']))
+import nbcache
+
+
+class NotebookCache_Test(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.nbdir = os.path.join(self.tmpdir, 'notebooks')
+        os.makedirs(self.nbdir)
+        with open(os.path.join(self.nbdir, 'data.txt'), 'w') as f:
+            f.write('1 2 3\n')
+        self.cache = nbcache.NotebookCache(os.path.join(self.tmpdir, 'cache'))
+
+        self.nb = nbformat.v4.new_notebook()
+        self.nb.cells = [
+            nbformat.v4.new_markdown_cell('# title'),
+            nbformat.v4.new_code_cell('x = 1'),
+        ]
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def key(self, nb, kernel_name='python2'):
+        return self.cache.key(nb, kernel_name, self.nbdir)
+
+    def test_key(self):
+        key = self.key(self.nb)
+        self.assertEqual(key, self.key(self.nb))
+
+        # markdown does not change the key, code, kernel and data do
+        self.nb.cells[0].source = '# another title'
+        self.assertEqual(key, self.key(self.nb))
+        self.assertNotEqual(key, self.key(self.nb, 'python3'))
+
+        self.nb.cells[1].source = 'x = 2'
+        self.assertNotEqual(key, self.key(self.nb))
+        self.nb.cells[1].source = 'x = 1'
+
+        with open(os.path.join(self.nbdir, 'data.txt'), 'w') as f:
+            f.write('1 2 4\n')
+        self.assertNotEqual(key, self.key(self.nb))
+
+    def test_extra_inputs(self):
+        # a shared package and its manifest, outside of the notebook folder
+        shared = os.path.join(self.tmpdir, 'casetools')
+        os.makedirs(shared)
+        for name, text in [('tools.py', 'x = 1\n'), ('manifest.json', '{}\n')]:
+            with open(os.path.join(shared, name), 'w') as f:
+                f.write(text)
+        key = self.key(self.nb)
+        self.cache.extra_inputs = [shared]
+        extra_key = self.key(self.nb)
+        self.assertNotEqual(key, extra_key)
+
+        for name, text in [('tools.py', 'x = 20\n'), ('manifest.json', '{"a": 1}\n')]:
+            with open(os.path.join(shared, name), 'w') as f:
+                f.write(text)
+            self.assertNotEqual(extra_key, self.key(self.nb))
+            extra_key = self.key(self.nb)
+
+    def test_replay(self):
+        key = self.key(self.nb)
+        self.assertTrue(self.cache.get(key) is None)
+
+        executed = nbformat.v4.new_notebook()
+        executed.cells = [nbformat.v4.new_code_cell('x = 1')]
+        executed.cells[0].execution_count = 1
+        executed.cells[0].outputs = [
+            nbformat.v4.new_output('stream', text='1\n')
+        ]
+        self.cache.put(key, executed)
+
+        nbcache.replay(self.nb, self.cache.get(key))
+        self.assertEqual(self.nb.cells[1].execution_count, 1)
+        self.assertEqual(self.nb.cells[1].outputs[0].text, '1\n')
+
+    def test_evict(self):
+        self.cache.maxsize = 0
+        keys = []
+        for i in range(3):
+            self.nb.cells[1].source = 'x = {}'.format(i)
+            keys.append(self.key(self.nb))
+            self.cache.put(keys[-1], self.nb)
+
+        # only the entry that was just stored is kept
+        self.assertEqual(len(self.cache.entries()), 1)
+        self.assertTrue(self.cache.get(keys[-1]) is not None)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,91 @@
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+import numpy as np
+from SimPEG import Mesh, Maps, PF
+
+dirname, _ = os.path.split(os.path.abspath(__file__))
+sys.path.append(os.path.sep.join(dirname.split(os.path.sep)[:-2]+['docs', 'case-studies']))
+from casetools import sensitivity
+
+
+class Sensitivity_Test(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.mesh = Mesh.TensorMesh([[(5., 8)], [(5., 8)], [(5., 6)]], 'CCN')
+        self.actv = np.where(self.mesh.gridCC[:, 2] < -8.)[0]
+        xr = np.linspace(-15., 15., 6)
+        X, Y = np.meshgrid(xr, xr)
+        self.locs = np.c_[X.ravel(), Y.ravel(), np.ones(X.size)*2.]
+        self.idenMap = Maps.IdentityMap(nP=len(self.actv))
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def check(self, prob):
+        G = prob.G
+        prob._G = None
+        store = sensitivity.attach(
+            prob, os.path.join(self.tmpdir, 'G'), jobs=2, block_size=0.01
+        )
+        self.assertTrue(prob.G is store)
+        self.assertTrue(len(store.blocks()) > 1)
+        self.assertTrue(np.allclose(store.G, G))
+
+        m = np.random.randn(G.shape[1])
+        r = np.random.randn(G.shape[0])
+        self.assertTrue(np.allclose(store.dot(m), G.dot(m)))
+        self.assertTrue(np.allclose(store.T.dot(r), G.T.dot(r)))
+
+        # columns evaluated straight from the kernel
+        kernel = sensitivity.kernel(prob)
+        self.assertTrue(np.allclose(kernel.columns(3, 9), G[:, 3:9]))
+
+        wr = np.sum(G**2., axis=0)**0.5
+        self.assertTrue(np.allclose(store.weights(), wr/wr.max()))
+
+        # the same inputs re-use the store
+        mtime = os.path.getmtime(os.path.join(self.tmpdir, 'G', 'G.npy'))
+        sensitivity.attach(prob, os.path.join(self.tmpdir, 'G'))
+        self.assertEqual(
+            mtime, os.path.getmtime(os.path.join(self.tmpdir, 'G', 'G.npy'))
+        )
+
+    def test_gravity(self):
+        rxLoc = PF.BaseGrav.RxObs(self.locs)
+        survey = PF.BaseGrav.LinearSurvey(PF.BaseGrav.SrcField([rxLoc]))
+        prob = PF.Gravity.GravityIntegral(
+            self.mesh, rhoMap=self.idenMap, actInd=self.actv
+        )
+        survey.pair(prob)
+        self.check(prob)
+
+    def test_magnetics(self):
+        rxLoc = PF.BaseMag.RxObs(self.locs)
+        srcField = PF.BaseMag.SrcField([rxLoc], param=(50000., 70., 20.))
+        survey = PF.BaseMag.LinearSurvey(srcField)
+        prob = PF.Magnetics.MagneticIntegral(
+            self.mesh, chiMap=self.idenMap, actInd=self.actv
+        )
+        survey.pair(prob)
+        self.check(prob)
+
+    def test_columns(self):
+        # three components of the data and of the magnetization
+        Xn, Yn, Zn = sensitivity.cell_nodes(self.mesh, self.actv)
+        kernel = sensitivity.MagneticVectorKernel(
+            Xn, Yn, Zn, self.locs, (50000., 70., 20.), rxType='xyz'
+        )
+        G = kernel(0, kernel.shape[0])
+        nC = len(self.actv)
+        cols = np.r_[0, nC-1, nC, 2*nC+5, 3*nC-1]
+        for j in cols:
+            self.assertTrue(np.allclose(kernel.columns(j, j+1)[:, 0], G[:, j]))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,80 @@
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+import numpy as np
+from SimPEG import Mesh
+
+dirname, _ = os.path.split(os.path.abspath(__file__))
+sys.path.append(os.path.sep.join(dirname.split(os.path.sep)[:-2]+['docs', 'case-studies']))
+from casetools import soundings
+
+
+@unittest.skipIf(not soundings.h5py, 'h5py is not installed')
+class SoundingStore_Test(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.filename = os.path.join(self.tmpdir, 'fwd.h5')
+        self.xyz = np.random.rand(5, 3)
+        self.dpred = np.random.rand(5, 4)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_append(self):
+        # soundings arrive out of order and over several sessions
+        with soundings.SoundingStore(self.filename, 'a') as store:
+            for itx in [3, 0, 1]:
+                store.append(itx, self.xyz[itx], self.dpred[itx])
+        with soundings.SoundingStore(self.filename, 'a') as store:
+            self.assertTrue(3 in store and 2 not in store)
+            for itx in [2, 4]:
+                store.append(itx, self.xyz[itx], self.dpred[itx])
+            store.set_downsample([0, 2, 4], 0.05, 1e-3)
+
+        with soundings.SoundingStore(self.filename) as store:
+            self.assertTrue(np.all(store.indices() == np.arange(5)))
+            xyz, dpred = store.read(store.downsample, field='dpred')
+            self.assertTrue(np.allclose(xyz, self.xyz[::2]))
+            self.assertTrue(np.allclose(dpred, self.dpred[::2].ravel()))
+            self.assertEqual(tuple(store.uncertainty), (0.05, 1e-3))
+            # no observed data were stored, they are not made up
+            self.assertRaises(KeyError, store.read, store.downsample)
+
+    def test_model(self):
+        mesh = Mesh.TensorMesh([2, 3, 4])
+        sigma, times = np.ones(mesh.nC), np.logspace(-4, -3, 4)
+        timeSteps = [(1e-5, 5), (1e-4, 10)]
+        with soundings.SoundingStore(self.filename, 'a') as store:
+            self.assertFalse(store.write_model(mesh, sigma, times, timeSteps))
+            for itx in [0, 1]:
+                store.append(itx, self.xyz[itx], self.dpred[itx])
+
+        # an interrupted run with the same model is resumed
+        with soundings.SoundingStore(self.filename, 'a') as store:
+            self.assertTrue(store.write_model(mesh, sigma, times, timeSteps))
+            self.assertTrue(np.all(store.indices() == [0, 1]))
+            store.set_downsample([0, 1], 0.05, 0.)
+
+        # any change to the model or the time stepping drops the soundings
+        for args in [
+            (mesh, 2.*sigma, times, timeSteps),
+            (mesh, sigma, times, [(1e-5, 5), (1e-4, 20)]),
+            (Mesh.TensorMesh([2, 3, 4], x0=[0., 0., -1.]), sigma, times,
+             timeSteps),
+        ]:
+            with soundings.SoundingStore(self.filename, 'a') as store:
+                store.write_model(mesh, sigma, times, timeSteps)
+                store.append(0, self.xyz[0], self.dpred[0])
+            with soundings.SoundingStore(self.filename, 'a') as store:
+                self.assertFalse(store.write_model(*args))
+                self.assertEqual(len(store.indices()), 0)
+                self.assertTrue('downsample' not in store.file)
+                self.assertTrue(np.allclose(store.sigma, args[1]))
+
+
+if __name__ == '__main__':
+    unittest.main()
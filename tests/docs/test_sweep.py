@@ -0,0 +1,109 @@
+import os
+import sys
+import types
+import unittest
+import warnings
+
+import numpy as np
+from SimPEG import EM, Maps, Mesh, Utils
+
+dirname, _ = os.path.split(os.path.abspath(__file__))
+sys.path.append(os.path.sep.join(dirname.split(os.path.sep)[:-2]+['docs', 'case-studies']))
+from casetools import sweep
+
+
+def setup():
+    hx = Utils.meshTensor([(20., 10), (20., 8, 1.3)])
+    hz = Utils.meshTensor([(20., 8, -1.3), (20., 20), (20., 8, 1.3)])
+    mesh = Mesh.CylMesh([hx, 1, hz], x0='00C')
+    loc = np.array([[0., 0., 30.]])
+    rx = EM.TDEM.Rx.Point_dbdt(loc, np.logspace(-4, -3, 5), orientation='z')
+    src = EM.TDEM.Src.CircularLoop(
+        [rx], loc=loc, radius=13., orientation='z',
+        waveform=EM.TDEM.Src.StepOffWaveform()
+    )
+    prob = EM.TDEM.Problem3D_b(
+        mesh, timeSteps=[(1e-5, 10), (5e-5, 10), (1e-4, 5)],
+        sigmaMap=Maps.IdentityMap(mesh)
+    )
+    prob.pair(EM.TDEM.Survey([src]))
+    return prob
+
+
+def greedy(prob, m):
+    return np.ones(10**8)  # 800 MB
+
+
+class Sweep_Test(unittest.TestCase):
+
+    def setUp(self):
+        self.prob = setup()
+        z = self.prob.mesh.gridCC[:, 2]
+        self.models = np.vstack([
+            np.where(z < 0., sig, 1e-8) for sig in [1e-3, 1e-2, 1e-1]
+        ])
+        self.models[2, (z < -100.) & (z > -200.)] = 1.
+
+    def test_run(self):
+        expected = np.vstack([self.prob.survey.dpred(m) for m in self.models])
+        done = []
+        dpred = sweep.run(
+            setup, self.models, jobs=2, verbose=False,
+            callback=lambda inds, d: done.extend(inds), max_memory=500
+        )
+        self.assertTrue(np.allclose(dpred, expected))
+        self.assertEqual(sorted(done), [0, 1, 2])
+
+        dpred = sweep.run(
+            setup, self.models, jobs=1, chunk_size=2, verbose=False
+        )
+        self.assertTrue(np.allclose(dpred, expected))
+
+    def test_start_method(self):
+        # a setup defined in a notebook cannot reach spawned workers
+        def interactive():
+            return setup()
+        interactive.__module__ = '__main__'
+        main, start_method = sys.modules['__main__'], sweep.start_method
+        sys.modules['__main__'] = types.ModuleType('__main__')
+        try:
+            sweep.start_method = lambda: 'spawn'
+            self.assertRaises(
+                ValueError, sweep.run, interactive, self.models, jobs=2,
+                verbose=False
+            )
+            sweep.check_workers_reach(setup, 'setup')
+            sweep.start_method = lambda: 'fork'
+            sweep.check_workers_reach(interactive, 'setup')
+        finally:
+            sys.modules['__main__'] = main
+            sweep.start_method = start_method
+        dpred = sweep.run(interactive, self.models[:1], jobs=1, verbose=False)
+        self.assertEqual(dpred.shape[0], 1)
+
+    @unittest.skipIf(not sweep.resource, "needs the resource module")
+    def test_max_memory(self):
+        self.assertRaises(
+            MemoryError, sweep.run, setup, self.models, jobs=2,
+            max_memory=200, simulate=greedy, verbose=False
+        )
+
+    @unittest.skipIf(not sweep.resource, "needs the resource module")
+    def test_unknown_address_space(self):
+        limit = sweep.resource.getrlimit(sweep.resource.RLIMIT_AS)
+        address_space = sweep.address_space
+        sweep.address_space = lambda: 0
+        try:
+            with warnings.catch_warnings(record=True) as caught:
+                warnings.simplefilter('always')
+                sweep.limit_memory(200)
+        finally:
+            sweep.address_space = address_space
+        self.assertEqual(len(caught), 1)
+        self.assertEqual(
+            sweep.resource.getrlimit(sweep.resource.RLIMIT_AS), limit
+        )
+
+
+if __name__ == '__main__':
+    unittest.main()
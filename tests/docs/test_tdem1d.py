@@ -0,0 +1,123 @@
+import os
+import sys
+import unittest
+
+import numpy as np
+from scipy.constants import mu_0
+from scipy.special import erf
+from SimPEG import EM, Maps, Mesh, SolverLU, Utils
+
+dirname, _ = os.path.split(os.path.abspath(__file__))
+sys.path.append(os.path.sep.join(dirname.split(os.path.sep)[:-2]+['docs', 'case-studies']))
+from casetools import tdem1d
+
+
+def halfspace(t, sigma, radius):
+    # dbz/dt at the centre of a loop on a half-space, step-off
+    theta = np.sqrt(mu_0*sigma/(4.*t))
+    ta = theta*radius
+    return -1./(sigma*radius**3)*(
+        3.*erf(ta) - 2./np.sqrt(np.pi)*ta*(3. + 2.*ta**2)*np.exp(-ta**2)
+    )
+
+
+class TDEM1D_Test(unittest.TestCase):
+
+    def setUp(self):
+        self.times = np.logspace(-5, -2, 31)
+        self.waveform = EM.TDEM.Src.VTEMWaveform(
+            offTime=0.007307, peakTime=0.006, a=3.
+        )
+
+    def test_filters(self):
+        r = np.logspace(-2, 2, 41)
+        base, weights = tdem1d.digital_filter('j1')
+        for a in [0.01, 1., 10.]:
+            lam = base[None, :]/r[:, None]
+            H = (lam*np.exp(-a*lam)).dot(weights)/r
+            self.assertLess(np.abs(H*(a**2 + r**2)**1.5/r - 1.).max(), 1e-4)
+        base, weights = tdem1d.digital_filter('sin')
+        for a in [0.01, 1., 10.]:
+            w = base[None, :]/r[:, None]
+            F = (w*np.exp(-a*w**2)).dot(weights)/r
+            Fa = np.sqrt(np.pi)*r/(4.*a**1.5)*np.exp(-r**2/(4.*a))
+            self.assertLess(np.abs(F - Fa).max(), 1e-6*Fa.max())
+
+    def test_halfspace(self):
+        d = tdem1d.step_off(self.times, [1e-2], [], radius=13., height=0.)
+        d_analytic = halfspace(self.times, 1e-2, 13.)
+        self.assertLess(np.abs(d[0]/d_analytic - 1.).max(), 1e-3)
+        # the same half-space cut in layers
+        d_layers = tdem1d.step_off(
+            self.times, [1e-2]*3, [10., 50.], radius=13., height=0.
+        )
+        self.assertLess(np.abs(d_layers/d - 1.).max(), 1e-8)
+
+    def test_waveform(self):
+        times = self.times + self.waveform.offTime
+        d = tdem1d.dbdt(
+            times, [1e-2], [], waveform=self.waveform, radius=13., height=0.
+        )[0]
+        # convolution of the analytic step-off response with the current
+        d_ref = []
+        for t in times:
+            tau = t - np.logspace(
+                np.log10(t - self.waveform.offTime), np.log10(t), 20001
+            )[::-1]
+            dI = np.where(
+                tau < self.waveform.peakTime,
+                self.waveform.a/self.waveform.peakTime *
+                np.exp(-self.waveform.a*tau/self.waveform.peakTime) /
+                (1. - np.exp(-self.waveform.a)),
+                -1./(self.waveform.offTime - self.waveform.peakTime)
+            )
+            y = dI*halfspace(t - tau, 1e-2, 13.)
+            d_ref.append(-np.sum(0.5*(y[1:] + y[:-1])*np.diff(tau)))
+        d_ref = np.array(d_ref)
+        self.assertLess(np.abs(d/d_ref - 1.).max(), 1e-3)
+        self.assertRaises(
+            ValueError, tdem1d.dbdt, self.times, [1e-2], [],
+            waveform=self.waveform
+        )
+
+    def test_simulate(self):
+        sigma = 10.**np.random.RandomState(0).uniform(-3, -1, (7, 3))
+        d = tdem1d.dbdt(self.times, sigma, [20., 50.], height=30.)
+        out = tdem1d.simulate(
+            sigma, [20., 50.], self.times, height=30., jobs=2, chunk_size=3
+        )
+        self.assertEqual(out.shape, (7, len(self.times)))
+        self.assertTrue(np.allclose(out, d, rtol=1e-12, atol=0.))
+
+    def test_cylmesh(self):
+        hx = Utils.meshTensor([(10., 40), (10., 15, 1.3)])
+        hz = Utils.meshTensor([(10., 15, -1.3), (10., 60), (10., 15, 1.3)])
+        mesh = Mesh.CylMesh([hx, 1, hz], x0=[0., 0., -400. - hz[:15].sum()])
+        z = mesh.gridCC[:, 2]
+        sigma = np.where(z < 0., 2e-3, 1e-8)
+        sigma[(z > -300.) & (z < -200.)] = 0.1
+        sigma1D, thickness, top = tdem1d.column(mesh, sigma)
+        self.assertTrue(np.allclose(sigma1D, [2e-3, 0.1, 2e-3]))
+        self.assertTrue(np.allclose(thickness, [200., 100.]))
+        self.assertAlmostEqual(top, 0.)
+
+        loc = np.array([[0., 0., 41.]])
+        rx = EM.TDEM.Rx.Point_dbdt(loc, np.logspace(-4, -3, 5), orientation='z')
+        src = EM.TDEM.Src.CircularLoop(
+            [rx], loc=loc, radius=13., orientation='z',
+            waveform=EM.TDEM.Src.StepOffWaveform()
+        )
+        prob = EM.TDEM.Problem3D_b(
+            mesh, timeSteps=[(2.5e-7, 80), (2.5e-6, 80), (2.5e-5, 40)],
+            sigmaMap=Maps.IdentityMap(mesh), Solver=SolverLU
+        )
+        prob.pair(EM.TDEM.Survey([src]))
+        error = np.abs(tdem1d.dpred(prob, sigma)/prob.survey.dpred(sigma) - 1.)
+        # the time stepping is first order, the mesh is further from the
+        # layers at early times
+        self.assertLess(error.max(), 0.15)
+        self.assertLess(error[-1], 0.03)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,92 @@
+import os
+import sys
+import unittest
+
+import numpy as np
+from SimPEG import EM, Maps, Mesh, SolverLU
+
+dirname, _ = os.path.split(os.path.abspath(__file__))
+sys.path.append(os.path.sep.join(dirname.split(os.path.sep)[:-2]+['docs', 'case-studies']))
+from casetools import tdemparallel
+
+
+class TDEMParallel_Test(unittest.TestCase):
+
+    def setUp(self):
+        h = [(50., 4, -1.5), (50., 6), (50., 4, 1.5)]
+        self.mesh = Mesh.TensorMesh([h, h, h], 'CCC')
+        z = self.mesh.gridCC[:, 2]
+        self.sigma = np.where(z < 0., 1e-2, 1e-8)
+        self.sigma[(z < -50.) & (z > -150.) & (self.mesh.gridCC[:, 0] > 0.)] = 1.
+        self.locs = np.c_[
+            np.linspace(-100., 100., 5), np.zeros(5), 30.*np.ones(5)
+        ]
+        self.times = np.logspace(-4, np.log10(5e-4), 4)
+        self.timeSteps = [(1e-5, 5), (5e-5, 4), (1e-4, 3)]
+
+    def problem(self, problem=EM.TDEM.Problem3D_b):
+        prob = problem(
+            self.mesh, sigmaMap=Maps.IdentityMap(self.mesh), Solver=SolverLU
+        )
+        prob.timeSteps = self.timeSteps
+        return prob
+
+    def test_simulate(self):
+        perm = np.r_[3, 0, 4, 1, 2]
+        prob = self.problem()
+        survey = EM.TDEM.Survey(tdemparallel.circular_loop_sources(
+            self.locs[perm], self.times, radius=13.
+        ))
+        prob.pair(survey)
+        expected = survey.dpred(self.sigma).reshape(len(perm), -1)
+
+        done = []
+        dpred = tdemparallel.simulate(
+            self.mesh, self.sigma, self.locs, self.times, self.timeSteps,
+            Solver=SolverLU, jobs=2, batch_size=2, indices=perm,
+            callback=lambda itxs, d: done.extend(itxs), radius=13.
+        )
+        self.assertEqual(dpred.shape, (len(perm), len(self.times)))
+        self.assertTrue(np.allclose(dpred, expected, rtol=1e-8, atol=0.))
+        self.assertEqual(sorted(done), list(range(len(perm))))
+
+        dpred = tdemparallel.simulate(
+            self.mesh, self.sigma, self.locs, self.times, self.timeSteps,
+            Solver=SolverLU, jobs=1, batch_size=3, indices=perm, radius=13.
+        )
+        self.assertTrue(np.allclose(dpred, expected, rtol=1e-8, atol=0.))
+
+    def test_factors(self):
+        prob = self.problem(tdemparallel.FactoredProblem3D_b)
+        prob.pair(EM.TDEM.Survey(tdemparallel.circular_loop_sources(
+            self.locs[:2], self.times, radius=13.
+        )))
+        factorizations = []
+
+        def counting(A, **kwargs):
+            factorizations.append(A)
+            return SolverLU(A, **kwargs)
+
+        prob.Solver = counting
+        prob.fields(self.sigma)
+        # one factorization per distinct time step, re-used by a new survey
+        # and a copy of the same model, as in every batch of simulate
+        self.assertEqual(sorted(prob._factors), [1e-5, 5e-5, 1e-4])
+        self.assertEqual(len(factorizations), 3)
+        prob.unpair()
+        prob.pair(EM.TDEM.Survey(tdemparallel.circular_loop_sources(
+            self.locs[2:], self.times, radius=13.
+        )))
+        prob.fields(self.sigma.copy())
+        self.assertEqual(len(factorizations), 3)
+
+        # a new model needs new factors
+        prob.model = 2.*self.sigma
+        self.assertTrue(getattr(prob, '_factors', None) is None)
+        prob.fields(2.*self.sigma)
+        self.assertEqual(len(factorizations), 6)
+        prob.clean()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,85 @@
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+import numpy as np
+from SimPEG import EM, Maps, Mesh, Utils
+
+dirname, _ = os.path.split(os.path.abspath(__file__))
+sys.path.append(os.path.sep.join(dirname.split(os.path.sep)[:-2]+['docs', 'case-studies']))
+from casetools import tdemstream
+
+
+class TDEMStream_Test(unittest.TestCase):
+
+    def setUp(self):
+        hx = Utils.meshTensor([(20., 10), (20., 8, 1.3)])
+        hz = Utils.meshTensor([(20., 8, -1.3), (20., 20), (20., 8, 1.3)])
+        mesh = Mesh.CylMesh([hx, 1, hz], x0='00C')
+        self.sigma = np.ones(mesh.nC)*1e-8
+        self.sigma[mesh.gridCC[:, 2] < 0.] = 2e-3
+
+        times = np.logspace(-4, -3, 5)
+        loc = np.array([[0., 0., 30.]])
+        rxList = [
+            EM.TDEM.Rx.Point_dbdt(loc, times, orientation='z'),
+            EM.TDEM.Rx.Point_b(
+                np.array([[10., 0., 0.], [30., 0., -10.]]), times,
+                orientation='z'
+            ),
+        ]
+        srcList = [
+            EM.TDEM.Src.CircularLoop(
+                rxList, loc=loc + [[0., 0., z]], radius=13.,
+                orientation='z', waveform=EM.TDEM.Src.StepOffWaveform()
+            ) for z in [0., 10.]
+        ]
+        self.prob = EM.TDEM.Problem3D_b(
+            mesh, timeSteps=[(1e-5, 10), (5e-5, 10), (1e-4, 5)],
+            sigmaMap=Maps.IdentityMap(mesh)
+        )
+        self.survey = EM.TDEM.Survey(srcList)
+        self.prob.pair(self.survey)
+        self.tmp = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def test_fields(self):
+        f = self.prob.fields(self.sigma)
+        d = self.survey.dpred(self.sigma, f=f)
+
+        F = tdemstream.fields(self.prob, self.sigma, times=[2e-4], every=10)
+        self.assertTrue(np.allclose(F.dpred, d))
+        self.assertEqual(F.tInds, [0, 10, 12, 20, 25])
+        for name in ['b', 'e', 'dbdt']:
+            for tInd in F.tInds:
+                self.assertTrue(np.allclose(
+                    F[:, name, tInd], f[:, name, tInd]
+                ))
+        self.assertRaises(KeyError, F.__getitem__, (slice(None), 'e', 5))
+
+    def test_store(self):
+        f = self.prob.fields(self.sigma)
+        store = os.path.join(self.tmp, 'fields.h5')
+        with tdemstream.fields(
+            self.prob, self.sigma, every=10, store=store
+        ) as F:
+            src = self.survey.srcList[1]
+            for tInd in [5, 10]:  # from the store and from memory
+                self.assertTrue(np.allclose(
+                    F[src, 'e', tInd], f[:, 'e', tInd][:, 1]
+                ))
+
+        # nothing kept, data only
+        F = tdemstream.fields(self.prob, self.sigma)
+        self.assertEqual(F.tInds, [])
+        self.assertTrue(np.allclose(
+            F.dpred, self.survey.dpred(self.sigma, f=f)
+        ))
+
+
+if __name__ == '__main__':
+    unittest.main()
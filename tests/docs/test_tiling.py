@@ -0,0 +1,127 @@
+import os
+import sys
+import types
+import unittest
+
+import numpy as np
+from SimPEG import Mesh, PF, Utils
+
+dirname, _ = os.path.split(os.path.abspath(__file__))
+sys.path.append(os.path.sep.join(dirname.split(os.path.sep)[:-2]+['docs', 'case-studies']))
+from casetools import decimation, sweep, tiling
+
+
+def square(tile):
+    return tile.nD**2
+
+
+class Decimation_Test(unittest.TestCase):
+
+    def setUp(self):
+        xr = np.linspace(0., 1000., 51)
+        X, Y = np.meshgrid(xr, xr)
+        self.locs = np.c_[X.ravel(), Y.ravel(), np.zeros(X.size)]
+        # a sharp step along x = 500
+        self.d = np.tanh((self.locs[:, 0] - 500.) / 20.)
+
+    def test_gradient(self):
+        g = decimation.local_gradient(self.locs, 2.*self.locs[:, 0] + self.locs[:, 1])
+        self.assertTrue(np.allclose(g, np.sqrt(5.)))
+
+    def test_decimate(self):
+        indx = decimation.decimate(self.locs, self.d, spacing=200., levels=3)
+        self.assertTrue(np.all(indx == decimation.decimate(
+            self.locs, self.d, spacing=200., levels=3
+        )))
+        self.assertTrue(np.all(np.diff(indx) > 0))
+
+        # denser near the step than away from it
+        x = self.locs[indx, 0]
+        near = np.sum(np.abs(x - 500.) < 100.)
+        far = np.sum(np.abs(x - 100.) < 100.)
+        self.assertTrue(near > 2*far)
+
+        # one station per bin without data
+        indx = decimation.decimate(self.locs, spacing=200.)
+        self.assertEqual(len(indx), 36)
+
+    def test_subset(self):
+        survey = PF.BaseGrav.LinearSurvey(
+            PF.BaseGrav.SrcField([PF.BaseGrav.RxObs(self.locs)])
+        )
+        survey.dobs = self.d
+        survey.std = np.ones_like(self.d)
+        indx = np.r_[3, 10, 200]
+        sub = decimation.subset(survey, indx)
+        self.assertTrue(np.all(sub.srcField.rxList[0].locs == self.locs[indx]))
+        self.assertTrue(np.all(sub.dobs == self.d[indx]))
+
+
+class Tiling_Test(unittest.TestCase):
+
+    def setUp(self):
+        xr = np.linspace(0., 1000., 21)
+        X, Y = np.meshgrid(xr, xr)
+        self.locs = np.c_[X.ravel(), Y.ravel(), np.zeros(X.size)]
+        self.tiles = tiling.make_tiles(self.locs, size=500., overlap=100.)
+
+    def test_tiles(self):
+        self.assertEqual(len(self.tiles), 4)
+        covered = np.zeros(self.locs.shape[0], dtype=bool)
+        for tile in self.tiles:
+            covered[tile.index] = True
+            xy = self.locs[tile.index, :2]
+            b = tile.bounds
+            self.assertTrue(np.all((xy[:, 0] >= b[0]) & (xy[:, 0] <= b[1])))
+            self.assertTrue(np.all((xy[:, 1] >= b[2]) & (xy[:, 1] <= b[3])))
+        self.assertTrue(covered.all())
+
+        w = sum(tile.weights(self.locs[:, :2]) for tile in self.tiles)
+        self.assertTrue(np.all(w >= 1.))
+
+    def test_mesh_and_merge(self):
+        hz = [(25., 4, -1.3), (25., 8)]
+        mesh = Mesh.TensorMesh(
+            [[(25., 44)], [(25., 44)], hz],
+            x0=[-50., -50., -Utils.meshTensor(hz).sum()]
+        )
+        models = []
+        for tile in self.tiles:
+            tile.mesh = tiling.tile_mesh(
+                tile.bounds, 25., hz, top=0., align=mesh.x0[:2]
+            )
+            x = tile.mesh.vectorNx
+            self.assertTrue(x[0] < tile.bounds[0] and x[-1] > tile.bounds[1])
+            self.assertAlmostEqual(tile.mesh.vectorNz[-1], 0.)
+            models.append(tile.mesh.gridCC[:, 0] + tile.mesh.gridCC[:, 2])
+
+        # a linear model is rebuilt by blending the tiles
+        merged = tiling.merge(mesh, self.tiles, models)
+        self.assertTrue(np.allclose(
+            merged, mesh.gridCC[:, 0] + mesh.gridCC[:, 2]
+        ))
+
+    def test_run(self):
+        out = tiling.run(self.tiles, square, jobs=2)
+        self.assertEqual(out, [tile.nD**2 for tile in self.tiles])
+
+        # an invert defined in a notebook cannot reach spawned workers
+        def interactive(tile):
+            return square(tile)
+        interactive.__module__ = '__main__'
+        main, start_method = sys.modules['__main__'], sweep.start_method
+        sys.modules['__main__'] = types.ModuleType('__main__')
+        sweep.start_method = lambda: 'spawn'
+        try:
+            self.assertRaises(
+                ValueError, tiling.run, self.tiles, interactive, jobs=2
+            )
+            out = tiling.run(self.tiles, interactive, jobs=1)
+        finally:
+            sys.modules['__main__'] = main
+            sweep.start_method = start_method
+        self.assertEqual(out, [tile.nD**2 for tile in self.tiles])
+
+
+if __name__ == '__main__':
+    unittest.main()
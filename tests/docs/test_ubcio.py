@@ -0,0 +1,46 @@
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+import numpy as np
+
+dirname, _ = os.path.split(os.path.abspath(__file__))
+sys.path.append(os.path.sep.join(dirname.split(os.path.sep)[:-2]+['docs', 'case-studies']))
+from casetools import ubcio
+
+
+class UBCIO_Test(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, 'data.txt')
+        self.data = np.random.rand(20, 4)
+        np.savetxt(self.path, self.data)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_read_array(self):
+        data = ubcio.read_array(self.path)
+        self.assertTrue(np.allclose(data, self.data))
+        cached = ubcio.cache_path(self.path, '.npy', [])
+        self.assertTrue(os.path.isfile(cached))
+
+        # copy-on-write, the cache is not modified
+        data[0, 0] = -1.
+        self.assertTrue(np.allclose(ubcio.read_array(self.path), self.data))
+
+    def test_invalidate(self):
+        ubcio.read_array(self.path)
+        old = ubcio.cache_path(self.path, '.npy', [])
+
+        np.savetxt(self.path, self.data[:10])
+        os.utime(self.path, (0, 0))
+        self.assertTrue(np.allclose(ubcio.read_array(self.path), self.data[:10]))
+        self.assertFalse(os.path.isfile(old))
+
+
+if __name__ == '__main__':
+    unittest.main()
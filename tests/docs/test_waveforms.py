@@ -0,0 +1,90 @@
+import os
+import sys
+import unittest
+
+import numpy as np
+from SimPEG import EM, Mesh
+
+dirname, _ = os.path.split(os.path.abspath(__file__))
+sys.path.append(os.path.sep.join(dirname.split(os.path.sep)[:-2]+['docs', 'case-studies']))
+from casetools import waveforms
+
+
+class Waveforms_Test(unittest.TestCase):
+
+    def setUp(self):
+        self.times = np.r_[np.linspace(0., 1e-2, 1001), 6e-3, 7.307e-3]
+        self.vtem = EM.TDEM.Src.VTEMWaveform(
+            offTime=7.307e-3, peakTime=6e-3, a=3.
+        )
+
+    def test_evaluate(self):
+        raw = EM.TDEM.Src.RawWaveform(
+            waveFct=lambda t: 1. if t < 1e-3 else 0.
+        )
+        for waveform in [
+            self.vtem, raw, EM.TDEM.Src.StepOffWaveform()
+        ]:
+            self.assertTrue(np.all(
+                waveforms.evaluate(waveform, self.times) ==
+                [waveform.eval(t) for t in self.times]
+            ))
+
+        # exact derivative, away from the kinks
+        t = self.times[(np.abs(self.times - 6e-3) > 1e-6) &
+                       (np.abs(self.times - 7.307e-3) > 1e-6)]
+        dt = 1e-9
+        fd = np.array([
+            (self.vtem.eval(ti+dt) - self.vtem.eval(ti-dt))/(2*dt) for ti in t
+        ])
+        self.assertTrue(np.allclose(
+            waveforms.derivative(self.vtem, t), fd, atol=1e-6*np.abs(fd).max()
+        ))
+
+    def test_table(self):
+        wave, dwave = waveforms.table(self.vtem, self.times)
+        same = EM.TDEM.Src.VTEMWaveform(offTime=7.307e-3, peakTime=6e-3, a=3.)
+        self.assertTrue(waveforms.table(same, self.times)[0] is wave)
+        other = EM.TDEM.Src.VTEMWaveform(offTime=7.307e-3, peakTime=5e-3, a=3.)
+        self.assertFalse(waveforms.table(other, self.times)[0] is wave)
+        self.assertFalse(waveforms.table(self.vtem, self.times[1:])[0] is wave)
+
+        tab = waveforms.TabulatedWaveform(self.vtem, np.sort(self.times))
+        for t in [0., 6e-3, 6.5e-3, 1.2345e-3, 2e-2]:  # on and off the grid
+            self.assertEqual(tab.eval(t), self.vtem.eval(t))
+        self.assertFalse(tab.hasInitialFields)
+
+        # any object with eval can be tabulated, it ends with the grid
+        ramp = Ramp()
+        tab = waveforms.TabulatedWaveform(ramp, np.sort(self.times))
+        self.assertEqual(tab.offTime, 1e-2)
+        self.assertEqual(tab.eval(5e-3), ramp.eval(5e-3))
+
+    def test_tabulate(self):
+        mesh = Mesh.TensorMesh([4, 4, 4])
+        rx = EM.TDEM.Rx.Point_dbdt(np.zeros((1, 3)), np.r_[1e-3], orientation='z')
+        src = EM.TDEM.Src.CircularLoop(
+            [rx], loc=np.zeros((1, 3)), radius=13., waveform=self.vtem
+        )
+        prob = EM.TDEM.Problem3D_b(mesh, timeSteps=[(1e-4, 10), (5e-4, 10)])
+        prob.pair(EM.TDEM.Survey([src]))
+        for _ in range(2):
+            waveforms.tabulate(prob)
+            self.assertTrue(isinstance(src, EM.TDEM.Src.CircularLoop))
+            self.assertTrue(isinstance(src.waveform, waveforms.TabulatedWaveform))
+            # tabulating again starts from the waveform of the source
+            self.assertTrue(src.waveform.waveform is self.vtem)
+            self.assertTrue(np.all(src.waveform.times == prob.times))
+        self.assertEqual(src.waveform.eval(6.5e-3), self.vtem.eval(6.5e-3))
+        self.assertEqual(src.radius, 13.)
+
+
+class Ramp(object):
+    # a waveform with nothing but eval
+
+    def eval(self, time):
+        return max(1. - time/1e-2, 0.)
+
+
+if __name__ == '__main__':
+    unittest.main()
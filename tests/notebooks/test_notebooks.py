@@ -1,72 +1,74 @@
 import unittest
-import sys
 import os
-import subprocess
 from ..execute_notebooks import clearNbOutput
+from ..run_notebooks import (
+    NBDIR, NotebookRunner, find_notebooks, select_shard
+)
 
-# Testing for the notebooks - use nbconvert to execute all cells of the
-# notebook
-
-dirname, _ = os.path.split(os.path.abspath(__file__))
-NBDIR = os.path.sep.join(dirname.split(os.path.sep)[:-2]+["notebooks"])
+# Testing for the notebooks - execute all cells of every notebook on a pool of
+# warm kernels. Set NB_JOBS to choose the number of workers (default: number
+# of cores) and NB_SHARD="i/n" to only run a slice of the notebooks.
 
 # TESTDIR = os.path.split(os.path.abspath(__file__))
 # NBDIR = os.path.sep.join(TESTDIR[:-1] + ["notebooks"]) # where are the notebooks?
 
 
 def setUp():
-    nbpaths = []  # list of notebooks, with file paths
+    nbpaths = find_notebooks(NBDIR)  # list of notebooks, with file paths
     nbnames = []  # list of notebook names (for making the tests)
 
-    # walk the test directory and find all notebooks
-    for dirname, dirnames, filenames in os.walk(NBDIR):
-        for filename in filenames:
-            if filename.endswith(".ipynb") and not filename.endswith("-checkpoint.ipynb"):
-                nbpaths.append(os.path.abspath(dirname) + os.path.sep + filename) # get abspath of notebook
-                nbnames.append("".join(filename[:-6])) # strip off the file extension
+    for nbpath in nbpaths:
+        filename = os.path.split(nbpath)[-1]
+        nbnames.append("".join(filename[:-6]))  # strip off the file extension
     return nbpaths, nbnames
 
 
 def get(nbname, nbpath):
 
-    # use nbconvert to execute the notebook
+    # wait for the pool to execute the notebook
     def test_func(self):
         print("\n--------------- Testing {0} ---------------".format(nbname))
         print("   {0}".format(nbpath))
-        nbexe = subprocess.Popen(
-            [
-                "jupyter", "nbconvert", "{0}".format(nbpath), "--execute",
-                "--ExecutePreprocessor.timeout=600",
-                "--ExecutePreprocessor.kernel_name='python{}'".format(sys.version_info[0])
-            ],
-            stdin=subprocess.PIPE, stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE
-        )
-        output, err = nbexe.communicate()
-        check = nbexe.returncode
-        if check == 0:
-            print("\n ..... {0} Passed ..... \n".format(nbname))
-            subprocess.call([
-                "rm", "{0}.html".format(os.path.sep.join(
-                    os.path.abspath(".").split(os.path.sep) +
-                    [nbpath.split(os.path.sep)[-1][:-6]]
-                ))])
+        _, passed, seconds, err = self.runner.result(nbpath)
+        if passed:
+            print("\n ..... {0} Passed in {1:.1f} s ..... \n".format(
+                nbname, seconds
+            ))
         else:
-            print("\n <<<<< {0} FAILED >>>>> \n".format(nbname))
+            print("\n <<<<< {0} FAILED after {1:.1f} s >>>>> \n".format(
+                nbname, seconds
+            ))
             print("Captured Output: \n")
             print(err)
 
-        self.assertTrue(check == 0)
+        self.assertTrue(passed)
 
     return test_func
 
 
-attrs = dict()
+def setUpClass(cls):
+    cls.runner = NotebookRunner(
+        nbpaths, jobs=os.environ.get("NB_JOBS"), shard=SHARD
+    ).start()
+
+
+def tearDownClass(cls):
+    cls.runner.close()
+    cls.runner.report()
+
+
+SHARD = os.environ.get("NB_SHARD")
+attrs = dict(
+    setUpClass=classmethod(setUpClass),
+    tearDownClass=classmethod(tearDownClass)
+)
 nbpaths, nbnames = setUp()
 
-# build test for each notebook
+# build test for each notebook in this shard
+selected = select_shard(nbpaths, SHARD)
 for i, nb in enumerate(nbnames):
-    attrs["test_"+nb] = get(nb, nbpaths[i])
+    if nbpaths[i] in selected:
+        attrs["test_"+nb] = get(nb, nbpaths[i])
 
 # create class to unit test notebooks
 TestNotebooks = type("TestNotebooks", (unittest.TestCase,), attrs)
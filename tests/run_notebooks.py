@@ -0,0 +1,391 @@
+"""
+Parallel, sharded execution of the notebooks.
+
+Each worker process keeps a spare kernel that is started (and has already
+imported the heavy libraries) while the previous notebook is still running,
+so a notebook only pays for its own cells. Notebooks are spread over the
+workers longest-first, and ``--shard i/n`` selects every n-th notebook so the
+work can be split across machines.
+
+Usage::
+
+    python tests/run_notebooks.py --jobs 4 --shard 1/2 [notebooks or dirs]
+
+The same settings can be passed to the test-suite through the ``NB_JOBS`` and
+``NB_SHARD`` environment variables. Notebooks whose code and input files have
+not changed since their last successful run are replayed from the execution
+cache in ``docs/_ext/nbcache.py`` (disable with ``--no-cache`` or
+``NBCACHE=0``).
+"""
+from __future__ import print_function
+
+import argparse
+import inspect
+import multiprocessing
+import os
+import sys
+import time
+import traceback
+
+dirname, _ = os.path.split(os.path.abspath(__file__))
+NBDIR = os.path.sep.join(dirname.split(os.path.sep)[:-1] + ["notebooks"])
+EXTDIR = os.path.sep.join(dirname.split(os.path.sep)[:-1] + ["docs", "_ext"])
+# shared code and data the notebooks import (the casetools package and its
+# manifest), part of the cache key of every notebook
+EXTRA_INPUTS = [
+    os.path.sep.join(
+        dirname.split(os.path.sep)[:-1] + ["docs", "case-studies", "casetools"]
+    )
+]
+
+sys.path.append(EXTDIR)
+import nbcache
+
+TIMEOUT = 600
+KERNEL_NAME = "python{}".format(sys.version_info[0])
+
+# executed in every spare kernel while it waits for a notebook
+WARMUP = """
+try:
+    import numpy, scipy, matplotlib
+    import SimPEG
+except Exception:
+    pass
+"""
+
+# run silently in the warm kernel before a notebook, so it runs in its
+# folder and the execution counts of the notebook start at 1
+CHDIR = "import os as _os; _os.chdir({0!r}); del _os"
+
+
+def find_notebooks(nbdir=NBDIR):
+    """
+    Walk a directory and return the sorted paths of all notebooks in it
+    """
+    nbpaths = []
+    for dirname, dirnames, filenames in os.walk(nbdir):
+        for filename in filenames:
+            if (
+                filename.endswith(".ipynb") and not
+                filename.endswith("-checkpoint.ipynb")
+            ):
+                nbpaths.append(
+                    os.path.abspath(os.path.join(dirname, filename))
+                )
+    return sorted(nbpaths)
+
+
+def parse_shard(shard):
+    """
+    Parse a shard specification 'i/n' (1 <= i <= n) into (i, n)
+    """
+    if shard is None or shard == "":
+        return 1, 1
+    try:
+        i, n = [int(s) for s in shard.split("/")]
+    except ValueError:
+        raise ValueError(
+            "shard must look like 'i/n', not {!r}".format(shard)
+        )
+    if n < 1 or not 1 <= i <= n:
+        raise ValueError(
+            "shard {!r} is out of range, need 1 <= i <= n".format(shard)
+        )
+    return i, n
+
+
+def select_shard(nbpaths, shard=None):
+    """
+    Return the notebooks that belong to a shard. Notebooks are assigned
+    round-robin on their sorted paths, so every machine computes the same
+    partition.
+    """
+    i, n = parse_shard(shard)
+    return [nb for k, nb in enumerate(sorted(nbpaths)) if k % n == i - 1]
+
+
+# ------------------ worker side ------------------ #
+
+_spare = None  # (kernel manager, client, warmup msg_id) of this worker
+
+
+def _preprocess_accepts_km():
+    from nbconvert.preprocessors import ExecutePreprocessor
+    if sys.version_info[0] < 3:
+        args = inspect.getargspec(ExecutePreprocessor.preprocess).args
+    else:
+        args = inspect.signature(ExecutePreprocessor.preprocess).parameters
+    return "km" in args
+
+
+def _start_spare(kernel_name):
+    """
+    Launch a kernel and send it the warm-up code without waiting for it
+    """
+    from jupyter_client.manager import KernelManager
+    km = KernelManager(kernel_name=kernel_name)
+    km.start_kernel()
+    kc = km.client()
+    kc.start_channels()
+    msg_id = kc.execute(WARMUP, silent=True, store_history=False)
+    return km, kc, msg_id
+
+
+def _wait(kc, msg_id, timeout):
+    """
+    Reply of the kernel to the request msg_id
+    """
+    while True:
+        reply = kc.get_shell_msg(timeout=timeout)
+        if reply["parent_header"].get("msg_id") == msg_id:
+            return reply
+
+
+def _take_spare(kernel_name, timeout, setup=None):
+    """
+    Hand out the spare kernel once its warm-up has finished, after running
+    setup in it without recording it in the history
+    """
+    global _spare
+    if _spare is None:
+        _spare = _start_spare(kernel_name)
+    km, kc, msg_id = _spare
+    _spare = None
+    try:
+        # the reply to the warm-up also tells us the kernel is ready
+        _wait(kc, msg_id, timeout)
+        if setup is not None:
+            reply = _wait(
+                kc, kc.execute(setup, silent=True, store_history=False),
+                timeout
+            )
+            if reply["content"]["status"] != "ok":
+                raise RuntimeError("kernel setup failed: {}".format(
+                    reply["content"].get("evalue")
+                ))
+    except BaseException:
+        kc.stop_channels()
+        km.shutdown_kernel(now=True)
+        raise
+    kc.stop_channels()
+    return km
+
+
+def _shutdown_spare():
+    global _spare
+    if _spare is not None:
+        km, kc, _ = _spare
+        _spare = None
+        kc.stop_channels()
+        km.shutdown_kernel(now=True)
+
+
+def _init_worker():
+    from multiprocessing.util import Finalize
+    Finalize(None, _shutdown_spare, exitpriority=10)
+
+
+def execute_notebook(nbpath, timeout=TIMEOUT, kernel_name=KERNEL_NAME,
+                     warm=True, cache=True):
+    """
+    Execute a notebook in memory, or replay it from the execution cache.
+    Returns (nbpath, passed, seconds, error).
+    """
+    import nbformat
+    from nbconvert.preprocessors import ExecutePreprocessor
+    global _spare
+
+    tic = time.time()
+    nbdir = os.path.dirname(os.path.abspath(nbpath))
+    try:
+        with open(nbpath) as f:
+            nb = nbformat.read(f, as_version=4)
+
+        if cache and nbcache.enabled():
+            cache = nbcache.NotebookCache(extra_inputs=EXTRA_INPUTS)
+            key = cache.key(nb, kernel_name, nbdir)
+            if cache.get(key) is not None:
+                return nbpath, True, time.time() - tic, None
+        else:
+            cache = None
+
+        ep = ExecutePreprocessor(timeout=timeout, kernel_name=kernel_name)
+        resources = {"metadata": {"path": nbdir}}
+
+        if warm and _preprocess_accepts_km():
+            km = _take_spare(kernel_name, timeout, CHDIR.format(nbdir))
+            # get the next kernel going while this notebook runs
+            _spare = _start_spare(kernel_name)
+            try:
+                ep.preprocess(nb, resources, km=km)
+            finally:
+                # the preprocessor does not own the kernel, it is shut down
+                # here so the worker only holds its spare
+                kc = getattr(ep, "kc", None)
+                if kc is not None:
+                    kc.stop_channels()
+                km.shutdown_kernel(now=True)
+        else:
+            ep.preprocess(nb, resources)
+
+        if cache is not None:
+            cache.put(key, nb)
+        return nbpath, True, time.time() - tic, None
+
+    except Exception:
+        return nbpath, False, time.time() - tic, traceback.format_exc()
+
+
+def _execute(args):
+    return execute_notebook(*args)
+
+
+# ------------------ parent side ------------------ #
+
+class NotebookRunner(object):
+    """
+    Run notebooks concurrently on a pool of workers with warm kernels.
+
+    .. code:: python
+
+        runner = NotebookRunner(find_notebooks(), jobs=4).start()
+        nbpath, passed, seconds, error = runner.result(nbpath)
+        runner.close()
+
+    """
+
+    def __init__(
+        self, nbpaths, jobs=None, shard=None, timeout=TIMEOUT,
+        kernel_name=KERNEL_NAME, warm=True, cache=True
+    ):
+        self.nbpaths = select_shard(nbpaths, shard)
+        if jobs is None:
+            jobs = multiprocessing.cpu_count()
+        self.jobs = max(1, min(int(jobs), len(self.nbpaths) or 1))
+        self.timeout = timeout
+        self.kernel_name = kernel_name
+        self.warm = warm
+        self.cache = cache
+        self._pool = None
+        self._pending = {}
+        self.results = {}
+
+    def start(self):
+        """
+        Submit all notebooks, largest file first (a proxy for the longest
+        running), so the suite ends close to the slowest notebook.
+        """
+        if self._pool is None:
+            self._pool = multiprocessing.Pool(
+                self.jobs, initializer=_init_worker
+            )
+            for nbpath in sorted(
+                self.nbpaths, key=os.path.getsize, reverse=True
+            ):
+                self._pending[nbpath] = self._pool.apply_async(
+                    _execute,
+                    (
+                        (nbpath, self.timeout, self.kernel_name, self.warm,
+                         self.cache),
+                    )
+                )
+        return self
+
+    def result(self, nbpath):
+        """
+        Block until a notebook has been executed and return
+        (nbpath, passed, seconds, error)
+        """
+        nbpath = os.path.abspath(nbpath)
+        if nbpath not in self.results:
+            self.start()
+            # allow for the kernel start-up on top of the cell timeout
+            self.results[nbpath] = self._pending.pop(nbpath).get(
+                2 * self.timeout * max(1, len(self.nbpaths))
+            )
+        return self.results[nbpath]
+
+    def run(self):
+        """
+        Execute every notebook and return the results in path order
+        """
+        self.start()
+        try:
+            return [self.result(nbpath) for nbpath in sorted(self.nbpaths)]
+        finally:
+            self.close()
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.close()
+            self._pool.join()
+            self._pool = None
+
+    def report(self, stream=sys.stdout):
+        """
+        Print the wall time of each notebook, slowest first
+        """
+        results = sorted(self.results.values(), key=lambda r: -r[2])
+        print("\n{:>10}  {:6}  notebook".format("time (s)", "status"),
+              file=stream)
+        for nbpath, passed, seconds, _ in results:
+            print("{:10.1f}  {:6}  {}".format(
+                seconds, "passed" if passed else "FAILED",
+                os.path.relpath(nbpath)), file=stream)
+        if results:
+            print("{:10.1f}  total notebook time on {} worker(s)".format(
+                sum(r[2] for r in results), self.jobs), file=stream)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument(
+        "paths", nargs="*", default=[NBDIR],
+        help="notebooks or directories to search (default: notebooks/)"
+    )
+    parser.add_argument(
+        "-j", "--jobs", type=int, default=os.environ.get("NB_JOBS"),
+        help="number of workers (default: number of cores)"
+    )
+    parser.add_argument(
+        "--shard", default=os.environ.get("NB_SHARD"),
+        help="only run shard i of n, given as 'i/n'"
+    )
+    parser.add_argument("--timeout", type=int, default=TIMEOUT)
+    parser.add_argument("--kernel-name", default=KERNEL_NAME)
+    parser.add_argument(
+        "--cold", action="store_true",
+        help="start a fresh kernel per notebook instead of a warm one"
+    )
+    parser.add_argument(
+        "--no-cache", action="store_true",
+        help="execute every notebook, even if it is in the execution cache"
+    )
+    args = parser.parse_args(argv)
+
+    nbpaths = []
+    for path in args.paths:
+        if os.path.isdir(path):
+            nbpaths += find_notebooks(path)
+        else:
+            nbpaths.append(os.path.abspath(path))
+
+    tic = time.time()
+    runner = NotebookRunner(
+        nbpaths, jobs=args.jobs, shard=args.shard, timeout=args.timeout,
+        kernel_name=args.kernel_name, warm=not args.cold,
+        cache=not args.no_cache
+    )
+    results = runner.run()
+    runner.report()
+    print("{:10.1f}  wall time".format(time.time() - tic))
+
+    for nbpath, passed, _, error in results:
+        if not passed:
+            print("\n <<<<< {0} FAILED >>>>> \n".format(nbpath))
+            print(error)
+    return 0 if all(r[1] for r in results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())